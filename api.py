@@ -0,0 +1,163 @@
+import hashlib
+import json
+
+from flask import Blueprint, Response, abort, request
+
+import db
+import locations
+import search
+import stats
+from images import photo_url
+from pagination import keyset_page, page_args
+
+# Read-only JSON API for kiosks and dashboards. Every response carries an ETag
+# derived from the global data version (bumped by triggers on every write), so
+# a poll that finds nothing new is answered with a 304 after one PK lookup.
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+ITEM_FIELDS = (
+    "id", "title", "category", "description", "location_found", "location_id",
+    "date_found", "time_found", "status", "created_at", "photo_url", "thumb_url",
+)
+
+
+def _etag(version: int) -> str:
+    variant = hashlib.sha1(request.full_path.encode()).hexdigest()[:12]
+    return f"v{version}-{variant}"
+
+
+def _json(payload, etag: str) -> Response:
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate; revalidation is cheap.
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def cached_json(build):
+    """Serve build(conn) as JSON unless the client's copy is still current."""
+    conn = db.get_conn()
+    etag = _etag(stats.data_version(conn))
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return _json(build(conn), etag)
+
+
+def _selected_fields():
+    raw = request.args.get("fields", "")
+    if not raw:
+        return ITEM_FIELDS
+    fields = tuple(f for f in raw.split(",") if f in ITEM_FIELDS)
+    if not fields:
+        abort(400, description=f"fields must be a comma list of: {', '.join(ITEM_FIELDS)}")
+    return fields
+
+
+def serialize_item(row, fields=ITEM_FIELDS) -> dict:
+    item = {}
+    for field in fields:
+        if field == "photo_url":
+            item[field] = photo_url(row, "medium")
+        elif field == "thumb_url":
+            item[field] = photo_url(row, "thumb")
+        else:
+            item[field] = row[field]
+    return item
+
+
+@bp.get("/items")
+def list_items():
+    fields = _selected_fields()
+
+    def build(conn):
+        q = request.args.get("q", "").strip()
+        filters, params = "", []
+        if request.args.get("category"):
+            filters += " AND category = ?"
+            params.append(request.args["category"])
+        if request.args.get("date"):
+            filters += " AND date_found = ?"
+            params.append(request.args["date"])
+
+        page = page_args(request.args)
+        result = search.search_approved_items(conn, q, filters, params, **page) if q else None
+        if result is None:
+            sql = "SELECT * FROM found_items WHERE status='approved'" + filters
+            if q:
+                sql += " AND (title LIKE ? OR description LIKE ? OR location_found LIKE ?)"
+                params.extend([f"%{q}%"] * 3)
+            result = keyset_page(conn, sql, params, **page)
+        return {
+            "items": [serialize_item(row, fields) for row in result.items],
+            "next": result.next_cursor,
+            "prev": result.prev_cursor,
+        }
+
+    return cached_json(build)
+
+
+@bp.get("/items/<int:item_id>")
+def get_item(item_id: int):
+    fields = _selected_fields()
+
+    def build(conn):
+        row = conn.execute(
+            "SELECT * FROM found_items WHERE id = ? AND status IN ('approved', 'claimed')",
+            (item_id,),
+        ).fetchone()
+        if row is None:
+            abort(404)
+        return serialize_item(row, fields)
+
+    return cached_json(build)
+
+
+@bp.get("/map/pins")
+def map_pins():
+    def build(conn):
+        map_items, counts = locations.map_pins(conn)
+        return {
+            "pins": [
+                {
+                    "id": loc["id"],
+                    "name": loc["name"],
+                    "x": loc["x"],
+                    "y": loc["y"],
+                    "count": counts[loc["id"]],
+                    "recent": map_items[loc["id"]],
+                }
+                for loc in locations.LOCATIONS
+            ]
+        }
+
+    return cached_json(build)
+
+
+@bp.get("/categories")
+def categories():
+    def build(conn):
+        rows = conn.execute(
+            "SELECT DISTINCT category FROM found_items ORDER BY category ASC"
+        ).fetchall()
+        return {"categories": [row["category"] for row in rows]}
+
+    return cached_json(build)
+
+
+@bp.get("/stats")
+def dashboard_stats():
+    return cached_json(lambda conn: stats.dashboard_stats(conn))
+
+
+@bp.errorhandler(400)
+@bp.errorhandler(404)
+def api_error(exc):
+    return {"error": exc.description if exc.code == 400 else exc.name}, exc.code
+
+
+def init_app(app) -> None:
+    app.register_blueprint(bp)
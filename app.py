@@ -1,83 +1,61 @@
 import os
 import json
-import smtplib
 import secrets
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
-from email.message import EmailMessage
+
+_import_started = time.perf_counter()  # startup timings begin here
 
 from dotenv import load_dotenv
 from flask import (
     Flask, render_template, request, redirect, url_for,
-    flash, session, send_from_directory
+    flash, session
 )
-from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+# Before the local imports: they read their settings from the environment.
+load_dotenv()
 
+import api
+import blobstore
+import db
+import events
+import httpcache
+import images
+import instrumentation
+import locations
+import lostreports
+import mailer
+import metrics
+import moderation
+import rendercache
+import retention
+import search
+import startup
+import stats
+import transfer
+from credentials import load_admin, update_admin
+from pagination import keyset_page, page_args, page_url
+from passwords import hash_password, verify_password
+from ratelimit import login_limiter, wait_message
 from db import init_db, get_conn
-MAX_REVIEW_LEN = 300   # you can change 300 to any limit you want
 
-load_dotenv()
+startup.record("imports", (time.perf_counter() - _import_started) * 1000)
+MAX_REVIEW_LEN = 300   # you can change 300 to any limit you want
 
 UPLOAD_FOLDER = Path("uploads")
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "webp"}
 
-CAMPUS_LOCATIONS = [
-    {"id": "raider-stadium", "name": "Raider Stadium"},
-    {"id": "stadium-entrance", "name": "Stadium-entrance"},
-    {"id": "practice-field", "name": "practice-field"},
-    {"id": "tennis", "name": "tennis"},
-    {"id": "baseball-field", "name": "baseball field"},
-    {"id": "band", "name": "band"},
-    {"id": "gym", "name": "gym"},
-    {"id": "fine-arts", "name": "fine arts"},
-    {"id": "main-entrance", "name": "main-entrance"},
-    {"id": "1000-Hall", "name": "1000-Hall"},
-    {"id": "2000-Hall", "name": "2000-Hall"},
-    {"id": "3000-Hall", "name": "3000-Hall"},
-    {"id": "4000-Hall", "name": "4000-Hall"},
-    {"id": "media-center", "name": "media-center"},
-    {"id": "5000-Hall", "name": "5000-Hall"},
-    {"id": "cafeteria", "name": "cafeteria"},
-    {"id": "student-parking", "name": "student-parking"},
-    {"id": "staff-parking", "name": "staff-parking"},
-    {"id": "visitor-parking", "name": "visitor-parking"},
-    {"id": "bus-lane", "name": "bus-lane"},
-    # add as many as you want:
-    # {"id": "tennis", "name": "Tennis Courts"},
-]
-
+CAMPUS_LOCATIONS = locations.REPORTABLE_LOCATIONS
 
-# -------------------
-# Admin credential storage (persistent)
-# -------------------
-ADMIN_FILE = "admin.json"
-
-def load_admin():
-    """Load admin credentials from admin.json (create default on first run)."""
-    if not os.path.exists(ADMIN_FILE):
-        admin = {
-            "username": "admin",
-            "email": os.getenv("ADMIN_EMAIL", ""),
-            "password_hash": generate_password_hash("admin123")  # change after first login
-        }
-        with open(ADMIN_FILE, "w") as f:
-            json.dump(admin, f, indent=2)
-        return admin
-
-    with open(ADMIN_FILE, "r") as f:
-        admin = json.load(f)
+# Reverse proxies in front of the app (nginx, a load balancer...). With N > 0
+# the client address and scheme come from the Nth hop of X-Forwarded-For /
+# X-Forwarded-Proto, for the whole app: per-IP login limits, logs, external
+# URLs. 0 trusts no forwarded headers; never set it higher than the real
+# number of hops, or clients can pick their own address.
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
 
-    if "email" not in admin:
-        admin["email"] = os.getenv("ADMIN_EMAIL", "")
-        save_admin(admin)
-
-    return admin
-
-def save_admin(admin):
-    """Save admin credentials to admin.json."""
-    with open(ADMIN_FILE, "w") as f:
-        json.dump(admin, f, indent=2)
 
 # -------------------
 # Upload helpers
@@ -86,40 +64,11 @@ def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def get_email_config() -> tuple[str, int, str, str, bool, str]:
-    smtp_host = os.getenv("SMTP_HOST")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_username = os.getenv("SMTP_USERNAME")
-    smtp_password = os.getenv("SMTP_PASSWORD")
-    smtp_use_tls = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
-    from_email = os.getenv("MAIL_FROM", smtp_username or "no-reply@example.com")
-
-    if not smtp_host or not smtp_username or not smtp_password:
-        raise RuntimeError(
-            "Email is not configured. Set SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, and MAIL_FROM."
-        )
-
-    return smtp_host, smtp_port, smtp_username, smtp_password, smtp_use_tls, from_email
-
-
-def send_email_message(subject: str, to_email: str, body: str) -> None:
-    smtp_host, smtp_port, smtp_username, smtp_password, smtp_use_tls, from_email = get_email_config()
-
-    msg = EmailMessage()
-    msg["Subject"] = subject
-    msg["From"] = from_email
-    msg["To"] = to_email
-    msg.set_content(body)
-
-    with smtplib.SMTP(smtp_host, smtp_port, timeout=30) as server:
-        if smtp_use_tls:
-            server.starttls()
-        server.login(smtp_username, smtp_password)
-        server.send_message(msg)
-
-
-def send_claim_approval_email(to_email: str, student_name: str, item_title: str, pickup_location: str) -> None:
-    send_email_message(
+def send_claim_approval_email(
+    to_email: str, student_name: str, item_title: str, pickup_location: str, conn=None
+) -> None:
+    mailer.enqueue(
+        conn=conn,
         subject=f"Lost and Found Claim Approved: {item_title}",
         to_email=to_email,
         body=
@@ -137,7 +86,7 @@ Lost and Found
 
 
 def send_password_reset_email(to_email: str, account_label: str, reset_link: str) -> None:
-    send_email_message(
+    mailer.enqueue(
         subject=f"{account_label} Password Reset",
         to_email=to_email,
         body=
@@ -152,12 +101,38 @@ This link expires in 30 minutes. If you did not request this, you can ignore thi
 
 
 def create_app() -> Flask:
+    started = time.perf_counter()
     app = Flask(__name__)
     app.config["SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY", "dev_secret_change_me")
     app.config["UPLOAD_FOLDER"] = str(UPLOAD_FOLDER)
     app.permanent_session_lifetime = timedelta(days=30)
+    if TRUSTED_PROXIES > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
 
     UPLOAD_FOLDER.mkdir(exist_ok=True)
+    instrumentation.init_app(app)  # first, so its timer spans the other hooks
+    metrics.init_app(app)
+    db.init_app(app)
+    search.init_app(app)
+    stats.init_app(app)
+    images.init_app(app)
+    blobstore.init_app(app)
+    httpcache.init_app(app)
+    mailer.init_app(app)
+    api.init_app(app)
+    events.init_app(app)
+    retention.init_app(app)
+    transfer.init_app(app)
+    lostreports.init_app(app)
+    startup.init_app(app)
+
+    @app.errorhandler(413)
+    def upload_too_large(exc):
+        if request.endpoint != "report_found":
+            return exc
+        flash(f"Photo must be {blobstore.MAX_UPLOAD_BYTES // (1024 * 1024)} MB or smaller.", "error")
+        return redirect(url_for("report_found"))
+    app.add_template_global(page_url)
 
     @app.route("/feedback", methods=["GET", "POST"])
     def feedback():
@@ -193,17 +168,26 @@ def create_app() -> Flask:
             flash("Thanks! Your anonymous review was posted.", "success")
             return redirect(url_for("feedback"))
 
+        admin = is_admin()
         conn = get_conn()
         try:
-            reviews = conn.execute("SELECT * FROM reviews ORDER BY id DESC").fetchall()
+            review_list = rendercache.fragment(
+                conn, "reviews", ("reviews",), (admin, rendercache.request_key()),
+                lambda: rendercache.render(
+                    "_review_list.html",
+                    reviews=keyset_page(conn, "SELECT * FROM reviews", **page_args(request.args)),
+                    is_admin=admin,
+                ),
+            )
         finally:
             conn.close()
 
-        return render_template("feedback.html", reviews=reviews, max_len=MAX_REVIEW_LEN)
+        return render_template("feedback.html", review_list=review_list, max_len=MAX_REVIEW_LEN)
 
 
-    # init DB
-    init_db()
+    # init DB (a no-op check when the schema is already current)
+    with startup.phase("init_db"):
+        init_db()
 
     # -------------------
     # Auth helpers
@@ -240,6 +224,9 @@ def create_app() -> Flask:
         except ValueError:
             return value
 
+    def publish_item_approved(conn, item) -> None:
+        events.publish(conn, events.ITEM_APPROVED, {"id": item["id"], "title": item["title"]})
+
     def create_password_reset(user_type: str, user_key: str, email: str) -> str:
         token = secrets.token_urlsafe(32)
         now = datetime.now()
@@ -329,22 +316,12 @@ def create_app() -> Flask:
     def home():
         today = datetime.now()
         today_iso = today.date().isoformat()
-        conn = get_conn()
-        try:
-            total_found = conn.execute("SELECT COUNT(*) AS c FROM found_items").fetchone()["c"]
-            approved_found = conn.execute(
-                "SELECT COUNT(*) AS c FROM found_items WHERE status='approved'"
-            ).fetchone()["c"]
-            claimed = conn.execute(
-                "SELECT COUNT(*) AS c FROM found_items WHERE status='claimed'"
-            ).fetchone()["c"]
-            pending = conn.execute(
-                "SELECT COUNT(*) AS c FROM found_items WHERE status='pending'"
-            ).fetchone()["c"]
-            total_claims = conn.execute("SELECT COUNT(*) AS c FROM claims").fetchone()["c"]
+
+        def render_today_finds():
             today_finds = conn.execute(
                 """
-                SELECT id, title, category, location_found, photo_filename, created_at, time_found
+                SELECT id, title, category, location_found, photo_filename, photo_renditions,
+                       created_at, time_found
                 FROM found_items
                 WHERE status='approved' AND date_found = ?
                 ORDER BY COALESCE(time_found, '23:59') DESC, id DESC
@@ -352,32 +329,36 @@ def create_app() -> Flask:
                 """,
                 (today_iso,),
             ).fetchall()
-        finally:
-            conn.close()
 
-        today_find_cards = []
-        for row in today_finds:
-            today_find_cards.append(
-                {
-                    "id": row["id"],
-                    "title": row["title"],
-                    "category": row["category"],
-                    "location_found": row["location_found"],
-                    "photo_filename": row["photo_filename"],
-                    "display_time": format_clock_time(row["time_found"]),
-                }
+            today_find_cards = []
+            for row in today_finds:
+                today_find_cards.append(
+                    {
+                        "id": row["id"],
+                        "title": row["title"],
+                        "category": row["category"],
+                        "location_found": row["location_found"],
+                        "photo_filename": row["photo_filename"],
+                        "photo_renditions": row["photo_renditions"],
+                        "display_time": format_clock_time(row["time_found"]),
+                    }
+                )
+            return rendercache.render("_today_finds.html", today_finds=today_find_cards)
+
+        conn = get_conn()
+        try:
+            dashboard = stats.get_dashboard_stats(conn)
+            today_finds = rendercache.fragment(
+                conn, "today-finds", ("found_items",), (today_iso,), render_today_finds
             )
+        finally:
+            conn.close()
 
         return render_template(
             "home.html",
-            stats={
-                "total_found": total_found,
-                "approved_found": approved_found,
-                "claimed": claimed,
-                "pending": pending,
-                "total_claims": total_claims
-            },
-            today_finds=today_find_cards,
+            stats=dashboard,
+            today_finds=today_finds,
+            today_iso=today_iso,
             today_label=today.strftime("%A, %B %d, %Y"),
         )
 
@@ -388,41 +369,58 @@ def create_app() -> Flask:
         date_filter = request.args.get("date", "").strip()
         today_iso = datetime.now().date().isoformat()
 
-        conn = get_conn()
-        try:
+        def render_results():
             # ✅ Show ONLY approved items in browse.
             # If an item is marked claimed, it disappears from browse.
-            sql = "SELECT * FROM found_items WHERE status='approved'"
+            filters = ""
             params = []
 
-            if q:
-                sql += " AND (title LIKE ? OR description LIKE ? OR location_found LIKE ?)"
-                like = f"%{q}%"
-                params.extend([like, like, like])
-
             if category:
-                sql += " AND category = ?"
+                filters += " AND category = ?"
                 params.append(category)
 
             if date_filter == "today":
-                sql += " AND date_found = ?"
+                filters += " AND date_found = ?"
                 params.append(today_iso)
 
-            sql += " ORDER BY id DESC"
-            items = conn.execute(sql, params).fetchall()
-
+            # Full-text search (ranked, with highlights) when FTS5 is available;
+            # otherwise fall back to substring matching.
+            page = page_args(request.args)
+            items = search.search_approved_items(conn, q, filters, params, **page) if q else None
+            if items is None:
+                sql = "SELECT * FROM found_items WHERE status='approved'" + filters
+                if q:
+                    sql += " AND (title LIKE ? OR description LIKE ? OR location_found LIKE ?)"
+                    like = f"%{q}%"
+                    params.extend([like, like, like])
+                items = keyset_page(conn, sql, params, **page)
+            return rendercache.render("_browse_results.html", items=items)
+
+        def render_category_options():
             categories = conn.execute(
                 "SELECT DISTINCT category FROM found_items ORDER BY category ASC"
             ).fetchall()
+            return rendercache.render("_category_options.html", categories=categories, category=category)
+
+        conn = get_conn()
+        try:
+            # "today" resolves to a different date tomorrow, so it is part of the key.
+            results = rendercache.fragment(
+                conn, "browse-results", ("found_items",),
+                (today_iso if date_filter == "today" else "", rendercache.request_key()),
+                render_results,
+            )
+            category_options = rendercache.fragment(
+                conn, "category-options", ("found_items",), (category,), render_category_options
+            )
         finally:
             conn.close()
 
         return render_template(
             "browse.html",
-            items=items,
+            results=results,
             q=q,
-            category=category,
-            categories=categories,
+            category_options=category_options,
             date_filter=date_filter,
         )
 
@@ -441,31 +439,45 @@ def create_app() -> Flask:
                 return redirect(url_for("report_found"))
 
             photo_filename = None
+            photo_renditions = None
             file = request.files.get("photo")
             if file and file.filename:
                 if not allowed_file(file.filename):
                     flash("Photo must be PNG/JPG/JPEG/WEBP.", "error")
                     return redirect(url_for("report_found"))
 
-                safe_name = secure_filename(file.filename)
-                photo_filename = f"{int(datetime.now().timestamp())}_{safe_name}"
-                file.save(UPLOAD_FOLDER / photo_filename)
+                ext = file.filename.rsplit(".", 1)[1]
+                try:
+                    upload = blobstore.receive(file, UPLOAD_FOLDER, ext)
+                except blobstore.UploadTooLarge as exc:
+                    flash(f"Photo is too large: {exc}.", "error")
+                    return redirect(url_for("report_found"))
 
-            # Convert location_id -> readable name
-            loc_name = next(
-                (l["name"] for l in CAMPUS_LOCATIONS if l["id"] == location_id),
-                location_id
-            )
+                # Identical photos share one content-addressed file.
+                try:
+                    photo_filename = upload.place()
+                    renditions = images.make_renditions(UPLOAD_FOLDER, photo_filename)
+                    photo_renditions = json.dumps(renditions) if renditions else None
+                except images.ImageProcessingError:
+                    if photo_filename and blobstore.refcount(get_conn(), photo_filename) == 0:
+                        blobstore.delete_files(UPLOAD_FOLDER, photo_filename)
+                    flash("Photo could not be read. Please upload a valid image.", "error")
+                    return redirect(url_for("report_found"))
+
+            # Canonical map ID -> readable name
+            location_id = locations.resolve(location_id)
+            loc_name = locations.get(location_id)["name"]
 
             conn = get_conn()
             try:
-                conn.execute(
+                cursor = conn.execute(
                     """
                     INSERT INTO found_items (
                         title, category, location_found, location_id,
-                        date_found, time_found, description, photo_filename, status, created_at
+                        date_found, time_found, description, photo_filename,
+                        photo_renditions, status, created_at
                     )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?)
                     """,
                     (
                         title,
@@ -476,10 +488,21 @@ def create_app() -> Flask:
                         time_found or None,
                         description,
                         photo_filename,
+                        photo_renditions,
                         datetime.now().isoformat(timespec="seconds")
                     )
                 )
+                events.publish(conn, events.ITEM_SUBMITTED, {
+                    "id": cursor.lastrowid,
+                    "title": title,
+                    "status": "pending",
+                    "location_found": loc_name,
+                    "date_found": date_found,
+                    "photo_url": url_for("uploaded_file", filename=photo_filename) if photo_filename else None,
+                })
                 conn.commit()
+                stats.invalidate()
+                events.notify()
             finally:
                 conn.close()
 
@@ -510,16 +533,28 @@ def create_app() -> Flask:
                 flash("Please fill out all required fields.", "error")
                 return redirect(url_for("claim_item", item_id=item_id))
 
+            created_at = datetime.now().isoformat(timespec="seconds")
             conn = get_conn()
             try:
-                conn.execute(
+                cursor = conn.execute(
                     """
                     INSERT INTO claims (item_id, student_name, email, message, created_at)
                     VALUES (?, ?, ?, ?, ?)
                     """,
-                    (item_id, student_name, email, message, datetime.now().isoformat(timespec="seconds"))
+                    (item_id, student_name, email, message, created_at)
                 )
+                events.publish(conn, events.CLAIM_CREATED, {
+                    "id": cursor.lastrowid,
+                    "item_title": item["title"],
+                    "student_name": student_name,
+                    "email": email,
+                    "message": message,
+                    "status": "pending",
+                    "display_created_at": format_datetime_display(created_at),
+                })
                 conn.commit()
+                stats.invalidate()
+                events.notify()
             finally:
                 conn.close()
 
@@ -530,82 +565,29 @@ def create_app() -> Flask:
 
     @app.route("/map")
     def map_page():
-        # Pins (x,y are percentages)
-        campus_locations = [
-            {"id": "softball-field", "name": "Softball Field", "x": 25, "y": 12},
-            {"id": "raider-stadium", "name": "Raider Stadium", "x": 25, "y": 32},
-            {"id": "stadium-entrance", "name": "Stadium Entrance", "x": 42, "y": 34},
-            {"id": "practice-field", "name": "Practice Field", "x": 42, "y": 42},
-            {"id": "tennis", "name": "Tennis Courts", "x": 65, "y": 39},
-            {"id": "baseball-field", "name": "Baseball Field", "x": 22, "y": 58},
-            {"id": "band", "name": "Band Room", "x": 40, "y": 57},
-            {"id": "gym", "name": "Gym", "x": 50, "y": 60},
-            {"id": "fine-arts", "name": "Fine Arts", "x": 50, "y": 74},
-            {"id": "main-entrance", "name": "Main Entrance", "x": 54, "y": 66},
-            {"id": "1000-hall", "name": "1000 Hall", "x": 65, "y": 65},
-            {"id": "2000-hall", "name": "2000 Hall", "x": 60, "y": 75},
-            {"id": "3000-hall", "name": "3000 Hall", "x": 67, "y": 75},
-            {"id": "4000-hall", "name": "4000 Hall", "x": 73, "y": 75},
-            {"id": "media-center", "name": "Media Center", "x": 62, "y": 62},
-            {"id": "cafeteria", "name": "Cafeteria", "x": 72, "y": 62},
-            {"id": "5000-hall", "name": "5000 Hall", "x": 90, "y": 63},
-            {"id": "student-parking", "name": "Student Parking", "x": 30, "y": 80},
-            {"id": "staff-parking", "name": "Staff Parking", "x": 45, "y": 85},
-            {"id": "visitor-parking", "name": "Visitor Parking", "x": 54, "y": 88},
-            {"id": "student-staff-parking", "name": "Student/Staff Parking", "x": 85, "y": 79},
-            {"id": "bus-lane", "name": "Bus Lane", "x": 85, "y": 70},
-            {"id": "unknown", "name": "Other / Unknown", "x": 5, "y": 5},
-        ]
-
-        # Pull items including location_id
+        def render_pins():
+            map_items, pin_counts = locations.map_pins(conn)
+            return rendercache.render(
+                "_map_pins.html",
+                campus_locations=locations.LOCATIONS,
+                map_items=map_items,
+                pin_counts=pin_counts,
+            )
+
         conn = get_conn()
         try:
-            rows = conn.execute(
-                """
-                SELECT id, title, category, date_found, location_found, location_id
-                FROM found_items
-                WHERE status IN ('approved','claimed')
-                ORDER BY id DESC
-                """
-            ).fetchall()
+            pins = rendercache.fragment(conn, "map-pins", ("found_items",), (), render_pins)
         finally:
             conn.close()
 
-        # Build map_items dict: loc_id -> list of items
-        map_items = {loc["id"]: [] for loc in campus_locations}
-
-        for r in rows:
-            item = dict(r)
-            lid = item.get("location_id")
-
-            # If location_id is missing (older posts), try to match by text as fallback
-            if not lid:
-                loc_text = (item.get("location_found") or "").lower()
-                matched = None
-                for loc in campus_locations:
-                    if loc["name"].lower() in loc_text:
-                        matched = loc["id"]
-                        break
-                lid = matched or "unknown"
-                item["location_id"] = lid  # so it behaves consistently
-
-            # Add to map group
-            if lid not in map_items:
-                map_items[lid] = []
-            map_items[lid].append(item)
+        return render_template("map.html", pins=pins)
 
-        return render_template(
-            "map.html",
-            campus_locations=campus_locations,
-            map_items=map_items
-        )
 
 
-
-    # Serve uploaded images safely
+    # Serve uploaded images safely, with long-lived caching for immutable names
     @app.route("/uploads/<path:filename>")
     def uploaded_file(filename: str):
-        return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+        return httpcache.send_upload(app.config["UPLOAD_FOLDER"], filename)
 
     # -------------------
     # Admin auth + panel
@@ -618,15 +600,29 @@ def create_app() -> Flask:
             password = request.form.get("password", "").strip()
             save_credentials = request.form.get("save_credentials") == "on"
 
+            # Refused before any hashing once this IP or account is over the limit.
+            wait = login_limiter.retry_after("admin", username)
+            if wait:
+                flash(wait_message(wait), "error")
+                return redirect(url_for("login"))
+
             admin = load_admin()
+            ok, new_hash = (
+                verify_password(admin["password_hash"], password)
+                if username == admin["username"] else (False, None)
+            )
 
-            if username == admin["username"] and check_password_hash(admin["password_hash"], password):
+            if ok:
+                if new_hash:
+                    update_admin(password_hash=new_hash)
+                login_limiter.succeeded("admin", username)
                 session.clear()
                 session["is_admin"] = True
                 apply_session_persistence(save_credentials)
                 flash("Logged in as admin.", "success")
                 return redirect(url_for("admin_panel"))
 
+            login_limiter.failed("admin", username)
             flash("Invalid credentials.", "error")
             return redirect(url_for("login"))
 
@@ -643,18 +639,33 @@ def create_app() -> Flask:
                 flash("Email and password are required.", "error")
                 return redirect(url_for("student_login"))
 
+            wait = login_limiter.retry_after("student", email)
+            if wait:
+                flash(wait_message(wait), "error")
+                return redirect(url_for("student_login"))
+
             conn = get_conn()
             try:
                 student = conn.execute(
                     "SELECT * FROM students WHERE email = ?",
                     (email,),
                 ).fetchone()
+                ok, new_hash = (
+                    verify_password(student["password_hash"], password) if student else (False, None)
+                )
+                if new_hash:
+                    conn.execute(
+                        "UPDATE students SET password_hash = ? WHERE id = ?", (new_hash, student["id"])
+                    )
+                    conn.commit()
             finally:
                 conn.close()
 
-            if not student or not check_password_hash(student["password_hash"], password):
+            if not ok:
+                login_limiter.failed("student", email)
                 flash("Invalid student email or password.", "error")
                 return redirect(url_for("student_login"))
+            login_limiter.succeeded("student", email)
 
             session.clear()
             session["is_student"] = True
@@ -706,7 +717,7 @@ def create_app() -> Flask:
                     (
                         full_name,
                         email,
-                        generate_password_hash(password),
+                        hash_password(password),
                         datetime.now().isoformat(timespec="seconds"),
                     ),
                 )
@@ -817,12 +828,10 @@ def create_app() -> Flask:
                 if reset_row["user_type"] == "student":
                     conn.execute(
                         "UPDATE students SET password_hash = ? WHERE id = ?",
-                        (generate_password_hash(password), int(reset_row["user_key"])),
+                        (hash_password(password), int(reset_row["user_key"])),
                     )
                 else:
-                    admin = load_admin()
-                    admin["password_hash"] = generate_password_hash(password)
-                    save_admin(admin)
+                    update_admin(password_hash=hash_password(password))
 
                 conn.execute(
                     "UPDATE password_resets SET used_at = ? WHERE id = ?",
@@ -853,7 +862,7 @@ def create_app() -> Flask:
 
         conn = get_conn()
         try:
-            items = conn.execute("SELECT * FROM found_items ORDER BY id DESC").fetchall()
+            items = keyset_page(conn, "SELECT * FROM found_items", **page_args(request.args))
             claims = conn.execute(
                 """
                 SELECT c.*, f.title AS item_title
@@ -875,6 +884,18 @@ def create_app() -> Flask:
 
         return render_template("admin.html", items=items, claims=formatted_claims)
 
+    @app.route("/admin/db-stats")
+    def admin_db_stats():
+        if not is_admin():
+            return {"error": "Admin access required."}, 403
+        return {
+            "pool": db.pool_stats(),
+            "render_cache": rendercache.cache_stats(),
+            "queries": instrumentation.query_stats(request.args.get("limit", 20, type=int)),
+            "phases": instrumentation.phase_stats(),
+            "startup_ms": startup.timings(),
+        }
+
     @app.route("/admin/change-password", methods=["GET", "POST"])
     def admin_change_password():
         if not is_admin():
@@ -887,7 +908,13 @@ def create_app() -> Flask:
             new_pw = request.form.get("new_password", "")
             confirm_pw = request.form.get("confirm_password", "")
 
-            if not check_password_hash(admin["password_hash"], current_pw):
+            wait = login_limiter.retry_after("admin", admin["username"])
+            if wait:
+                flash(wait_message(wait), "error")
+                return redirect(url_for("admin_change_password"))
+
+            if not verify_password(admin["password_hash"], current_pw)[0]:
+                login_limiter.failed("admin", admin["username"])
                 flash("Current password is incorrect.", "error")
                 return redirect(url_for("admin_change_password"))
 
@@ -899,8 +926,7 @@ def create_app() -> Flask:
                 flash("New password and confirm password do not match.", "error")
                 return redirect(url_for("admin_change_password"))
 
-            admin["password_hash"] = generate_password_hash(new_pw)
-            save_admin(admin)
+            update_admin(password_hash=hash_password(new_pw))
 
             flash("Password updated successfully.", "success")
             return redirect(url_for("admin_panel"))
@@ -917,13 +943,22 @@ def create_app() -> Flask:
             return redirect(url_for("login"))
 
         conn = get_conn()
+        matched = 0
         try:
             conn.execute("UPDATE found_items SET status='approved' WHERE id=?", (item_id,))
+            item = conn.execute("SELECT * FROM found_items WHERE id=?", (item_id,)).fetchone()
+            if item:
+                publish_item_approved(conn, item)
+                # Only this item is scored, against open lost reports that could match.
+                matched = lostreports.match_item(conn, item)
             conn.commit()
+            lostreports.count_matches(matched)
+            stats.invalidate()
+            events.notify()
         finally:
             conn.close()
 
-        flash("Item approved.", "success")
+        flash(f"Item approved and matched to {matched} lost report(s)." if matched else "Item approved.", "success")
         return redirect(url_for("admin_panel"))
 
     @app.post("/admin/item/<int:item_id>/mark-claimed")
@@ -936,6 +971,7 @@ def create_app() -> Flask:
         try:
             conn.execute("UPDATE found_items SET status='claimed' WHERE id=?", (item_id,))
             conn.commit()
+            stats.invalidate()
         finally:
             conn.close()
 
@@ -974,12 +1010,15 @@ def create_app() -> Flask:
                 flash("This claim request has already been approved.", "error")
                 return redirect(url_for("admin_panel"))
 
+            # Queued in the same transaction as the approval; the outbox
+            # sender delivers it in the background.
             try:
                 send_claim_approval_email(
                     to_email=claim["email"],
                     student_name=claim["student_name"],
                     item_title=claim["item_title"],
                     pickup_location=pickup_location,
+                    conn=conn,
                 )
             except Exception as exc:
                 flash(f"Approval email could not be sent: {exc}", "error")
@@ -998,11 +1037,23 @@ def create_app() -> Flask:
                 "UPDATE found_items SET status='claimed' WHERE id=?",
                 (claim["item_id"],),
             )
+            events.publish(
+                conn,
+                events.CLAIM_APPROVED,
+                {
+                    "id": claim_id,
+                    "item_id": claim["item_id"],
+                    "pickup_location": pickup_location,
+                    "display_approved_at": format_datetime_display(approved_at),
+                },
+            )
             conn.commit()
+            stats.invalidate()
+            events.notify()
         finally:
             conn.close()
 
-        flash(f"Claim approved and email sent to {claim['email']}.", "success")
+        flash(f"Claim approved and email queued for {claim['email']}.", "success")
         return redirect(url_for("admin_panel"))
 
     @app.post("/admin/item/<int:item_id>/delete")
@@ -1014,28 +1065,84 @@ def create_app() -> Flask:
         conn = get_conn()
         try:
             row = conn.execute("SELECT photo_filename FROM found_items WHERE id=?", (item_id,)).fetchone()
+            conn.execute("DELETE FROM found_items WHERE id=?", (item_id,))
+            conn.commit()
+            stats.invalidate()
+
+            # The photo may be shared with other posts; only unreferenced blobs go.
             if row and row["photo_filename"]:
                 try:
-                    (UPLOAD_FOLDER / row["photo_filename"]).unlink(missing_ok=True)
+                    blobstore.release(conn, UPLOAD_FOLDER, [row["photo_filename"]])
                 except Exception:
                     pass
-
-            conn.execute("DELETE FROM found_items WHERE id=?", (item_id,))
-            conn.commit()
         finally:
             conn.close()
 
         flash("Item deleted.", "success")
         return redirect(url_for("admin_panel"))
 
-    return app
+    @app.post("/admin/items/bulk")
+    def admin_bulk():
+        """Approve, claim, reject or delete many items in one transaction."""
+        wants_json = request.accept_mimetypes.best == "application/json"
+        if not is_admin():
+            if wants_json:
+                return {"error": "Admin access required."}, 403
+            flash("Admin access required.", "error")
+            return redirect(url_for("login"))
 
+        action = request.form.get("action", "")
+        matched = 0
+
+        def on_changed(conn, rows):
+            nonlocal matched
+            if action == "approve":
+                for row in rows:
+                    publish_item_approved(conn, row)
+                    # Same as admin_approve(): match in the approving transaction.
+                    matched += lostreports.match_item(conn, row)
+
+        conn = get_conn()
+        try:
+            ids = moderation.parse_ids(request.form.getlist("ids"))
+            summary = moderation.apply(conn, action, ids, on_changed)
+            lostreports.count_matches(matched)
+            stats.invalidate()
+            events.notify()
+
+            # One pass over the photos, after the deletes are durable.
+            photos = summary.pop("photos")
+            if photos:
+                try:
+                    blobstore.release(conn, UPLOAD_FOLDER, photos)
+                except Exception:
+                    pass
+        except moderation.BulkActionError as exc:
+            if wants_json:
+                return {"error": str(exc)}, 400
+            flash(str(exc), "error")
+            return redirect(url_for("admin_panel"))
+        finally:
+            conn.close()
+
+        message = f"{len(summary['changed'])} of {summary['requested']} items updated ({action})."
+        if summary["skipped"]:
+            message += f" {summary['skipped']} skipped (already done or not found)."
+        if wants_json:
+            return {**summary, "message": message}
+        flash(message, "success")
+        return redirect(url_for("admin_panel"))
+
+    # Everything but init_db: Flask setup, extensions and route definitions.
+    startup.record("app", (time.perf_counter() - started) * 1000 - startup.timings().get("init_db", 0))
+    if startup.TEMPLATE_PRECOMPILE:
+        with startup.phase("templates"):
+            startup.precompile(app)
+    startup.report()
+    return app
 
-if __name__ == "__main__":
-    app = create_app()
-    
-import os
 
 if __name__ == "__main__":
+    # Development server. In production: gunicorn -c gunicorn.conf.py wsgi:app
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port)
+    create_app().run(host="0.0.0.0", port=port)
@@ -0,0 +1,736 @@
+"""Benchmarks for the main pages.
+
+    python bench.py seed --size 100k             # build bench_data/100k once
+    python bench.py run --size 100k --mode client -o before.json
+    python bench.py run --size 100k --mode wsgi --clients 1,8,32 -o after.json
+    python bench.py compare before.json after.json
+
+    # single process vs pre-forked workers (gunicorn.conf.py)
+    python bench.py run --mode wsgi --clients 16 -o werkzeug.json
+    python bench.py run --mode wsgi --server gunicorn --clients 16 -o gunicorn.json
+    python bench.py compare werkzeug.json gunicorn.json --metric throughput_rps
+
+Each dataset lives in its own directory (database, uploads, admin.json) and
+the app is run from there, so the real lostandfound.db is never touched.
+App settings come from the environment as usual, e.g. RENDER_CACHE=false to
+time the uncached pages. Results are JSON; `compare` exits 1 on regressions.
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from urllib.parse import quote_plus
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+REPO = Path(__file__).resolve().parent
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+ADMIN_PASSWORD = "bench-admin"
+SEED_BATCH = 10_000
+
+# Environment for the app under test: no background threads, no mail, and
+# limits that a benchmark would otherwise trip over.
+BENCH_ENV = {
+    "OUTBOX_WORKER": "false",
+    "MAIL_BACKEND": "console",
+    "RETENTION_INTERVAL_HOURS": "0",
+    "RATE_LIMIT_BACKEND": "memory",
+    "LOGIN_LIMIT_PER_IP": "1000000/1",
+    "FLASK_SECRET_KEY": "bench",
+}
+
+# name -> (method, path, needs admin). {item} is a random approved item id.
+ROUTES = {
+    "home": ("GET", "/", False),
+    "browse": ("GET", "/browse", False),
+    "browse_q": ("GET", "/browse?q={word}", False),
+    "map": ("GET", "/map", False),
+    "admin": ("GET", "/admin", True),
+    "report_found": ("POST", "/report-found", False),
+    "claim": ("POST", "/claim/{item}", False),
+}
+READ_ROUTES = ["home", "browse", "browse_q", "map", "admin"]
+WRITE_ROUTES = ["report_found", "claim"]  # run last: they invalidate caches
+
+ADJECTIVES = ["black", "blue", "red", "green", "silver", "grey", "pink", "white", "small", "large", "old", "new"]
+THINGS = {
+    "Electronics": ["phone", "charger", "earbuds", "calculator", "laptop", "headphones", "tablet"],
+    "Clothing": ["hoodie", "jacket", "scarf", "beanie", "sweater", "cap", "glove"],
+    "Accessories": ["wallet", "watch", "keys", "lanyard", "sunglasses", "bracelet", "ring"],
+    "Bags": ["backpack", "tote", "lunchbox", "pouch", "duffel"],
+    "School Supplies": ["binder", "notebook", "textbook", "pencil case", "planner"],
+    "Sports": ["water bottle", "cleats", "racket", "ball", "shin guards"],
+}
+NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Riley", "Casey", "Morgan", "Jamie", "Avery", "Quinn"]
+
+
+# -------------------
+# Seeding
+# -------------------
+def _prepare_env(data_dir: Path) -> None:
+    """Point the app at data_dir. Must run before app is imported."""
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ["ADMIN_FILE"] = str(data_dir / "admin.json")
+    os.chdir(data_dir)
+    if str(REPO) not in sys.path:
+        sys.path.insert(0, str(REPO))
+
+
+def _sample_images(upload_dir: Path, count: int) -> list[tuple[str, str | None]]:
+    """Write `count` distinct JPEGs into the blob store; [(name, renditions json)]."""
+    if Image is None or count <= 0:
+        return []
+    import blobstore
+    import images
+
+    photos = []
+    rng = random.Random(7)
+    for _ in range(count):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        buffer = io.BytesIO()
+        Image.new("RGB", (1600, 1200), color).save(buffer, "JPEG", quality=85)
+        buffer.seek(0)
+        upload = blobstore.receive(_Upload(buffer), upload_dir, "jpg")
+        name = upload.place()
+        renditions = images.make_renditions(upload_dir, name)
+        photos.append((name, json.dumps(renditions) if renditions else None))
+    return photos
+
+
+class _Upload:
+    """The one attribute of a werkzeug FileStorage that blobstore.receive reads."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+
+def _item_rows(count: int, photos: list, rng: random.Random):
+    import locations
+
+    today = date.today()
+    places = [loc for loc in locations.LOCATIONS if loc["id"] != locations.UNKNOWN_ID]
+    for _ in range(count):
+        category = rng.choice(list(THINGS))
+        thing = rng.choice(THINGS[category])
+        place = rng.choice(places)
+        found = today - timedelta(days=int(rng.expovariate(1 / 60)))
+        photo = rng.choice(photos) if photos and rng.random() < 0.6 else (None, None)
+        status = rng.choices(["approved", "claimed", "pending", "rejected"], [70, 18, 10, 2])[0]
+        yield (
+            f"{rng.choice(ADJECTIVES).title()} {thing}",
+            category,
+            place["name"],
+            place["id"],
+            found.isoformat(),
+            f"{rng.randrange(7, 16):02d}:{rng.randrange(60):02d}",
+            f"Found a {rng.choice(ADJECTIVES)} {thing} near the {place['name'].lower()}.",
+            photo[0],
+            photo[1],
+            status,
+            datetime.combine(found, datetime.min.time()).isoformat(timespec="seconds"),
+        )
+
+
+def _claim_rows(count: int, items: int, now: str, rng: random.Random):
+    for n in range(count):
+        name = rng.choice(NAMES)
+        yield (
+            rng.randrange(1, items + 1),
+            name,
+            f"{name.lower()}{n}@students.example.org",
+            "I think this is mine.",
+            rng.choice(["pending", "approved"]),
+            now,
+        )
+
+
+def _executemany(conn: sqlite3.Connection, sql: str, rows) -> None:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= SEED_BATCH:
+            conn.executemany(sql, batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+
+
+def seed(data_dir: Path, items: int, images_count: int) -> dict:
+    """Create data_dir with `items` found items, items/10 claims and items/20 reviews."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    if (data_dir / "lostandfound.db").exists():
+        raise SystemExit(f"{data_dir} already has a database; delete it to reseed.")
+    _prepare_env(data_dir)
+
+    import credentials
+    import db
+
+    started = time.perf_counter()
+    db.DB_PATH = data_dir / "lostandfound.db"
+    db.init_db()
+    credentials.save_admin({
+        "username": "admin",
+        "email": "",
+        "password_hash": credentials.hash_password(ADMIN_PASSWORD),
+    })
+
+    upload_dir = data_dir / "uploads"
+    upload_dir.mkdir(exist_ok=True)
+    photos = _sample_images(upload_dir, images_count)
+
+    rng = random.Random(42)
+    conn = db.get_pool().acquire()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _executemany(
+            conn,
+            """
+            INSERT INTO found_items (
+                title, category, location_found, location_id, date_found, time_found,
+                description, photo_filename, photo_renditions, status, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            _item_rows(items, photos, rng),
+        )
+        now = datetime.now().isoformat(timespec="seconds")
+        _executemany(
+            conn,
+            "INSERT INTO claims (item_id, student_name, email, message, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            _claim_rows(items // 10, items, now, rng),
+        )
+        _executemany(
+            conn,
+            "INSERT INTO reviews (message, rating, created_at) VALUES (?, ?, ?)",
+            (("Found my stuff quickly, thanks!", rng.randrange(1, 6), now) for _ in range(items // 20)),
+        )
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    return {
+        "dir": str(data_dir),
+        "items": items,
+        "claims": items // 10,
+        "reviews": items // 20,
+        "images": len(photos),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+# -------------------
+# Request plans
+# -------------------
+def _sample_ids(data_dir: Path, limit: int = 2000) -> list[int]:
+    conn = sqlite3.connect(data_dir / "lostandfound.db")
+    try:
+        rows = conn.execute(
+            "SELECT id FROM found_items WHERE status = 'approved' ORDER BY random() LIMIT ?", (limit,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows] or [1]
+
+
+def _sample_photo() -> bytes:
+    if Image is None:
+        return b""
+    buffer = io.BytesIO()
+    Image.new("RGB", (1200, 900), (200, 120, 40)).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def _form(route: str, n: int, photo: bytes) -> tuple[dict, dict]:
+    """(fields, files) for a write route; each report gets a distinct title."""
+    if route == "report_found":
+        fields = {
+            "title": f"Bench umbrella {n}",
+            "category": "Accessories",
+            "location_id": "gym",
+            "date_found": date.today().isoformat(),
+            "description": "Left on the bleachers after practice.",
+        }
+        return fields, ({"photo": ("photo.jpg", photo)} if photo else {})
+    return {"student_name": "Bench Student", "email": "bench@students.example.org",
+            "message": "That one is mine."}, {}
+
+
+def _multipart(fields: dict, files: dict) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    out = io.BytesIO()
+    for name, value in fields.items():
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data) in files.items():
+        out.write(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n".encode()
+        )
+        out.write(data + b"\r\n")
+    out.write(f"--{boundary}--\r\n".encode())
+    return out.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+
+def _path(route: str, rng: random.Random, ids: list[int]) -> str:
+    word = rng.choice([thing for things in THINGS.values() for thing in things])
+    return ROUTES[route][1].format(word=quote_plus(word), item=rng.choice(ids))
+
+
+# -------------------
+# Drivers
+# -------------------
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _summary(route, mode, clients, timings, errors, elapsed, peak_rss_kb) -> dict:
+    ms = sorted(t * 1000 for t in timings)
+    return {
+        "route": route,
+        "mode": mode,
+        "clients": clients,
+        "requests": len(timings),
+        "errors": errors,
+        "p50_ms": round(_percentile(ms, 50), 3),
+        "p95_ms": round(_percentile(ms, 95), 3),
+        "p99_ms": round(_percentile(ms, 99), 3),
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "throughput_rps": round(len(timings) / elapsed, 1) if elapsed else 0.0,
+        "peak_rss_kb": peak_rss_kb,
+    }
+
+
+def _self_peak_rss_kb() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes
+
+
+def _proc_peak_rss_kb(pid: int) -> int | None:
+    """Peak RSS of pid plus its children (e.g. gunicorn workers), Linux only."""
+    total = None
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                total = int(line.split()[1])
+        children = Path(f"/proc/{pid}/task/{pid}/children").read_text().split()
+    except OSError:
+        return total
+    for child in children:
+        total = (total or 0) + (_proc_peak_rss_kb(int(child)) or 0)
+    return total
+
+
+def _ok(method: str, status: int, location: str | None) -> bool:
+    # Pages must render; form posts redirect to /browse only once they succeed
+    # (a validation failure or a login redirect goes elsewhere).
+    if method == "GET":
+        return status == 200
+    return status == 302 and (location or "").split("?", 1)[0].endswith("/browse")
+
+
+def _run_pool(clients: int, requests: int, one) -> tuple[list[float], int, float]:
+    """Call one(n) `requests` times from `clients` threads; (timings, errors, elapsed)."""
+    timings, errors = [], 0
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        nonlocal errors
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            started = time.perf_counter()
+            try:
+                ok = one(n)
+            except (OSError, http.client.HTTPException):
+                ok = False
+            took = time.perf_counter() - started
+            with lock:
+                timings.append(took)
+                errors += not ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        for _ in range(clients):
+            pool.submit(worker)
+    return timings, errors, time.perf_counter() - started
+
+
+def run_client(data_dir: Path, routes, clients_list, requests, warmup) -> list[dict]:
+    """Drive the app in-process through Flask's test client."""
+    _prepare_env(data_dir)
+    import db
+    from app import create_app
+
+    db.DB_PATH = data_dir / "lostandfound.db"
+    app = create_app()
+    ids = _sample_ids(data_dir)
+    photo = _sample_photo()
+
+    local = threading.local()
+
+    def client(admin: bool):
+        key = "admin" if admin else "anon"
+        if not hasattr(local, key):
+            c = app.test_client()
+            if admin:
+                with c.session_transaction() as session:
+                    session["is_admin"] = True
+            setattr(local, key, c)
+        return getattr(local, key)
+
+    results = []
+    for route in routes:
+        method, _, admin = ROUTES[route]
+        for clients in clients_list:
+            rng = random.Random(route)
+
+            def one(n):
+                c = client(admin)
+                path = _path(route, rng, ids)
+                if method == "GET":
+                    response = c.get(path)
+                else:
+                    fields, files = _form(route, n, photo)
+                    data = dict(fields)
+                    data.update({k: (io.BytesIO(v), name) for k, (name, v) in files.items()})
+                    response = c.post(path, data=data, content_type="multipart/form-data")
+                return _ok(method, response.status_code, response.location)
+
+            _run_pool(clients, warmup, one)
+            timings, errors, elapsed = _run_pool(clients, requests, one)
+            results.append(_summary(route, "client", clients, timings, errors, elapsed, _self_peak_rss_kb()))
+            _report(results[-1])
+    return results
+
+
+def serve(data_dir: Path, host: str, port: int) -> None:
+    """Serve the bench dataset with werkzeug's threaded WSGI server."""
+    import logging
+
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request access log
+    _prepare_env(data_dir)
+    import db
+    from app import create_app
+
+    db.DB_PATH = data_dir / "lostandfound.db"
+    server = make_server(host, port, create_app(), threaded=True)
+    print(f"ready {server.port}", flush=True)
+    server.serve_forever()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_gunicorn(data_dir: Path, workers: int | None, threads: int | None) -> tuple[subprocess.Popen, int]:
+    """gunicorn with the bundled gunicorn.conf.py, serving the dataset."""
+    port = _free_port()
+    env = {**BENCH_ENV, **os.environ, "ADMIN_FILE": str(data_dir / "admin.json"),
+           "METRICS_DIR": str(data_dir / "metrics"), "GUNICORN_ACCESS_LOG": ""}
+    command = [sys.executable, "-m", "gunicorn", "-c", str(REPO / "gunicorn.conf.py"),
+               "--pythonpath", str(REPO), "--bind", f"127.0.0.1:{port}"]
+    if workers:
+        command += ["--workers", str(workers)]
+    if threads:
+        command += ["--threads", str(threads)]
+    with open(data_dir / "gunicorn.log", "ab") as log_file:
+        proc = subprocess.Popen(command + ["wsgi:app"], cwd=data_dir, env=env, stderr=log_file)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"gunicorn exited; see {data_dir / 'gunicorn.log'}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit(f"gunicorn did not start; see {data_dir / 'gunicorn.log'}")
+
+
+def _wait_ready(proc: subprocess.Popen) -> int:
+    line = proc.stdout.readline()
+    if not line.startswith("ready"):
+        proc.kill()
+        raise SystemExit(f"bench server failed to start: {line.strip() or proc.wait()}")
+    return int(line.split()[1])
+
+
+def _admin_cookie(host: str, port: int) -> str:
+    body = f"username=admin&password={ADMIN_PASSWORD}".encode()
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        conn.request("POST", "/login/admin", body, {"Content-Type": "application/x-www-form-urlencoded"})
+        response = conn.getresponse()
+        response.read()
+        cookie = response.getheader("Set-Cookie") or ""
+    finally:
+        conn.close()
+    if "session=" not in cookie or response.status != 302:
+        raise SystemExit("Could not log in as the bench admin; was the dataset seeded by bench.py?")
+    return cookie.split(";", 1)[0]
+
+
+def run_wsgi(data_dir: Path, routes, clients_list, requests, warmup, url: str | None, pid: int | None,
+             server: str = "werkzeug", workers: int | None = None, threads: int | None = None) -> list[dict]:
+    """Drive a real server over HTTP: one we start (werkzeug or gunicorn), or --url."""
+    proc = None
+    if url:
+        host, _, port = url.split("://", 1)[-1].rstrip("/").partition(":")
+        port = int(port or 80)
+    elif server == "gunicorn":
+        host = "127.0.0.1"
+        proc, port = _start_gunicorn(data_dir, workers, threads)
+        pid = proc.pid
+    else:
+        host = "127.0.0.1"
+        proc = subprocess.Popen(
+            [sys.executable, str(REPO / "bench.py"), "serve", "--dir", str(data_dir), "--port", "0"],
+            stdout=subprocess.PIPE, text=True,
+        )
+        port = _wait_ready(proc)
+        pid = proc.pid
+    try:
+        ids = _sample_ids(data_dir)
+        photo = _sample_photo()
+        admin_cookie = _admin_cookie(host, port) if any(ROUTES[r][2] for r in routes) else ""
+        local = threading.local()
+
+        results = []
+        for route in routes:
+            method, _, admin = ROUTES[route]
+            for clients in clients_list:
+                rng = random.Random(route)
+
+                def one(n):
+                    headers = {"Cookie": admin_cookie} if admin else {}
+                    body = None
+                    if method == "POST":
+                        body, headers["Content-Type"] = _multipart(*_form(route, n, photo))
+                    path = _path(route, rng, ids)
+                    # One keep-alive connection per client thread. A reused one the
+                    # server closed while idle (e.g. a recycled worker) is retried once.
+                    while True:
+                        reused = getattr(local, "conn", None) is not None
+                        conn = local.conn = local.conn if reused else http.client.HTTPConnection(host, port, timeout=60)
+                        try:
+                            conn.request(method, path, body, headers)
+                            response = conn.getresponse()
+                            response.read()
+                            break
+                        except (OSError, http.client.HTTPException) as exc:
+                            conn.close()
+                            local.conn = None
+                            stale = isinstance(exc, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                            if not (reused and stale):
+                                raise
+                    if response.will_close:
+                        conn.close()
+                        local.conn = None
+                    return _ok(method, response.status, response.getheader("Location"))
+
+                _run_pool(clients, warmup, one)
+                timings, errors, elapsed = _run_pool(clients, requests, one)
+                rss = _proc_peak_rss_kb(pid) if pid else None
+                results.append(_summary(route, "wsgi", clients, timings, errors, elapsed, rss))
+                results[-1]["server"] = url or server
+                _report(results[-1])
+        return results
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+
+# -------------------
+# Results
+# -------------------
+def _report(result: dict) -> None:
+    rss = f"{result['peak_rss_kb'] // 1024} MB" if result["peak_rss_kb"] else "-"
+    print(
+        f"{result['route']:<13} {result['mode']:<6} c={result['clients']:<3} "
+        f"p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  p99 {result['p99_ms']:>8.2f} ms  "
+        f"{result['throughput_rps']:>8.1f} req/s  rss {rss}  errors {result['errors']}",
+        file=sys.stderr,
+    )
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _meta(data_dir: Path, args) -> dict:
+    conn = sqlite3.connect(data_dir / "lostandfound.db")
+    try:
+        counts = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("found_items", "claims", "reviews")}
+    finally:
+        conn.close()
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "dataset": str(data_dir),
+        "rows": counts,
+        "mode": args.mode,
+        "server": args.server if args.mode == "wsgi" and not args.url else None,
+        "workers": args.workers,
+        "threads": args.threads,
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "env": {key: os.environ.get(key, value) for key, value in BENCH_ENV.items()},
+    }
+
+
+def compare(old_path: Path, new_path: Path, metric: str, threshold: float) -> int:
+    """Print per-route changes; returns 1 if any got slower than threshold %."""
+    old = {(r["route"], r["mode"], r["clients"]): r for r in json.loads(old_path.read_text())["results"]}
+    new = json.loads(new_path.read_text())["results"]
+    higher_is_better = metric == "throughput_rps"
+    regressions = 0
+    for result in new:
+        key = (result["route"], result["mode"], result["clients"])
+        if key not in old or not old[key][metric]:
+            print(f"{key[0]:<13} {key[1]:<6} c={key[2]:<3} (new)")
+            continue
+        before, after = old[key][metric], result[metric]
+        change = (after - before) / before * 100
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif worse < -threshold:
+            flag = "  faster"
+        print(f"{key[0]:<13} {key[1]:<6} c={key[2]:<3} {metric} {before:>10.2f} -> {after:>10.2f} ({change:+.1f}%){flag}")
+    return 1 if regressions else 0
+
+
+# -------------------
+# CLI
+# -------------------
+def _data_dir(args) -> Path:
+    return Path(args.dir or REPO / "bench_data" / args.size).resolve()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def dataset_args(p):
+        p.add_argument("--size", choices=SIZES, default="1k")
+        p.add_argument("--dir", help="Dataset directory (default: bench_data/<size>).")
+
+    p = sub.add_parser("seed", help="Create a synthetic dataset.")
+    dataset_args(p)
+    p.add_argument("--items", type=int, help="Override the item count for --size.")
+    p.add_argument("--images", type=int, default=50, help="Distinct sample photos (needs Pillow).")
+
+    p = sub.add_parser("run", help="Benchmark the routes against a seeded dataset.")
+    dataset_args(p)
+    p.add_argument("--mode", choices=["client", "wsgi"], default="client",
+                   help="Flask test client in-process, or HTTP against a real WSGI server.")
+    p.add_argument("--routes", default=",".join(READ_ROUTES + WRITE_ROUTES))
+    p.add_argument("--clients", default="1", help="Comma-separated concurrency levels, e.g. 1,8,32.")
+    p.add_argument("--requests", type=int, default=200, help="Measured requests per route and level.")
+    p.add_argument("--warmup", type=int, default=20)
+    p.add_argument("--url", help="wsgi mode: benchmark this running server instead of starting one.")
+    p.add_argument("--pid", type=int, help="wsgi mode with --url: server pid, for peak RSS.")
+    p.add_argument("--server", choices=["werkzeug", "gunicorn"], default="werkzeug",
+                   help="wsgi mode: werkzeug's threaded server, or gunicorn with gunicorn.conf.py.")
+    p.add_argument("--workers", type=int, help="gunicorn workers (default: gunicorn.conf.py).")
+    p.add_argument("--threads", type=int, help="gunicorn threads per worker.")
+    p.add_argument("--output", "-o", help="Write results as JSON here (default: stdout).")
+
+    p = sub.add_parser("serve", help=argparse.SUPPRESS)
+    dataset_args(p)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=0)
+
+    p = sub.add_parser("compare", help="Compare two result files.")
+    p.add_argument("old", type=Path)
+    p.add_argument("new", type=Path)
+    p.add_argument("--metric", default="p95_ms",
+                   choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms", "throughput_rps", "peak_rss_kb"])
+    p.add_argument("--threshold", type=float, default=10.0, help="Percent change counted as a regression.")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        return compare(args.old, args.new, args.metric, args.threshold)
+
+    data_dir = _data_dir(args)
+    if args.command == "seed":
+        print(json.dumps(seed(data_dir, args.items or SIZES[args.size], args.images), indent=2))
+        return 0
+    if not (data_dir / "lostandfound.db").exists():
+        parser.error(f"no dataset in {data_dir}; run: python bench.py seed --size {args.size}")
+    if args.command == "serve":
+        serve(data_dir, args.host, args.port)
+        return 0
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = [r for r in routes if r not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+    routes.sort(key=lambda r: r in WRITE_ROUTES)
+    clients_list = [int(c) for c in args.clients.split(",")]
+
+    meta = _meta(data_dir, args)
+    if args.mode == "wsgi":
+        results = run_wsgi(data_dir, routes, clients_list, args.requests, args.warmup, args.url, args.pid,
+                           args.server, args.workers, args.threads)
+    else:
+        results = run_client(data_dir, routes, clients_list, args.requests, args.warmup)
+
+    output = json.dumps({"meta": meta, "results": results}, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
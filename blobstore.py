@@ -0,0 +1,162 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import db
+import images
+import instrumentation
+import metrics
+
+# Uploaded photos are stored content-addressed: uploads/ab/cd/<sha256>.<ext>,
+# hashed as received (the stored copy has its metadata stripped).
+# Identical photos share one file, and found_items.photo_filename holds the
+# relative blob name. The blobs table keeps a reference count per name that
+# triggers on found_items maintain (migration 8).
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+CHUNK_SIZE = 64 * 1024
+
+# Unreferenced blobs younger than this are left alone: a concurrent upload may
+# have placed the file but not yet committed the row that references it.
+BLOB_GC_GRACE = float(os.getenv("BLOB_GC_GRACE", "3600"))  # seconds
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class ReceivedUpload:
+    """An upload streamed to a temp file, ready to be moved into the store."""
+
+    def __init__(self, folder: Path, temp_path: Path, digest: str, ext: str, size: int):
+        self.folder = folder
+        self.temp_path = temp_path
+        self.size = size
+        self.name = f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+    @property
+    def path(self) -> Path:
+        return self.folder / self.name
+
+    def place(self) -> str:
+        """Atomically move the temp file to its content address; returns the blob name.
+
+        Photo metadata (EXIF GPS and the like) is stripped first, so the stored
+        original is safe to serve. Raises images.ImageProcessingError if the
+        upload is not a readable image; the temp file is then discarded.
+        """
+        try:
+            images.strip_metadata(self.temp_path)
+        except images.ImageProcessingError:
+            self.temp_path.unlink(missing_ok=True)
+            raise
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Replacing an existing identical blob is harmless and refreshes its
+        # mtime, which keeps the GC grace period from racing this upload.
+        os.replace(self.temp_path, self.path)
+        return self.name
+
+
+def receive(file_storage, folder: Path, ext: str, max_bytes: int | None = None) -> ReceivedUpload:
+    """Stream an uploaded file to disk while hashing it, enforcing max_bytes."""
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    tmp_dir = folder / ".tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_name = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+    temp_path = Path(temp_name)
+    try:
+        with instrumentation.timed("upload"), os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    metrics.UPLOADS.inc(1, "too_large")
+                    raise UploadTooLarge(f"Upload exceeds {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    metrics.UPLOADS.inc(1, "received")
+    metrics.UPLOAD_BYTES.inc(size)
+    return ReceivedUpload(folder, temp_path, digest.hexdigest(), ext.lower(), size)
+
+
+def refcount(conn: sqlite3.Connection, name: str) -> int:
+    row = conn.execute("SELECT refcount FROM blobs WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def delete_files(folder: Path, name: str) -> None:
+    (folder / name).unlink(missing_ok=True)
+    images.remove_renditions(
+        folder, {size: images.rendition_name(name, size) for size in images.RENDITIONS}
+    )
+
+
+def move_to_cold(folder: Path, cold_folder: Path, name: str) -> int:
+    """Move an original to cold storage; renditions are dropped. Returns bytes moved."""
+    source = folder / name
+    if not source.exists():
+        return 0
+    target = cold_folder / name
+    target.parent.mkdir(parents=True, exist_ok=True)
+    size = source.stat().st_size
+    shutil.move(source, target)
+    delete_files(folder, name)
+    return size
+
+
+def release(conn: sqlite3.Connection, folder: Path, names, grace: float | None = None) -> int:
+    """Delete blobs in `names` that nothing references any more.
+
+    Call after committing the transaction that dropped the references.
+    Returns the number of blobs removed.
+    """
+    removed = 0
+    cutoff = time.time() - (BLOB_GC_GRACE if grace is None else grace)
+    for name in {n for n in names if n}:
+        if refcount(conn, name) > 0:
+            continue
+        path = folder / name
+        try:
+            if path.stat().st_mtime > cutoff:
+                continue
+        except FileNotFoundError:
+            pass
+        delete_files(folder, name)
+        conn.execute("DELETE FROM blobs WHERE name = ? AND refcount <= 0", (name,))
+        removed += 1
+    conn.commit()
+    return removed
+
+
+def collect_garbage(conn: sqlite3.Connection, folder: Path, grace: float | None = None) -> int:
+    """Sweep unreferenced blobs and abandoned temp files."""
+    names = [row[0] for row in conn.execute("SELECT name FROM blobs WHERE refcount <= 0")]
+    removed = release(conn, folder, names, grace)
+
+    cutoff = time.time() - (BLOB_GC_GRACE if grace is None else grace)
+    for temp_path in (folder / ".tmp").glob("*.part"):
+        if temp_path.stat().st_mtime < cutoff:
+            temp_path.unlink(missing_ok=True)
+    return removed
+
+
+def init_app(app) -> None:
+    # Let Werkzeug reject oversized requests from Content-Length before any
+    # body is read; leave headroom for the other form fields.
+    app.config.setdefault("MAX_CONTENT_LENGTH", MAX_UPLOAD_BYTES + 1024 * 1024)
+
+    @app.cli.command("blobs-gc")
+    def blobs_gc_command():
+        """Delete unreferenced photo blobs and stale partial uploads."""
+        removed = collect_garbage(db.get_conn(), Path(app.config["UPLOAD_FOLDER"]))
+        print(f"Removed {removed} unreferenced blobs.")
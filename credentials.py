@@ -0,0 +1,216 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import db
+from passwords import hash_password
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes stay atomic, just not serialized across processes
+    fcntl = None
+
+# Admin credentials. "file" keeps them in ADMIN_FILE (the original admin.json);
+# "sqlite" keeps them in the admins table next to the student accounts.
+ADMIN_STORE = os.getenv("ADMIN_STORE", "file").lower()
+ADMIN_FILE = Path(os.getenv("ADMIN_FILE", "admin.json"))
+
+
+def default_admin() -> dict:
+    return {
+        "username": "admin",
+        "email": os.getenv("ADMIN_EMAIL", ""),
+        "password_hash": hash_password("admin123"),  # change after first login
+    }
+
+
+class FileCredentialStore:
+    """admin.json with an in-memory copy that is re-read only when the file changes.
+
+    Writes go to a temp file that replaces the original, under an exclusive
+    lock, so readers never see a truncated file and concurrent writers in
+    other workers don't interleave.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._cache = (None, None)   # (stat key, parsed file), swapped as one
+        self._mutex = threading.Lock()
+
+    @staticmethod
+    def _stat_key(st) -> tuple:
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    @contextmanager
+    def _locked(self):
+        with self._mutex, open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self) -> dict | None:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        cached_stat, cached = self._cache
+        if cached is not None and cached_stat == self._stat_key(st):
+            return cached
+        with open(self.path, "r") as f:
+            admin = json.load(f)
+            self._cache = (self._stat_key(os.fstat(f.fileno())), admin)
+        return admin
+
+    def _write(self, admin: dict) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent or ".", prefix=f".{self.path.name}.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(admin, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._cache = (self._stat_key(os.stat(self.path)), dict(admin))
+
+    def load(self) -> dict:
+        admin = self._read()
+        if admin is None or "email" not in admin:
+            # First run, or a file from before the email field existed.
+            with self._locked():
+                admin = self._read()
+                if admin is None:
+                    admin = default_admin()
+                    self._write(admin)
+                elif "email" not in admin:
+                    admin = {**admin, "email": os.getenv("ADMIN_EMAIL", "")}
+                    self._write(admin)
+        return dict(admin)
+
+    def save(self, admin: dict) -> None:
+        with self._locked():
+            self._write(admin)
+
+    def update(self, **fields) -> dict:
+        """Read-modify-write under the lock, so concurrent updates don't lose fields."""
+        self.load()
+        with self._locked():
+            admin = {**self._read(), **fields}
+            self._write(admin)
+        return dict(admin)
+
+
+class SQLiteCredentialStore:
+    """Admin accounts in the admins table (migration 13).
+
+    The first load imports an existing admin.json, if there is one.
+    """
+
+    def __init__(self, import_from: Path | None = None):
+        self.import_from = import_from
+
+    def _first_admin(self, conn):
+        return conn.execute(
+            "SELECT username, email, password_hash FROM admins ORDER BY id LIMIT 1"
+        ).fetchone()
+
+    def load(self) -> dict:
+        conn = db.get_conn()
+        try:
+            row = self._first_admin(conn)
+            if row is None:
+                if self.import_from and self.import_from.exists():
+                    seed = FileCredentialStore(self.import_from).load()
+                else:
+                    seed = default_admin()
+                self._upsert(conn, seed, insert_only=True)
+                conn.commit()
+                row = self._first_admin(conn)
+        finally:
+            conn.close()
+        return {"username": row["username"], "email": row["email"] or "", "password_hash": row["password_hash"]}
+
+    def _upsert(self, conn, admin: dict, insert_only: bool = False) -> None:
+        conflict = "DO NOTHING" if insert_only else (
+            "DO UPDATE SET email = excluded.email, password_hash = excluded.password_hash, "
+            "updated_at = excluded.updated_at"
+        )
+        conn.execute(
+            f"""
+            INSERT INTO admins (username, email, password_hash, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(username) {conflict}
+            """,
+            (
+                admin["username"],
+                admin.get("email", ""),
+                admin["password_hash"],
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+
+    def save(self, admin: dict) -> None:
+        conn = db.get_conn()
+        try:
+            self._upsert(conn, admin)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def update(self, **fields) -> dict:
+        """Set only the given columns, so concurrent updates don't clobber each other."""
+        admin = self.load()
+        columns = [name for name in ("email", "password_hash") if name in fields]
+        if not columns:
+            return admin
+        conn = db.get_conn()
+        try:
+            conn.execute(
+                f"UPDATE admins SET {', '.join(f'{name} = ?' for name in columns)}, updated_at = ? "
+                "WHERE username = ?",
+                [fields[name] for name in columns]
+                + [datetime.now().isoformat(timespec="seconds"), admin["username"]],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return {**admin, **{name: fields[name] for name in columns}}
+
+
+def make_store():
+    if ADMIN_STORE == "sqlite":
+        return SQLiteCredentialStore(import_from=ADMIN_FILE)
+    return FileCredentialStore(ADMIN_FILE)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = make_store()
+    return _store
+
+
+def load_admin() -> dict:
+    """Current admin credentials (username, email, password_hash)."""
+    return get_store().load()
+
+
+def save_admin(admin: dict) -> None:
+    get_store().save(admin)
+
+
+def update_admin(**fields) -> dict:
+    return get_store().update(**fields)
@@ -1,7 +1,71 @@
+import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
+from flask import g, has_app_context
+
+import instrumentation
+import locations
+
+try:
+    import fcntl
+except ImportError:  # Windows: migrations still serialize on BEGIN IMMEDIATE
+    fcntl = None
+
 DB_PATH = Path("lostandfound.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+# Storage tuning (see https://www.sqlite.org/pragma.html)
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-20000"))         # negative = KiB
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+DB_TEMP_STORE = os.getenv("DB_TEMP_STORE", "MEMORY")
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_WAL_AUTOCHECKPOINT = int(os.getenv("DB_WAL_AUTOCHECKPOINT", "1000"))  # pages
+DB_JOURNAL_SIZE_LIMIT = int(os.getenv("DB_JOURNAL_SIZE_LIMIT", str(64 * 1024 * 1024)))
+DB_MAINTENANCE_INTERVAL = float(os.getenv("DB_MAINTENANCE_INTERVAL", "300"))  # seconds, 0 = off
+
+_PRAGMA_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+
+def _choice(name: str, value: str) -> str:
+    value = value.strip().upper()
+    if value not in _PRAGMA_CHOICES[name]:
+        raise ValueError(f"Unsupported {name} value: {value!r}")
+    return value
+
+
+def apply_connection_pragmas(conn: sqlite3.Connection) -> None:
+    """Per-connection settings; these do not persist in the database file."""
+    # Off by default in SQLite; the ON DELETE CASCADE clauses depend on it.
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA synchronous = {_choice('synchronous', DB_SYNCHRONOUS)}")
+    conn.execute(f"PRAGMA cache_size = {DB_CACHE_SIZE}")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA temp_store = {_choice('temp_store', DB_TEMP_STORE)}")
+    conn.execute(f"PRAGMA wal_autocheckpoint = {DB_WAL_AUTOCHECKPOINT}")
+    conn.execute(f"PRAGMA journal_size_limit = {DB_JOURNAL_SIZE_LIMIT}")
+
+
+def database_pragmas_applied(conn: sqlite3.Connection) -> bool:
+    mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    return mode.upper() == _choice("journal_mode", DB_JOURNAL_MODE)
+
+
+def apply_database_pragmas(conn: sqlite3.Connection) -> str:
+    """Persistent settings stored in the database file. Returns the journal mode."""
+    mode = _choice("journal_mode", DB_JOURNAL_MODE)
+    return conn.execute(f"PRAGMA journal_mode = {mode}").fetchone()[0]
 
 SCHEMA = """
 PRAGMA foreign_keys = ON;
@@ -59,34 +123,925 @@ CREATE TABLE IF NOT EXISTS password_resets (
 );
 """
 
+# -------------------
+# Connection pool
+# -------------------
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to the pool."""
+
+    pool = None
+    request_bound = False
+
+    def execute(self, sql, parameters=()):
+        if not instrumentation.INSTRUMENT:
+            return super().execute(sql, parameters)
+        return self.cursor(instrumentation.TimedCursor).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not instrumentation.INSTRUMENT:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor(instrumentation.TimedCursor).executemany(sql, seq_of_parameters)
+
+    def close(self) -> None:
+        # Request-bound connections are returned on teardown, so the
+        # `finally: conn.close()` blocks in the routes are safe to keep.
+        if self.request_bound:
+            return
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def discard(self) -> None:
+        self.pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of sqlite connections to a single database file."""
+
+    def __init__(self, path, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        self.path = Path(path)
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._idle = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self._stats = {"created": 0, "reused": 0, "waits": 0, "timeouts": 0, "discarded": 0}
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            factory=PooledConnection,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        apply_connection_pragmas(conn)
+        conn.pool = self
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        with self._cond:
+            if self._idle:
+                self._stats["reused"] += 1
+                return self._idle.pop()
+            if self._open >= self.size:
+                self._stats["waits"] += 1
+                if not self._cond.wait_for(
+                    lambda: self._idle or self._open < self.size, self.timeout
+                ):
+                    self._stats["timeouts"] += 1
+                    raise sqlite3.OperationalError(
+                        f"connection pool exhausted ({self.size} connections in use)"
+                    )
+                if self._idle:
+                    self._stats["reused"] += 1
+                    return self._idle.pop()
+            self._open += 1
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def release(self, conn: PooledConnection) -> None:
+        conn.request_bound = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            healthy = True
+        except sqlite3.Error:
+            healthy = False
+
+        with self._cond:
+            if healthy:
+                self._idle.append(conn)
+            else:
+                self._open -= 1
+                self._stats["discarded"] += 1
+            self._cond.notify()
+        if not healthy:
+            conn.discard()
+
+    def close_all(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            conn.discard()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "path": str(self.path),
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                **self._stats,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        # A forked worker must not reuse sockets/file handles from its parent,
+        # and tests may point DB_PATH somewhere else between app instances.
+        if _pool is None or _pool.pid != os.getpid() or _pool.path != Path(DB_PATH):
+            _pool = ConnectionPool(DB_PATH)
+        return _pool
+
+
+def pool_stats() -> dict:
+    return get_pool().stats()
+
+
 def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Return a pooled connection.
 
-def init_db() -> None:
-    conn = get_conn()
+    Inside a Flask app context the same connection is reused for the rest of
+    the request and handed back to the pool on teardown; outside of one the
+    caller's close() returns it to the pool.
+    """
+    if has_app_context():
+        conn = g.get("_db_conn")
+        if conn is None:
+            with instrumentation.timed("pool"):
+                conn = get_pool().acquire()
+            conn.request_bound = True
+            g._db_conn = conn
+        return conn
+    return get_pool().acquire()
+
+
+def release_request_conn(exc=None) -> None:
+    conn = g.pop("_db_conn", None)
+    if conn is not None and conn.pool is not None:
+        conn.pool.release(conn)
+    maybe_run_maintenance()
+
+
+# -------------------
+# Maintenance (WAL checkpoint + planner statistics)
+# -------------------
+_maintenance_lock = threading.Lock()
+_last_maintenance = time.monotonic()
+
+
+def run_maintenance(mode: str = "PASSIVE") -> dict:
+    """Checkpoint the WAL back into the main file and refresh planner stats."""
+    mode = mode.upper()
+    if mode not in {"PASSIVE", "FULL", "RESTART", "TRUNCATE"}:
+        raise ValueError(f"Unsupported checkpoint mode: {mode!r}")
+    conn = get_pool().acquire()
     try:
-        conn.executescript(SCHEMA)
-        found_item_columns = {
-            row["name"] for row in conn.execute("PRAGMA table_info(found_items)").fetchall()
-        }
-        if "time_found" not in found_item_columns:
-            conn.execute("ALTER TABLE found_items ADD COLUMN time_found TEXT")
-
-        claim_columns = {
-            row["name"] for row in conn.execute("PRAGMA table_info(claims)").fetchall()
-        }
-        if "status" not in claim_columns:
-            conn.execute(
-                "ALTER TABLE claims ADD COLUMN status TEXT NOT NULL DEFAULT 'pending'"
-            )
-        if "pickup_location" not in claim_columns:
-            conn.execute("ALTER TABLE claims ADD COLUMN pickup_location TEXT")
-        if "approved_at" not in claim_columns:
-            conn.execute("ALTER TABLE claims ADD COLUMN approved_at TEXT")
-        conn.commit()
+        busy, log_pages, checkpointed = conn.execute(
+            f"PRAGMA wal_checkpoint({mode})"
+        ).fetchone()
+        conn.execute("PRAGMA optimize")
     finally:
         conn.close()
+    return {"busy": busy, "log_pages": log_pages, "checkpointed": checkpointed}
+
+
+def maybe_run_maintenance() -> None:
+    """Run maintenance at most once per DB_MAINTENANCE_INTERVAL per process."""
+    global _last_maintenance
+    if DB_MAINTENANCE_INTERVAL <= 0:
+        return
+    if time.monotonic() - _last_maintenance < DB_MAINTENANCE_INTERVAL:
+        return
+    if not _maintenance_lock.acquire(blocking=False):
+        return
+    try:
+        _last_maintenance = time.monotonic()
+        run_maintenance()
+    except sqlite3.Error:
+        pass  # a busy checkpoint is retried on the next interval
+    finally:
+        _maintenance_lock.release()
+
+
+def init_app(app) -> None:
+    app.teardown_appcontext(release_request_conn)
+
+    @app.cli.command("db-maintain")
+    def db_maintain_command():
+        """Checkpoint and truncate the WAL, then run PRAGMA optimize."""
+        print(run_maintenance("TRUNCATE"))
+
+    @app.cli.command("db-migrate")
+    def db_migrate_command():
+        """Apply pending schema migrations."""
+        conn = get_conn()
+        applied = migrate(conn)
+        print(f"Applied migrations: {applied or 'none'}; "
+              f"schema version {current_schema_version(conn)}")
+
+    @app.cli.command("db-check-plans")
+    def db_check_plans_command():
+        """Fail if a hot query falls back to a full table scan."""
+        failures = check_query_plans()
+        for name, plan in failures.items():
+            print(f"{name}: " + " | ".join(plan))
+        if failures:
+            raise SystemExit(1)
+        print(f"All {len(hot_queries())} hot queries use an index.")
+
+# -------------------
+# Migrations
+# -------------------
+# Append new migrations to MIGRATIONS; never edit or renumber one that has
+# shipped. Each migration runs in its own IMMEDIATE transaction, so workers
+# starting at the same time serialize on the write lock instead of racing.
+SCHEMA_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_version (
+  version INTEGER PRIMARY KEY,
+  name TEXT NOT NULL,
+  applied_at TEXT NOT NULL
+)
+"""
+
+
+def _execute_statements(conn: sqlite3.Connection, sql: str) -> None:
+    """Run a multi-statement script without executescript()'s implicit COMMIT."""
+    statement = ""
+    for line in sql.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if not statement.strip().upper().startswith("PRAGMA"):
+                conn.execute(statement)
+            statement = ""
+
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, ddl: str) -> None:
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def _m001_baseline(conn: sqlite3.Connection) -> None:
+    _execute_statements(conn, SCHEMA)
+
+
+def _m002_found_item_time(conn: sqlite3.Connection) -> None:
+    # Databases created before time_found existed.
+    _add_column(conn, "found_items", "time_found", "TEXT")
+
+
+def _m003_claim_workflow(conn: sqlite3.Connection) -> None:
+    # Databases created before claims could be approved.
+    _add_column(conn, "claims", "status", "TEXT NOT NULL DEFAULT 'pending'")
+    _add_column(conn, "claims", "pickup_location", "TEXT")
+    _add_column(conn, "claims", "approved_at", "TEXT")
+
+
+def _m004_indexes(conn: sqlite3.Connection) -> None:
+    _execute_statements(
+        conn,
+        """
+        -- browse(), map_page(), home() status counts; rowid order comes for free
+        CREATE INDEX IF NOT EXISTS idx_found_items_status ON found_items(status);
+        -- browse() with a category filter
+        CREATE INDEX IF NOT EXISTS idx_found_items_status_category
+          ON found_items(status, category);
+        -- home() today's finds and browse(date=today)
+        CREATE INDEX IF NOT EXISTS idx_found_items_status_date
+          ON found_items(status, date_found, time_found);
+        -- browse() category dropdown (SELECT DISTINCT category)
+        CREATE INDEX IF NOT EXISTS idx_found_items_category ON found_items(category);
+        -- claims join / ON DELETE CASCADE lookups
+        CREATE INDEX IF NOT EXISTS idx_claims_item_id ON claims(item_id);
+        CREATE INDEX IF NOT EXISTS idx_password_resets_user
+          ON password_resets(user_type, user_key);
+        """,
+    )
+
+
+def _m005_fulltext_search(conn: sqlite3.Connection) -> None:
+    # External-content FTS5 index over found_items, kept in sync by triggers.
+    # Builds without FTS5 skip this; search.py then falls back to LIKE.
+    try:
+        conn.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS found_items_fts USING fts5(
+              title, description, location_found,
+              content='found_items', content_rowid='id',
+              tokenize='unicode61 remove_diacritics 2'
+            )
+            """
+        )
+    except sqlite3.OperationalError as exc:
+        if "no such module" in str(exc):
+            return
+        raise
+    _execute_statements(
+        conn,
+        """
+        CREATE TRIGGER IF NOT EXISTS found_items_fts_ai AFTER INSERT ON found_items BEGIN
+          INSERT INTO found_items_fts(rowid, title, description, location_found)
+          VALUES (new.id, new.title, new.description, new.location_found);
+        END;
+        CREATE TRIGGER IF NOT EXISTS found_items_fts_ad AFTER DELETE ON found_items BEGIN
+          INSERT INTO found_items_fts(found_items_fts, rowid, title, description, location_found)
+          VALUES ('delete', old.id, old.title, old.description, old.location_found);
+        END;
+        CREATE TRIGGER IF NOT EXISTS found_items_fts_au
+        AFTER UPDATE OF title, description, location_found ON found_items BEGIN
+          INSERT INTO found_items_fts(found_items_fts, rowid, title, description, location_found)
+          VALUES ('delete', old.id, old.title, old.description, old.location_found);
+          INSERT INTO found_items_fts(rowid, title, description, location_found)
+          VALUES (new.id, new.title, new.description, new.location_found);
+        END;
+        """,
+    )
+    conn.execute("INSERT INTO found_items_fts(found_items_fts) VALUES('rebuild')")
+
+
+def _m006_stats_counters(conn: sqlite3.Connection) -> None:
+    # Dashboard counters for home(), maintained in the writing transaction.
+    _execute_statements(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS stats_counters (
+          name TEXT PRIMARY KEY,
+          value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER IF NOT EXISTS stats_found_items_ai AFTER INSERT ON found_items BEGIN
+          INSERT INTO stats_counters (name, value) VALUES ('found_items', 1), ('found_items:' || new.status, 1)
+          ON CONFLICT(name) DO UPDATE SET value = value + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS stats_found_items_ad AFTER DELETE ON found_items BEGIN
+          UPDATE stats_counters SET value = value - 1
+          WHERE name IN ('found_items', 'found_items:' || old.status);
+        END;
+        CREATE TRIGGER IF NOT EXISTS stats_found_items_au
+        AFTER UPDATE OF status ON found_items WHEN old.status IS NOT new.status BEGIN
+          UPDATE stats_counters SET value = value - 1 WHERE name = 'found_items:' || old.status;
+          INSERT INTO stats_counters (name, value) VALUES ('found_items:' || new.status, 1)
+          ON CONFLICT(name) DO UPDATE SET value = value + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS stats_claims_ai AFTER INSERT ON claims BEGIN
+          INSERT INTO stats_counters (name, value) VALUES ('claims', 1)
+          ON CONFLICT(name) DO UPDATE SET value = value + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS stats_claims_ad AFTER DELETE ON claims BEGIN
+          UPDATE stats_counters SET value = value - 1 WHERE name = 'claims';
+        END;
 
-    
+        DELETE FROM stats_counters;
+        INSERT INTO stats_counters (name, value)
+          SELECT 'found_items', COUNT(*) FROM found_items
+          UNION ALL SELECT 'found_items:' || status, COUNT(*) FROM found_items GROUP BY status
+          UNION ALL SELECT 'claims', COUNT(*) FROM claims;
+        """,
+    )
+
+
+def _m007_photo_renditions(conn: sqlite3.Connection) -> None:
+    # JSON map of rendition name -> file name, written by images.py.
+    _add_column(conn, "found_items", "photo_renditions", "TEXT")
+
+
+def _m008_blob_refcounts(conn: sqlite3.Connection) -> None:
+    # Reference counts for content-addressed photo blobs (blobstore.py).
+    _execute_statements(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS blobs (
+          name TEXT PRIMARY KEY,
+          refcount INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER IF NOT EXISTS blobs_found_items_ai AFTER INSERT ON found_items
+        WHEN new.photo_filename IS NOT NULL BEGIN
+          INSERT INTO blobs (name, refcount) VALUES (new.photo_filename, 1)
+          ON CONFLICT(name) DO UPDATE SET refcount = refcount + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS blobs_found_items_ad AFTER DELETE ON found_items
+        WHEN old.photo_filename IS NOT NULL BEGIN
+          UPDATE blobs SET refcount = refcount - 1 WHERE name = old.photo_filename;
+        END;
+        CREATE TRIGGER IF NOT EXISTS blobs_found_items_au
+        AFTER UPDATE OF photo_filename ON found_items
+        WHEN old.photo_filename IS NOT new.photo_filename BEGIN
+          UPDATE blobs SET refcount = refcount - 1 WHERE name = old.photo_filename;
+          INSERT INTO blobs (name, refcount)
+          SELECT new.photo_filename, 1 WHERE new.photo_filename IS NOT NULL
+          ON CONFLICT(name) DO UPDATE SET refcount = refcount + 1;
+        END;
+
+        INSERT OR REPLACE INTO blobs (name, refcount)
+          SELECT photo_filename, COUNT(*) FROM found_items
+          WHERE photo_filename IS NOT NULL GROUP BY photo_filename;
+        """,
+    )
+
+
+def _m009_outbox(conn: sqlite3.Connection) -> None:
+    # Durable email queue drained by mailer.OutboxWorker.
+    _execute_statements(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          to_email TEXT NOT NULL,
+          subject TEXT NOT NULL,
+          body TEXT NOT NULL,
+          status TEXT NOT NULL DEFAULT 'pending',  -- pending | sending | sent | failed
+          attempts INTEGER NOT NULL DEFAULT 0,
+          next_attempt_at TEXT NOT NULL,
+          last_error TEXT,
+          created_at TEXT NOT NULL,
+          sent_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at);
+        """,
+    )
+
+
+def _m010_location_ids(conn: sqlite3.Connection) -> None:
+    # Canonical location ids for legacy rows (missing or mixed-case ids).
+    locations.backfill(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_found_items_location ON found_items(location_id)")
+
+
+VERSIONED_TABLES = ("found_items", "claims", "reviews")
+
+
+def _m011_data_versions(conn: sqlite3.Connection) -> None:
+    # Monotonic change counters in stats_counters: 'data_version' moves on any
+    # write, 'version:<table>' on writes to that table. Used for HTTP ETags and
+    # cache invalidation across worker processes.
+    for table in VERSIONED_TABLES:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS version_{table}_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                  INSERT INTO stats_counters (name, value)
+                  VALUES ('data_version', 1), ('version:{table}', 1)
+                  ON CONFLICT(name) DO UPDATE SET value = value + 1;
+                END
+                """
+            )
+    conn.execute(
+        "INSERT OR IGNORE INTO stats_counters (name, value) VALUES ('data_version', 1)"
+    )
+
+
+def _m012_events(conn: sqlite3.Connection) -> None:
+    # Append-only feed for /events. `data` goes to admins; `public_data`, when
+    # set, is the redacted copy sent to everyone else.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS events (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          kind TEXT NOT NULL,
+          data TEXT NOT NULL,
+          public_data TEXT,
+          created_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m013_admins(conn: sqlite3.Connection) -> None:
+    # Used when ADMIN_STORE=sqlite; seeded from admin.json on first load.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS admins (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          username TEXT NOT NULL UNIQUE,
+          email TEXT,
+          password_hash TEXT NOT NULL,
+          updated_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m014_login_failures(conn: sqlite3.Connection) -> None:
+    # Sliding-window login throttling (ratelimit.py); rows older than the
+    # longest window are pruned as new failures come in.
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS login_failures (key TEXT NOT NULL, at REAL NOT NULL)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_login_failures_key_at ON login_failures(key, at)"
+    )
+
+
+def _m015_status_counters(conn: sqlite3.Connection) -> None:
+    # 'claims:<status>' and 'outbox:<status>' counts next to the dashboard
+    # counters, so /metrics reads one small table instead of grouping rows.
+    for table in ("claims", "outbox"):
+        _execute_statements(
+            conn,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS stats_{table}_status_ai AFTER INSERT ON {table} BEGIN
+              INSERT INTO stats_counters (name, value) VALUES ('{table}:' || new.status, 1)
+              ON CONFLICT(name) DO UPDATE SET value = value + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS stats_{table}_status_ad AFTER DELETE ON {table} BEGIN
+              UPDATE stats_counters SET value = value - 1 WHERE name = '{table}:' || old.status;
+            END;
+            CREATE TRIGGER IF NOT EXISTS stats_{table}_status_au
+            AFTER UPDATE OF status ON {table} WHEN old.status IS NOT new.status BEGIN
+              UPDATE stats_counters SET value = value - 1 WHERE name = '{table}:' || old.status;
+              INSERT INTO stats_counters (name, value) VALUES ('{table}:' || new.status, 1)
+              ON CONFLICT(name) DO UPDATE SET value = value + 1;
+            END;
+
+            DELETE FROM stats_counters WHERE name LIKE '{table}:%';
+            INSERT INTO stats_counters (name, value)
+              SELECT '{table}:' || status, COUNT(*) FROM {table} GROUP BY status;
+            """,
+        )
+
+
+def _m016_lost_reports(conn: sqlite3.Connection) -> None:
+    # Students' lost-item reports, an inverted index of their words (open
+    # reports only) and the found items matched to them (lostreports.py).
+    _execute_statements(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS lost_reports (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+          contact_name TEXT NOT NULL,
+          contact_email TEXT NOT NULL,
+          title TEXT NOT NULL,
+          category TEXT NOT NULL,
+          location_id TEXT NOT NULL,
+          lost_from TEXT NOT NULL,   -- YYYY-MM-DD, inclusive
+          lost_to TEXT NOT NULL,
+          description TEXT NOT NULL,
+          status TEXT NOT NULL DEFAULT 'open',  -- open | closed
+          created_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_lost_reports_student ON lost_reports(student_id);
+        CREATE INDEX IF NOT EXISTS idx_lost_reports_open_category
+          ON lost_reports(status, category COLLATE NOCASE, lost_to);
+
+        CREATE TABLE IF NOT EXISTS lost_report_terms (
+          term TEXT NOT NULL,
+          report_id INTEGER NOT NULL REFERENCES lost_reports(id) ON DELETE CASCADE,
+          weight REAL NOT NULL,
+          PRIMARY KEY (term, report_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_lost_report_terms_report ON lost_report_terms(report_id);
+
+        CREATE TABLE IF NOT EXISTS lost_matches (
+          report_id INTEGER NOT NULL REFERENCES lost_reports(id) ON DELETE CASCADE,
+          item_id INTEGER NOT NULL REFERENCES found_items(id) ON DELETE CASCADE,
+          score REAL NOT NULL,
+          details TEXT NOT NULL,     -- JSON: per-signal scores
+          notified_at TEXT,          -- when the email was queued
+          created_at TEXT NOT NULL,
+          PRIMARY KEY (report_id, item_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_lost_matches_item ON lost_matches(item_id);
+        """,
+    )
+
+
+def _m017_claimed_at(conn: sqlite3.Connection) -> None:
+    # When an item became claimed, whichever path claimed it (approved claim,
+    # admin "mark claimed", bulk action, import), unless the write sets it
+    # itself. Retention ages claimed items from this. Existing claimed items
+    # take their approved claim's time, or now when there is none, so nothing
+    # is archived early on upgrade.
+    _add_column(conn, "found_items", "claimed_at", "TEXT")
+    _execute_statements(
+        conn,
+        """
+        CREATE TRIGGER IF NOT EXISTS found_items_claimed_at_au
+        AFTER UPDATE OF status ON found_items
+        WHEN new.status = 'claimed' AND old.status IS NOT 'claimed'
+          AND new.claimed_at IS old.claimed_at BEGIN
+          UPDATE found_items SET claimed_at = strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')
+          WHERE id = new.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS found_items_claimed_at_ai
+        AFTER INSERT ON found_items
+        WHEN new.status = 'claimed' AND new.claimed_at IS NULL BEGIN
+          UPDATE found_items SET claimed_at = strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')
+          WHERE id = new.id;
+        END;
+
+        UPDATE found_items
+        SET claimed_at = COALESCE(
+          (SELECT MAX(c.approved_at) FROM claims c WHERE c.item_id = found_items.id),
+          strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')
+        )
+        WHERE status = 'claimed' AND claimed_at IS NULL;
+        """,
+    )
+
+
+def _m018_status_day_index(conn: sqlite3.Connection) -> None:
+    # Keyset pages of browse(date=...) run WHERE status = ? AND date_found = ?
+    # ORDER BY id DESC. With (status, date_found) the rowid follows in index
+    # order, so a page is a short range walk; (status, date_found, time_found)
+    # put time_found in the way and the planner walked every approved item
+    # instead. The new index serves the old one's other uses too.
+    _execute_statements(
+        conn,
+        """
+        DROP INDEX IF EXISTS idx_found_items_status_date;
+        CREATE INDEX IF NOT EXISTS idx_found_items_status_day ON found_items(status, date_found);
+        """,
+    )
+
+
+def _m019_orphaned_matches(conn: sqlite3.Connection) -> None:
+    # Foreign keys were off until now, so deleted items and reports left
+    # their lost_matches rows behind; from here on ON DELETE CASCADE does it.
+    conn.execute(
+        """
+        DELETE FROM lost_matches
+        WHERE item_id NOT IN (SELECT id FROM found_items)
+           OR report_id NOT IN (SELECT id FROM lost_reports)
+        """
+    )
+    conn.execute("DELETE FROM lost_report_terms WHERE report_id NOT IN (SELECT id FROM lost_reports)")
+
+
+MIGRATIONS = [
+    (1, "baseline schema", _m001_baseline),
+    (2, "found_items.time_found", _m002_found_item_time),
+    (3, "claims approval columns", _m003_claim_workflow),
+    (4, "secondary indexes", _m004_indexes),
+    (5, "found_items full-text search", _m005_fulltext_search),
+    (6, "dashboard counters", _m006_stats_counters),
+    (7, "found_items.photo_renditions", _m007_photo_renditions),
+    (8, "photo blob refcounts", _m008_blob_refcounts),
+    (9, "email outbox", _m009_outbox),
+    (10, "canonical location ids", _m010_location_ids),
+    (11, "data version counters", _m011_data_versions),
+    (12, "live event log", _m012_events),
+    (13, "admin accounts", _m013_admins),
+    (14, "login failure log", _m014_login_failures),
+    (15, "claim and outbox status counters", _m015_status_counters),
+    (16, "lost reports and matches", _m016_lost_reports),
+    (17, "found_items.claimed_at", _m017_claimed_at),
+    (18, "found_items (status, date_found) index", _m018_status_day_index),
+    (19, "drop orphaned lost matches", _m019_orphaned_matches),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_schema_version(conn: sqlite3.Connection) -> int:
+    conn.execute(SCHEMA_VERSION_TABLE)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def schema_is_current(conn: sqlite3.Connection) -> bool:
+    """Cheap check: migrate() mirrors the schema version into PRAGMA user_version,
+    which lives in the file header, so no table is read or created."""
+    return conn.execute("PRAGMA user_version").fetchone()[0] >= LATEST_SCHEMA_VERSION
+
+
+def migrate(conn: sqlite3.Connection) -> list[int]:
+    """Apply pending migrations in order; returns the versions applied."""
+    applied = []
+    current = current_schema_version(conn)
+    for version, name, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock.
+            current = current_schema_version(conn)
+            if version <= current:
+                conn.rollback()
+                continue
+            apply(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, time.strftime("%Y-%m-%dT%H:%M:%S")),
+            )
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+        current = version
+    if conn.execute("PRAGMA user_version").fetchone()[0] < current:
+        # Migrated before user_version mirrored schema_version.
+        conn.execute(f"PRAGMA user_version = {current}")
+    return applied
+
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+
+@contextmanager
+def _exclusive(lock_path: Path):
+    with open(lock_path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def init_db() -> None:
+    """Apply database pragmas and pending migrations, once per process.
+
+    Under a preloading server this runs once, in the master. Workers that
+    start without preload take a file lock in turn, so the first one migrates
+    and the rest find the schema current instead of racing for the write lock.
+    """
+    path = Path(DB_PATH)
+    with _init_lock:
+        if path.resolve() in _initialized:
+            return
+        conn = get_conn()
+        try:
+            # Usual restart: nothing to change, so no DDL and no lock file.
+            if not (database_pragmas_applied(conn) and schema_is_current(conn)):
+                with _exclusive(path.with_name(path.name + ".init.lock")):
+                    apply_database_pragmas(conn)
+                    migrate(conn)
+        finally:
+            conn.close()
+        _initialized.add(path.resolve())
+
+
+# -------------------
+# Query plan checks
+# -------------------
+# Queries on the hot request paths as the routes run them, with
+# representative parameters. Each must be answerable without a full table
+# scan (SCAN <table> with no index); where the choice of index matters, the
+# third field names the one the plan has to use. Admin pages walk rowid order
+# under a LIMIT and are not listed. tests/test_query_plans.py runs the check.
+SMALL_TABLES = {"stats_counters"}  # a row per counter; scanning is the plan
+_APPROVED = "SELECT * FROM found_items WHERE status='approved'"
+_SAMPLE_PAGE_SIZE = 25
+
+
+def _page(sql: str, params=(), cursor=None, backwards: bool = False, keys=None) -> tuple[str, tuple]:
+    """A keyset page of `sql` and its params, as pagination.keyset_page() runs it."""
+    from pagination import ID_DESC, keyset_sql
+
+    page_sql, cursor_params = keyset_sql(sql, keys or ID_DESC, cursor, backwards)
+    return page_sql, (*params, *cursor_params, _SAMPLE_PAGE_SIZE + 1)
+
+
+def hot_queries() -> dict[str, tuple[str, tuple, str | None]]:
+    """{name: (sql, params, required index or None)} for check_query_plans()."""
+    import search
+
+    day = "2025-01-01"
+    fts = search.FTS_TABLE
+    ranked = f"""
+        SELECT f.*, bm25({fts}, ?, ?, ?) AS score
+        FROM {fts} JOIN found_items f ON f.id = {fts}.rowid
+        WHERE {fts} MATCH ? AND f.status='approved'
+    """
+    return {
+        # home(): counters and the today's-finds fragment
+        "home.counters": ("SELECT name, value FROM stats_counters", (), None),
+        "home.data_version": (
+            "SELECT value FROM stats_counters WHERE name = ?", ("version:found_items",), None
+        ),
+        "home.today_finds": (
+            """
+            SELECT id, title, category, location_found, photo_filename, photo_renditions,
+                   created_at, time_found
+            FROM found_items
+            WHERE status='approved' AND date_found = ?
+            ORDER BY COALESCE(time_found, '23:59') DESC, id DESC
+            LIMIT 5
+            """,
+            (day,),
+            "idx_found_items_status_day",
+        ),
+        # browse() and /api/v1/items: keyset pages, first, next and previous
+        "browse.first": (*_page(_APPROVED), "idx_found_items_status"),
+        "browse.next": (*_page(_APPROVED, cursor=[5000]), "idx_found_items_status"),
+        "browse.prev": (*_page(_APPROVED, cursor=[5000], backwards=True), "idx_found_items_status"),
+        "browse.category": (
+            *_page(_APPROVED + " AND category = ?", ("Electronics",), cursor=[5000]),
+            "idx_found_items_status_category",
+        ),
+        "browse.date": (
+            *_page(_APPROVED + " AND date_found = ?", (day,)), "idx_found_items_status_day"
+        ),
+        "browse.date_next": (
+            *_page(_APPROVED + " AND date_found = ?", (day,), cursor=[5000]),
+            "idx_found_items_status_day",
+        ),
+        "browse.search": (
+            *_page(ranked, (*search.BM25_WEIGHTS, '"keys"*'), cursor=[-1.5, 5000],
+                   keys=search.RANKED_KEYS),
+            None,
+        ),
+        "browse.categories": (
+            "SELECT DISTINCT category FROM found_items ORDER BY category ASC", (), None
+        ),
+        # Item pages: claim form, /api/v1/items/<id>
+        "item.by_id": ("SELECT * FROM found_items WHERE id=?", (1,), None),
+        "api.item": (
+            "SELECT * FROM found_items WHERE id = ? AND status IN ('approved', 'claimed')", (1,), None
+        ),
+        "map.pins": (
+            """
+            SELECT * FROM (
+              SELECT id, title, category, date_found, location_found, location_id,
+                     ROW_NUMBER() OVER (PARTITION BY location_id ORDER BY id DESC) AS pin_rank,
+                     COUNT(*) OVER (PARTITION BY location_id) AS pin_count
+              FROM found_items
+              WHERE status IN ('approved','claimed')
+            )
+            WHERE pin_rank <= ?
+            ORDER BY location_id, pin_rank
+            """,
+            (5,),
+            "idx_found_items_status",
+        ),
+        "events.since": (
+            "SELECT id, kind, data FROM events WHERE id > ? ORDER BY id LIMIT ?", (1, 100), None
+        ),
+        # lostreports: filing a report and approving an item
+        "lost.item_window": (
+            "SELECT MIN(id), MAX(id) FROM found_items "
+            "WHERE status = 'approved' AND date_found BETWEEN ? AND ?",
+            (day, "2025-02-01"),
+            "idx_found_items_status_day",
+        ),
+        "lost.category_reports": (
+            """
+            SELECT * FROM lost_reports
+            WHERE status = 'open' AND category = ? COLLATE NOCASE AND lost_to >= ? AND lost_from <= ?
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            ("Electronics", day, "2025-02-01", 200),
+            "idx_lost_reports_open_category",
+        ),
+        "lost.student_reports": (
+            "SELECT * FROM lost_reports WHERE student_id = ? ORDER BY status = 'open' DESC, id DESC",
+            (1,),
+            "idx_lost_reports_student",
+        ),
+    }
+
+
+def explain(conn: sqlite3.Connection, sql: str, params=()) -> list[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def _full_scan(line: str) -> bool:
+    # "SCAN t USING INDEX ..." walks an index; "SCAN fts VIRTUAL TABLE INDEX"
+    # is a MATCH lookup; "SCAN (subquery-1)" reads a result already built.
+    if not line.startswith("SCAN ") or " USING " in line or " VIRTUAL TABLE INDEX " in line:
+        return False
+    return not line.startswith("SCAN (") and line.split()[1] not in SMALL_TABLES
+
+
+def check_query_plans(conn: sqlite3.Connection | None = None) -> dict[str, list[str]]:
+    """Return {query name: plan lines} for every hot query that full-scans a
+    table or misses its required index.
+
+    Without a connection the check runs against a fresh in-memory database at
+    the latest schema version, so results do not depend on ANALYZE statistics.
+    The required indexes assume that; on a live database after ANALYZE the
+    planner may rightly pick another (e.g. rowid order when most rows match).
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(":memory:")
+        migrate(conn)
+    try:
+        failures = {}
+        for name, (sql, params, index) in hot_queries().items():
+            plan = explain(conn, sql, params)
+            if index and not any(index in line.split() for line in plan):
+                failures[name] = plan
+            elif any(_full_scan(line) for line in plan):
+                failures[name] = plan
+        return failures
+    finally:
+        if own_conn:
+            conn.close()
@@ -0,0 +1,104 @@
+"""Local debugging SMTP server.
+
+Accepts any login, keeps every message in memory and prints it, so the
+outbox can be exercised without a real mail account:
+
+    python devsmtp.py --port 1025
+    SMTP_HOST=127.0.0.1 SMTP_PORT=1025 SMTP_USE_TLS=false \\
+    SMTP_USERNAME=dev SMTP_PASSWORD=dev flask --app app run
+
+In tests, start DebugSMTPServer(port=0) and read `.messages`.
+"""
+import argparse
+import socketserver
+import threading
+from email import message_from_bytes, policy
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self) -> None:
+        server = self.server
+        mail_from, rcpt_to = None, []
+        self.reply("220 devsmtp ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode(errors="replace").rstrip("\r\n")
+            verb = line.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-devsmtp")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                parts = line.split()
+                if len(parts) == 2 and parts[1].upper() == "LOGIN":
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                server.logins += 1
+                self.reply("235 Authentication successful")
+            elif verb == "MAIL":
+                mail_from, rcpt_to = line[10:].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                rcpt_to.append(line[8:].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = bytearray()
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk in (b".\r\n", b".\n", b""):
+                        break
+                    data += chunk[1:] if chunk.startswith(b"..") else chunk
+                message = message_from_bytes(bytes(data), policy=policy.default)
+                server.record(mail_from, rcpt_to, message)
+                self.reply("250 OK: queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class DebugSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 1025, echo: bool = False):
+        super().__init__((host, port), _SMTPHandler)
+        self.echo = echo
+        self.messages = []
+        self.logins = 0
+        self._lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def record(self, mail_from, rcpt_to, message) -> None:
+        with self._lock:
+            self.messages.append(message)
+        if self.echo:
+            print(f"--- From {mail_from} to {', '.join(rcpt_to)} ---")
+            print(message.as_string())
+
+    def start(self) -> "DebugSMTPServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    server = DebugSMTPServer(args.host, args.port, echo=True)
+    print(f"devsmtp listening on {args.host}:{server.port}")
+    server.serve_forever()
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import Response, request, session
+
+import db
+
+log = logging.getLogger(__name__)
+
+# Live feed for /admin. Write paths append to the `events` table in their own
+# transaction; one hub thread per process tails the table and wakes every open
+# stream through a shared Condition, so listeners cost no database work of
+# their own and workers in other processes see the same feed.
+#
+# Each open stream holds a server thread, so the feed is for admins only and
+# capped at SSE_MAX_STREAMS per process (more get a 503 with Retry-After).
+# Public pages poll the ETag'd /api/v1 instead.
+SSE_POLL_INTERVAL = float(os.getenv("SSE_POLL_INTERVAL", "1"))     # seconds
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+SSE_MAX_STREAM = float(os.getenv("SSE_MAX_STREAM", "300"))          # then the browser reconnects
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "3000"))
+SSE_BACKLOG = int(os.getenv("SSE_BACKLOG", "500"))                 # events kept in memory
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", "4"))            # open streams per process
+EVENTS_RETENTION_HOURS = float(os.getenv("EVENTS_RETENTION_HOURS", "24"))
+
+ITEM_SUBMITTED = "item-submitted"
+ITEM_APPROVED = "item-approved"
+CLAIM_CREATED = "claim-created"
+CLAIM_APPROVED = "claim-approved"
+
+
+def publish(conn: sqlite3.Connection, kind: str, data: dict) -> None:
+    """Record an event in the caller's transaction (the caller commits)."""
+    conn.execute(
+        "INSERT INTO events (kind, data, created_at) VALUES (?, ?, ?)",
+        (kind, json.dumps(data, separators=(",", ":")), datetime.now().isoformat(timespec="seconds")),
+    )
+
+
+def notify() -> None:
+    """Wake this process's hub after a commit instead of waiting for its next poll."""
+    _wakeup.set()
+
+
+def fetch_since(conn: sqlite3.Connection, after_id: int, limit: int = SSE_BACKLOG) -> list:
+    return conn.execute(
+        "SELECT id, kind, data FROM events WHERE id > ? ORDER BY id LIMIT ?",
+        (after_id, limit),
+    ).fetchall()
+
+
+def prune(conn: sqlite3.Connection, hours: float = EVENTS_RETENTION_HOURS) -> int:
+    cutoff = (datetime.now() - timedelta(hours=hours)).isoformat(timespec="seconds")
+    deleted = conn.execute("DELETE FROM events WHERE created_at < ?", (cutoff,)).rowcount
+    conn.commit()
+    return deleted
+
+
+# -------------------
+# Per-process hub
+# -------------------
+_wakeup = threading.Event()
+
+
+class EventHub(threading.Thread):
+    def __init__(self):
+        super().__init__(name="event-hub", daemon=True)
+        self.cond = threading.Condition()
+        self.recent = deque(maxlen=SSE_BACKLOG)
+        conn = db.get_pool().acquire()
+        try:
+            self.last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+        finally:
+            conn.close()
+        # Events with id <= floor are not in `recent` and must come from the table.
+        self.floor = self.last_id
+        self.last_prune = 0.0
+
+    def run(self) -> None:
+        while True:
+            conn = db.get_pool().acquire()
+            try:
+                rows = fetch_since(conn, self.last_id)
+                if time.monotonic() - self.last_prune > 3600:
+                    self.last_prune = time.monotonic()
+                    prune(conn)
+            except Exception:
+                log.exception("Event hub poll failed")
+                rows = []
+            finally:
+                conn.close()
+            if rows:
+                with self.cond:
+                    self.recent.extend(rows)
+                    self.last_id = rows[-1]["id"]
+                    if len(self.recent) == self.recent.maxlen:
+                        self.floor = max(self.floor, self.recent[0]["id"] - 1)
+                    self.cond.notify_all()
+            _wakeup.wait(SSE_POLL_INTERVAL)
+            _wakeup.clear()
+
+    def _buffered(self, cursor: int) -> list | None:
+        if cursor < self.floor:
+            return None
+        return [row for row in self.recent if row["id"] > cursor]
+
+    def wait_for(self, cursor: int, timeout: float) -> list:
+        """Events after `cursor`, blocking up to `timeout` if there are none yet."""
+        if cursor < self.floor:
+            # A client resuming from before this process's buffer.
+            conn = db.get_pool().acquire()
+            try:
+                rows = fetch_since(conn, cursor)
+            finally:
+                conn.close()
+            if rows:
+                return rows
+            # Pruned from the table too: carry on from the buffer, and wait
+            # there rather than returning at once (the caller would spin).
+            cursor = self.floor
+        with self.cond:
+            rows = self._buffered(cursor)
+            if not rows:
+                self.cond.wait(timeout)
+                rows = self._buffered(cursor)
+        return rows or []
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub() -> EventHub:
+    """This process's hub, started on first use (fork-safe)."""
+    global _hub
+    with _hub_lock:
+        if _hub is None or not _hub.is_alive() or _hub.pid != os.getpid():
+            _hub = EventHub()
+            _hub.pid = os.getpid()
+            _hub.start()
+        return _hub
+
+
+# Not a thread-free design: under gthread every open stream still occupies a
+# worker thread for up to SSE_MAX_STREAM seconds, so the feed is admin-only
+# and this cap keeps streams from starving ordinary requests.
+_streams = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+
+def _format(row) -> str:
+    return f"id: {row['id']}\nevent: {row['kind']}\ndata: {row['data']}\n\n"
+
+
+def stream(cursor: int):
+    hub = get_hub()
+    deadline = time.monotonic() + SSE_MAX_STREAM
+    yield f"retry: {SSE_RETRY_MS}\nid: {cursor}\n\n"
+    while time.monotonic() < deadline:
+        rows = hub.wait_for(cursor, SSE_KEEPALIVE)
+        if rows:
+            cursor = rows[-1]["id"]
+            yield "".join(_format(row) for row in rows)
+        else:
+            # Keeps proxies from timing out; the bare id keeps resume points current.
+            yield f": keepalive\nid: {cursor}\n\n"
+
+
+def init_app(app) -> None:
+    @app.get("/events")
+    def event_stream():
+        """Server-sent events for the admin panel."""
+        if session.get("is_admin") is not True:
+            return Response("Admin access required.\n", 403, mimetype="text/plain")
+        last_id = request.headers.get("Last-Event-ID", "")
+        cursor = int(last_id) if last_id.isdigit() else get_hub().last_id
+        if not _streams.acquire(blocking=False):
+            return Response("Too many live streams; retry shortly.\n", 503,
+                            {"Retry-After": str(SSE_RETRY_MS // 1000 or 1)}, mimetype="text/plain")
+        response = Response(stream(cursor), mimetype="text/event-stream")
+        response.call_on_close(_streams.release)  # the server closes it on disconnect or timeout
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
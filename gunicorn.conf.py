@@ -0,0 +1,60 @@
+"""Gunicorn settings: pre-forked workers, each with a pool of threads.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every value can be overridden with the environment variables below or on the
+command line.
+"""
+import multiprocessing
+import os
+import tempfile
+from pathlib import Path
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# Processes use the cores; threads keep a slow upload or an SSE stream
+# (/events holds its thread for up to SSE_MAX_STREAM) from blocking the rest.
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count() * 2 + 1, 9))))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+
+# Recycle workers now and then (jittered so they don't all restart at once).
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# Heartbeat timeout, and how long a stopping worker may finish in-flight requests.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Import the app (and run init_db) once in the master, then fork.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+
+# Workers share their /metrics counters through this directory.
+os.environ.setdefault("METRICS_DIR", str(Path(tempfile.gettempdir()) / "ahsfindsmart-metrics"))
+
+
+def on_starting(server):
+    import metrics
+
+    metrics.clear_dir()
+
+
+def pre_fork(server, worker):
+    # Connections the master opened while preloading must not be shared with children.
+    import db
+
+    db.get_pool().close_all()
+
+
+def worker_exit(server, worker):
+    import db
+    import mailer
+    import metrics
+
+    mailer.stop_worker()
+    metrics.flush()
+    db.get_pool().close_all()
@@ -0,0 +1,102 @@
+import hashlib
+import mimetypes
+import os
+import re
+from pathlib import Path
+
+from flask import Response, abort, request, send_from_directory
+from werkzeug.security import safe_join
+
+# Content-addressed blob names (see blobstore.py), including their renditions:
+# ab/cd/<sha256>.<ext> or ab/cd/<sha256>.<rendition>.<ext>
+CONTENT_ADDRESSED_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[\w.]+)$")
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Legacy "<timestamp>_<name>" uploads never change either, but aren't
+# verifiably content-named, so they get a shorter lifetime.
+UPLOADS_MAX_AGE = int(os.getenv("UPLOADS_MAX_AGE", str(24 * 3600)))
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "300"))
+
+# "" (Python sends the bytes), "x-accel" (nginx) or "x-sendfile" (Apache/lighttpd)
+UPLOADS_SENDFILE = os.getenv("UPLOADS_SENDFILE", "").strip().lower()
+UPLOADS_ACCEL_PREFIX = os.getenv("UPLOADS_ACCEL_PREFIX", "/_protected_uploads/")
+
+_static_versions: dict[str, str] = {}
+
+
+def _set_cache_headers(response: Response, filename: str) -> None:
+    response.cache_control.no_cache = False
+    response.cache_control.public = True
+    if CONTENT_ADDRESSED_RE.match(filename):
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = UPLOADS_MAX_AGE
+
+
+def _etag_for(filename: str, path: str) -> str:
+    match = CONTENT_ADDRESSED_RE.match(filename)
+    if match:
+        # Strong validator straight from the name: the digest plus rendition suffix.
+        return match.group(1) + match.group(2)
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def send_upload(folder: str, filename: str) -> Response:
+    """Serve an uploaded photo with validators, long-lived caching and ranges."""
+    path = safe_join(folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    etag = _etag_for(filename, path)
+
+    if UPLOADS_SENDFILE == "x-accel":
+        # nginx streams the file from an `internal` location; we only answer
+        # conditional requests and set headers (nginx keeps Cache-Control/ETag).
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+        response.headers["X-Accel-Redirect"] = UPLOADS_ACCEL_PREFIX + filename
+        response.set_etag(etag)
+        response.last_modified = os.path.getmtime(path)
+        _set_cache_headers(response, filename)
+        return response.make_conditional(request)
+
+    # send_from_directory handles If-None-Match / If-Modified-Since (304) and
+    # Range requests (206); with USE_X_SENDFILE it emits X-Sendfile instead.
+    response = send_from_directory(folder, filename, etag=etag, conditional=True)
+    _set_cache_headers(response, filename)
+    return response
+
+
+def static_version(static_folder: str, filename: str) -> str | None:
+    """Short content hash used to cache-bust /static URLs (cached per process)."""
+    if filename not in _static_versions:
+        path = safe_join(static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        _static_versions[filename] = hashlib.sha256(Path(path).read_bytes()).hexdigest()[:12]
+    return _static_versions[filename]
+
+
+def init_app(app) -> None:
+    if UPLOADS_SENDFILE == "x-sendfile":
+        app.config["USE_X_SENDFILE"] = True
+
+    @app.url_defaults
+    def add_static_version(endpoint, values):
+        if endpoint == "static" and "v" not in values and "filename" in values:
+            version = static_version(app.static_folder, values["filename"])
+            if version:
+                values["v"] = version
+
+    @app.after_request
+    def static_cache_headers(response):
+        if request.endpoint == "static" and response.status_code in (200, 206, 304):
+            response.cache_control.no_cache = False
+            response.cache_control.public = True
+            if request.args.get("v"):
+                # Versioned URL: the content behind it can never change.
+                response.cache_control.max_age = IMMUTABLE_MAX_AGE
+                response.cache_control.immutable = True
+            else:
+                response.cache_control.max_age = STATIC_MAX_AGE
+        return response
@@ -0,0 +1,206 @@
+import json
+import os
+from functools import cache
+from importlib.util import find_spec
+from pathlib import Path
+
+from flask import url_for
+
+import db
+import instrumentation
+
+# Pillow is optional; without it the originals are served. It is imported on
+# first upload rather than at startup.
+HAVE_PILLOW = find_spec("PIL") is not None
+
+
+@cache
+def _pillow():
+    from PIL import Image, ImageOps
+
+    return Image, ImageOps
+
+# Rendition name -> max width in pixels. Heights follow the aspect ratio.
+RENDITIONS = {"thumb": 320, "medium": 960}
+RENDITION_FORMAT = os.getenv("IMAGE_RENDITION_FORMAT", "WEBP").upper()
+RENDITION_QUALITY = int(os.getenv("IMAGE_RENDITION_QUALITY", "80"))
+# Larger images are rejected before decoding (decompression bombs). Pillow
+# itself only warns past its own limit and refuses at twice that.
+MAX_IMAGE_PIXELS = 40_000_000
+
+_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg", "PNG": "png"}
+
+
+class ImageProcessingError(ValueError):
+    pass
+
+
+def rendition_name(photo_filename: str, size: str) -> str:
+    stem = photo_filename.rsplit(".", 1)[0]
+    return f"{stem}.{size}.{_EXTENSIONS[RENDITION_FORMAT]}"
+
+
+def _check_pixels(image) -> None:
+    if image.width * image.height > MAX_IMAGE_PIXELS:
+        raise ImageProcessingError(
+            f"Image is {image.width}x{image.height}; the limit is {MAX_IMAGE_PIXELS:,} pixels"
+        )
+
+
+def strip_metadata(path: Path) -> bool:
+    """Rewrite an upload in place without EXIF/XMP (GPS, camera serials...).
+
+    Orientation is applied to the pixels first. JPEGs without a rotation are
+    re-saved with their own quantization tables, so they barely change.
+    Returns False when there was nothing to strip or Pillow is not installed.
+    Raises ImageProcessingError if the file is not a readable image.
+    """
+    if not HAVE_PILLOW:
+        return False
+    Image, ImageOps = _pillow()
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    stripped = path.with_name(path.name + ".strip")
+    try:
+        with instrumentation.timed("images"), Image.open(path) as original:
+            _check_pixels(original)
+            exif = original.getexif()
+            if not exif and not any(key in original.info for key in ("exif", "xmp", "XML:com.adobe.xmp")):
+                return False
+            image = original if exif.get(0x0112, 1) == 1 else ImageOps.exif_transpose(original)
+            options = {}
+            if original.info.get("icc_profile"):
+                options["icc_profile"] = original.info["icc_profile"]
+            fmt = "JPEG" if original.format == "MPO" else original.format
+            if fmt == "JPEG" and image is original:
+                options.update(quality="keep", subsampling="keep")
+            elif fmt == "JPEG":
+                options.update(quality=95)
+            elif fmt == "WEBP":
+                options.update(quality=90, method=4)
+            image.save(stripped, fmt, **options)
+        os.replace(stripped, path)
+        return True
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise ImageProcessingError(str(exc)) from exc
+    finally:
+        stripped.unlink(missing_ok=True)
+
+
+def make_renditions(folder: Path, photo_filename: str) -> dict[str, str]:
+    """Write resized, EXIF-free copies of an upload next to it.
+
+    Returns {rendition: filename}. Returns {} when Pillow is not installed.
+    Raises ImageProcessingError if the upload is not a readable image.
+    """
+    if not HAVE_PILLOW:
+        return {}
+    Image, ImageOps = _pillow()
+
+    existing = {size: rendition_name(photo_filename, size) for size in RENDITIONS}
+    if all((folder / name).exists() for name in existing.values()):
+        return existing  # same content was uploaded before
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    try:
+        with instrumentation.timed("images"), Image.open(folder / photo_filename) as original:
+            _check_pixels(original)
+            # Apply the EXIF orientation, then drop all metadata by re-encoding.
+            image = ImageOps.exif_transpose(original)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            if RENDITION_FORMAT == "JPEG" and image.mode == "RGBA":
+                image = image.convert("RGB")
+
+            names = {}
+            for size, width in RENDITIONS.items():
+                copy = image.copy()
+                copy.thumbnail((width, width * 4), Image.LANCZOS)
+                name = rendition_name(photo_filename, size)
+                copy.save(folder / name, RENDITION_FORMAT, quality=RENDITION_QUALITY, method=4)
+                names[size] = name
+            return names
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise ImageProcessingError(str(exc)) from exc
+
+
+def remove_renditions(folder: Path, renditions: str | dict | None) -> None:
+    for name in load_renditions(renditions).values():
+        (folder / name).unlink(missing_ok=True)
+
+
+def load_renditions(value) -> dict[str, str]:
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return {}
+
+
+def photo_url(item, size: str = "thumb") -> str | None:
+    """URL of the best available image for `item` (a row or dict) at `size`."""
+    photo_filename = item["photo_filename"]
+    if not photo_filename:
+        return None
+    try:
+        renditions = load_renditions(item["photo_renditions"])
+    except (KeyError, IndexError):
+        renditions = {}
+    return url_for("uploaded_file", filename=renditions.get(size, photo_filename))
+
+
+def backfill(conn, folder: Path) -> tuple[int, int]:
+    """Generate renditions for items uploaded before the pipeline existed."""
+    done = failed = 0
+    rows = conn.execute(
+        "SELECT id, photo_filename FROM found_items "
+        "WHERE photo_filename IS NOT NULL AND photo_renditions IS NULL"
+    ).fetchall()
+    for row in rows:
+        try:
+            names = make_renditions(folder, row["photo_filename"])
+        except ImageProcessingError:
+            failed += 1
+            continue
+        conn.execute(
+            "UPDATE found_items SET photo_renditions = ? WHERE id = ?",
+            (json.dumps(names), row["id"]),
+        )
+        conn.commit()
+        done += 1
+    return done, failed
+
+
+def strip_originals(conn, folder: Path) -> tuple[int, int]:
+    """Strip metadata from originals stored before uploads were stripped."""
+    stripped = failed = 0
+    rows = conn.execute(
+        "SELECT DISTINCT photo_filename FROM found_items WHERE photo_filename IS NOT NULL"
+    ).fetchall()
+    for row in rows:
+        path = folder / row["photo_filename"]
+        if not path.exists():
+            continue
+        try:
+            stripped += strip_metadata(path)
+        except ImageProcessingError:
+            failed += 1
+    return stripped, failed
+
+
+def init_app(app) -> None:
+    app.add_template_global(photo_url)
+
+    @app.cli.command("images-backfill")
+    def images_backfill_command():
+        """Create renditions and strip metadata for existing uploads."""
+        if not HAVE_PILLOW:
+            raise SystemExit("Pillow is not installed.")
+        folder = Path(app.config["UPLOAD_FOLDER"])
+        done, failed = backfill(db.get_conn(), folder)
+        print(f"Processed {done} photos ({failed} unreadable).")
+        stripped, failed = strip_originals(db.get_conn(), folder)
+        print(f"Stripped metadata from {stripped} originals ({failed} unreadable).")
@@ -0,0 +1,339 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from hashlib import sha1
+from pathlib import Path
+from sqlite3 import Cursor
+
+import click
+from flask import before_render_template, request, template_rendered
+
+log = logging.getLogger(__name__)
+
+# Per-request timing: every query on a pooled connection (execute + fetch
+# time, rows, fingerprint), template rendering and the slow side jobs
+# (uploads, image renditions, mail). Requests get a Server-Timing header and
+# one JSON log line. The cost is a few microseconds per query.
+INSTRUMENT = os.getenv("INSTRUMENT", "true").lower() == "true"
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+QUERY_STATS_MAX = 500  # distinct fingerprints kept for /admin/db-stats
+
+# Fraction of requests (0-1) run under cProfile. Each one is written to
+# PROFILE_DIR as a .prof file (pstats format: snakeviz, flameprof and
+# gprof2dot read it); `flask profile-report` merges them.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_query_stats = {}   # fingerprint id -> [sql, count, ms, max_ms, rows]
+_query_totals = [0, 0.0]  # [count, ms] over every query, capped table or not
+_phase_stats = {}   # phase -> [count, ms]
+_profile_lock = threading.Lock()  # one cProfile at a time per process
+
+
+class Trace:
+    __slots__ = ("started", "phases", "queries", "render_starts", "profiler")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}    # name -> ms
+        self.queries = {}   # fingerprint id -> [count, ms, rows]
+        self.render_starts = []
+        self.profiler = None
+
+
+def current() -> Trace | None:
+    return getattr(_local, "trace", None)
+
+
+# -------------------
+# Query fingerprints
+# -------------------
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> tuple[str, str]:
+    """(id, normalized sql): literals become ?, IN-lists of any length match."""
+    text = _WHITESPACE.sub(" ", _LITERALS.sub("?", sql)).strip()
+    text = _PLACEHOLDER_LISTS.sub("(?, ...)", text)
+    return sha1(text.encode()).hexdigest()[:10], text
+
+
+def _record_query(fp: str, sql: str, ms: float, rows: int, executions: int, total_ms: float) -> None:
+    trace = current()
+    if trace is not None:
+        entry = trace.queries.get(fp)
+        if entry is None:
+            trace.queries[fp] = [executions, ms, rows]
+        else:
+            entry[0] += executions
+            entry[1] += ms
+            entry[2] += rows
+    with _stats_lock:
+        _query_totals[0] += executions
+        _query_totals[1] += ms
+        entry = _query_stats.get(fp)
+        if entry is None:
+            if len(_query_stats) < QUERY_STATS_MAX:
+                _query_stats[fp] = [sql, executions, ms, total_ms, rows]
+        else:
+            entry[1] += executions
+            entry[2] += ms
+            entry[3] = max(entry[3], total_ms)
+            entry[4] += rows
+
+
+class TimedCursor(Cursor):
+    """Cursor that charges execute and fetch time (and rows) to its query."""
+
+    _fp = _sql = None
+    _ms = _pending_ms = 0.0
+    _pending_rows = 0
+    _slow_logged = False
+
+    def _charge(self, ms: float, rows: int, executions: int = 0) -> None:
+        self._ms += ms
+        _record_query(self._fp, self._sql, ms, rows, executions, self._ms)
+        if self._ms >= SLOW_QUERY_MS and not self._slow_logged:
+            self._slow_logged = True
+            log.warning("Slow query %s (%.1f ms so far): %s", self._fp, self._ms, self._sql[:500])
+
+    def execute(self, sql, parameters=()):
+        self._fp, self._sql = fingerprint(sql)
+        self._ms, self._slow_logged = 0.0, False
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._charge((time.perf_counter() - started) * 1000, max(self.rowcount, 0), 1)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._fp, self._sql = fingerprint(sql)
+        self._ms, self._slow_logged = 0.0, False
+        started = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            self._charge((time.perf_counter() - started) * 1000, max(self.rowcount, 0), 1)
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._charge((time.perf_counter() - started) * 1000, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._charge((time.perf_counter() - started) * 1000, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._charge((time.perf_counter() - started) * 1000, len(rows))
+        return rows
+
+    def __next__(self):
+        # Iteration is charged once, when it ends; per row it's only a timer.
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._charge(self._pending_ms + (time.perf_counter() - started) * 1000, self._pending_rows)
+            self._pending_ms, self._pending_rows = 0.0, 0
+            raise
+        self._pending_ms += (time.perf_counter() - started) * 1000
+        self._pending_rows += 1
+        return row
+
+
+# -------------------
+# Phase timers
+# -------------------
+def add_phase(name: str, ms: float) -> None:
+    trace = current()
+    if trace is not None:
+        trace.phases[name] = trace.phases.get(name, 0.0) + ms
+    with _stats_lock:
+        entry = _phase_stats.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += ms
+
+
+@contextmanager
+def timed(name: str):
+    """Charge the block's wall time to phase `name` (render, upload, mail, ...)."""
+    if not INSTRUMENT:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(name, (time.perf_counter() - started) * 1000)
+
+
+def _render_started(sender, template, context, **extra):
+    trace = current()
+    if trace is not None:
+        trace.render_starts.append(time.perf_counter())
+
+
+def _render_finished(sender, template, context, **extra):
+    trace = current()
+    if trace is not None and trace.render_starts:
+        add_phase("render", (time.perf_counter() - trace.render_starts.pop()) * 1000)
+
+
+# -------------------
+# Summaries
+# -------------------
+def query_stats(limit: int = 20, sort: str = "ms") -> list[dict]:
+    """Process-wide per-fingerprint totals, most expensive first."""
+    with _stats_lock:
+        rows = [
+            {"id": fp, "sql": sql, "count": count, "ms": round(ms, 3),
+             "max_ms": round(max_ms, 3), "rows": rows}
+            for fp, (sql, count, ms, max_ms, rows) in _query_stats.items()
+        ]
+    rows.sort(key=lambda row: row[sort], reverse=True)
+    return rows[:limit]
+
+
+def query_totals() -> dict:
+    """Process-wide query count and ms; only ever grows, unlike query_stats()."""
+    with _stats_lock:
+        return {"count": _query_totals[0], "ms": round(_query_totals[1], 3)}
+
+
+def phase_stats() -> dict:
+    with _stats_lock:
+        return {name: {"count": count, "ms": round(ms, 3)} for name, (count, ms) in _phase_stats.items()}
+
+
+def _db_totals(trace: Trace) -> tuple[int, float]:
+    count = sum(entry[0] for entry in trace.queries.values())
+    return count, sum(entry[1] for entry in trace.queries.values())
+
+
+def server_timing(trace: Trace, total_ms: float) -> str:
+    count, db_ms = _db_totals(trace)
+    parts = [f'db;dur={db_ms:.2f};desc="{count} queries"']
+    parts += [f"{name};dur={ms:.2f}" for name, ms in trace.phases.items()]
+    parts.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(parts)
+
+
+def request_record(trace: Trace, response, total_ms: float) -> dict:
+    count, db_ms = _db_totals(trace)
+    record = {
+        "method": request.method,
+        "path": request.path,
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        "ms": round(total_ms, 2),
+        "db_ms": round(db_ms, 2),
+        "queries": count,
+        "phases": {name: round(ms, 2) for name, ms in trace.phases.items()},
+        "pid": os.getpid(),
+    }
+    if total_ms >= SLOW_REQUEST_MS:
+        worst = sorted(trace.queries.items(), key=lambda item: item[1][1], reverse=True)[:5]
+        record["top_queries"] = [
+            {"id": fp, "count": count, "ms": round(ms, 2), "rows": rows} for fp, (count, ms, rows) in worst
+        ]
+    return record
+
+
+# -------------------
+# Sampling profiler
+# -------------------
+def _start_profile(trace: Trace) -> None:
+    if not _profile_lock.acquire(blocking=False):
+        return
+    import cProfile  # only when sampling is on
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # another profiler is active in this process
+        _profile_lock.release()
+        return
+    trace.profiler = profiler
+
+
+def _finish_profile(trace: Trace, total_ms: float) -> None:
+    profiler, trace.profiler = trace.profiler, None
+    profiler.disable()
+    _profile_lock.release()
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    endpoint = re.sub(r"[^A-Za-z0-9_]", "_", request.endpoint or "none")
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{os.getpid()}-{total_ms:.0f}ms.prof"
+    profiler.dump_stats(PROFILE_DIR / name)
+
+
+def init_app(app) -> None:
+    if not INSTRUMENT:
+        return
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+
+    @app.before_request
+    def start_trace():
+        trace = _local.trace = Trace()
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            _start_profile(trace)
+
+    @app.after_request
+    def finish_trace(response):
+        trace = current()
+        if trace is None:
+            return response
+        total_ms = (time.perf_counter() - trace.started) * 1000
+        if trace.profiler is not None:
+            _finish_profile(trace, total_ms)
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = server_timing(trace, total_ms)
+        level = logging.WARNING if total_ms >= SLOW_REQUEST_MS else logging.INFO
+        if log.isEnabledFor(level):
+            log.log(level, json.dumps(request_record(trace, response, total_ms), separators=(",", ":")))
+        return response
+
+    @app.teardown_request
+    def clear_trace(exc=None):
+        trace = current()
+        if trace is not None and trace.profiler is not None:  # the view raised
+            trace.profiler.disable()
+            trace.profiler = None
+            _profile_lock.release()
+        _local.trace = None
+
+    @app.cli.command("profile-report")
+    @click.option("--dir", "directory", type=click.Path(file_okay=False), default=str(PROFILE_DIR))
+    @click.option("--sort", default="cumulative", show_default=True, help="pstats sort key, e.g. tottime.")
+    @click.option("--limit", default=30, show_default=True)
+    @click.option("--endpoint", default=None, help="Only profiles of this endpoint.")
+    def profile_report_command(directory, sort, limit, endpoint):
+        """Merge sampled request profiles and print the top functions."""
+        import pstats
+
+        files = sorted(Path(directory).glob(f"*-{endpoint}-*.prof" if endpoint else "*.prof"))
+        if not files:
+            raise click.ClickException(f"No profiles in {directory}; set PROFILE_SAMPLE_RATE to collect some.")
+        print(f"{len(files)} profiled request(s)")
+        pstats.Stats(*map(str, files)).sort_stats(sort).print_stats(limit)
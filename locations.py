@@ -0,0 +1,118 @@
+import re
+
+# Single registry of campus locations, shared by the report form, the map and
+# the location_id backfill. Ids are lowercase; older mixed-case ids such as
+# "1000-Hall" and free-text spellings resolve through resolve(). Pins: x, y
+# are percentages on static/img/campus_map.jpg.
+LOCATIONS = [
+    {"id": "softball-field", "name": "Softball Field", "x": 25, "y": 12},
+    {"id": "raider-stadium", "name": "Raider Stadium", "x": 25, "y": 32},
+    {"id": "stadium-entrance", "name": "Stadium Entrance", "x": 42, "y": 34},
+    {"id": "practice-field", "name": "Practice Field", "x": 42, "y": 42},
+    {"id": "tennis", "name": "Tennis Courts", "x": 65, "y": 39},
+    {"id": "baseball-field", "name": "Baseball Field", "x": 22, "y": 58},
+    {"id": "band", "name": "Band Room", "x": 40, "y": 57},
+    {"id": "gym", "name": "Gym", "x": 50, "y": 60},
+    {"id": "fine-arts", "name": "Fine Arts", "x": 50, "y": 74},
+    {"id": "main-entrance", "name": "Main Entrance", "x": 54, "y": 66},
+    {"id": "1000-hall", "name": "1000 Hall", "x": 65, "y": 65},
+    {"id": "2000-hall", "name": "2000 Hall", "x": 60, "y": 75},
+    {"id": "3000-hall", "name": "3000 Hall", "x": 67, "y": 75},
+    {"id": "4000-hall", "name": "4000 Hall", "x": 73, "y": 75},
+    {"id": "media-center", "name": "Media Center", "x": 62, "y": 62},
+    {"id": "cafeteria", "name": "Cafeteria", "x": 72, "y": 62},
+    {"id": "5000-hall", "name": "5000 Hall", "x": 90, "y": 63},
+    {"id": "student-parking", "name": "Student Parking", "x": 30, "y": 80},
+    {"id": "staff-parking", "name": "Staff Parking", "x": 45, "y": 85},
+    {"id": "visitor-parking", "name": "Visitor Parking", "x": 54, "y": 88},
+    {"id": "student-staff-parking", "name": "Student/Staff Parking", "x": 85, "y": 79},
+    {"id": "bus-lane", "name": "Bus Lane", "x": 85, "y": 70},
+    {"id": "unknown", "name": "Other / Unknown", "x": 5, "y": 5},
+]
+
+UNKNOWN_ID = "unknown"
+LOCATIONS_BY_ID = {loc["id"]: loc for loc in LOCATIONS}
+
+# Locations offered on the report form.
+REPORTABLE_LOCATIONS = [loc for loc in LOCATIONS if loc["id"] != UNKNOWN_ID]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+
+# normalized id / name -> id
+_LOOKUP = {}
+for _loc in LOCATIONS:
+    for _key in (_loc["id"], _loc["name"]):
+        _LOOKUP.setdefault(_normalize(_key), _loc["id"])
+
+# Longest names first so "Student/Staff Parking" wins over "Staff Parking".
+_SUBSTRING_KEYS = sorted(
+    ((key, loc_id) for key, loc_id in _LOOKUP.items() if loc_id != UNKNOWN_ID),
+    key=lambda pair: -len(pair[0]),
+)
+
+
+def get(location_id: str | None) -> dict | None:
+    return LOCATIONS_BY_ID.get(location_id or "")
+
+
+def resolve(location_id: str | None = None, location_text: str | None = None) -> str:
+    """Canonical location id for a stored id and/or free-text location."""
+    for value in (location_id, location_text):
+        key = _normalize(value)
+        if key in _LOOKUP:
+            return _LOOKUP[key]
+    text = f" {_normalize(location_text)} "
+    for key, loc_id in _SUBSTRING_KEYS:
+        if f" {key} " in text:
+            return loc_id
+    return UNKNOWN_ID
+
+
+def backfill(conn) -> int:
+    """Set a canonical location_id on every row; returns the number changed."""
+    changed = []
+    for row in conn.execute("SELECT id, location_id, location_found FROM found_items"):
+        resolved = resolve(row[1], row[2])
+        if resolved != row[1]:
+            changed.append((resolved, row[0]))
+    conn.executemany("UPDATE found_items SET location_id = ? WHERE id = ?", changed)
+    return len(changed)
+
+
+MAP_ITEMS_PER_PIN = 10
+
+
+def map_pins(conn, per_pin: int = MAP_ITEMS_PER_PIN) -> tuple[dict, dict]:
+    """Recent approved/claimed items per pin plus per-pin totals, in one query.
+
+    Returns ({location_id: [item, ...]}, {location_id: count}).
+    """
+    rows = conn.execute(
+        """
+        SELECT * FROM (
+          SELECT id, title, category, date_found, location_found, location_id,
+                 ROW_NUMBER() OVER (PARTITION BY location_id ORDER BY id DESC) AS pin_rank,
+                 COUNT(*) OVER (PARTITION BY location_id) AS pin_count
+          FROM found_items
+          WHERE status IN ('approved','claimed')
+        )
+        WHERE pin_rank <= ?
+        ORDER BY location_id, pin_rank
+        """,
+        (per_pin,),
+    ).fetchall()
+
+    map_items = {loc["id"]: [] for loc in LOCATIONS}
+    counts = {loc["id"]: 0 for loc in LOCATIONS}
+    for row in rows:
+        loc_id = row["location_id"] if row["location_id"] in LOCATIONS_BY_ID else UNKNOWN_ID
+        if row["pin_rank"] == 1:
+            counts[loc_id] += row["pin_count"]
+        if len(map_items[loc_id]) < per_pin:
+            item = dict(row)
+            del item["pin_rank"], item["pin_count"]
+            map_items[loc_id].append(item)
+    return map_items, counts
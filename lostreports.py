@@ -0,0 +1,480 @@
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+
+from flask import flash, has_request_context, redirect, render_template, request, session, url_for
+
+import db
+import locations
+import mailer
+import metrics
+import search
+
+log = logging.getLogger(__name__)
+
+# Lost-item reports and matching. A report is a description, category, map
+# location and date window. When an admin approves a found item,
+# match_item() scores it against open reports (shared words, category,
+# distance between map pins, date) and records the matches over
+# LOST_MATCH_MIN_SCORE, queueing an email for each. Candidate reports come
+# from an inverted index of report words (lost_report_terms, open reports
+# only) and the category index, so an approval never scans every report. A
+# new report is matched the same way against items already approved.
+LOST_MATCH_MIN_SCORE = float(os.getenv("LOST_MATCH_MIN_SCORE", "0.65"))
+# Items found up to this many days after the window still match, scoring lower.
+LOST_MATCH_DATE_SLACK_DAYS = int(os.getenv("LOST_MATCH_DATE_SLACK_DAYS", "14"))
+LOST_MATCH_RADIUS = 35.0   # map distance (% of the map) at which location stops counting
+LOST_REPORT_MAX_DAYS = 90  # longest date window a report may cover
+MATCH_CANDIDATES = 200     # most candidates scored per item or report
+
+# Signal weights; they add up to 1.
+WEIGHTS = {"text": 0.4, "category": 0.25, "date": 0.2, "location": 0.15}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at by for from has have her his in is it its left lost my near of on or "
+    "our the their this to was were with found".split()
+)
+
+
+# -------------------
+# Scoring
+# -------------------
+def terms(title: str | None, description: str | None) -> dict[str, float]:
+    """Word -> weight. Title words weigh double; plurals fold to the singular."""
+    weights = {}
+    for text, weight in ((description, 1.0), (title, 2.0)):
+        for word in _WORD_RE.findall((text or "").lower()):
+            if len(word) < 2 or word in STOPWORDS:
+                continue
+            if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+                word = word[:-1]
+            weights[word] = max(weights.get(word, 0.0), weight)
+    return weights
+
+
+def _day(value: str | None) -> date | None:
+    try:
+        return date.fromisoformat((value or "")[:10])
+    except ValueError:
+        return None
+
+
+def date_score(lost_from: str, lost_to: str, date_found: str) -> float:
+    """1 inside the window, falling to 0 LOST_MATCH_DATE_SLACK_DAYS after it; 0 before it."""
+    start, end, found = _day(lost_from), _day(lost_to), _day(date_found)
+    if start is None or end is None or found is None or found < start:
+        return 0.0
+    if found <= end:
+        return 1.0
+    return max(0.0, 1 - (found - end).days / (LOST_MATCH_DATE_SLACK_DAYS + 1))
+
+
+def location_score(report_location: str, item_location: str) -> float:
+    """Closeness of the two map pins; 0.5 when either side doesn't know."""
+    a, b = locations.get(report_location), locations.get(item_location)
+    if a is None or b is None or locations.UNKNOWN_ID in (a["id"], b["id"]):
+        return 0.5
+    return max(0.0, 1 - math.hypot(a["x"] - b["x"], a["y"] - b["y"]) / LOST_MATCH_RADIUS)
+
+
+def text_score(report_terms: dict, item_terms: dict, idf: dict) -> float:
+    """Share of the report's (idf-weighted) words that the item also has."""
+    total = sum(weight * idf.get(term, 1.0) for term, weight in report_terms.items())
+    if not total:
+        return 0.0
+    shared = sum(
+        min(weight, item_terms[term]) * idf.get(term, 1.0)
+        for term, weight in report_terms.items()
+        if term in item_terms
+    )
+    return shared / total
+
+
+def score(report, report_terms: dict, item, item_terms: dict, idf: dict) -> tuple[float, dict]:
+    """(total, per-signal scores) for one report and one found item."""
+    details = {
+        "text": text_score(report_terms, item_terms, idf),
+        "category": float(report["category"].strip().lower() == item["category"].strip().lower()),
+        "date": date_score(report["lost_from"], report["lost_to"], item["date_found"]),
+        "location": location_score(report["location_id"], item["location_id"]),
+    }
+    if not details["date"]:
+        return 0.0, details  # found before it was lost, or long after
+    total = sum(WEIGHTS[name] * value for name, value in details.items())
+    return total, {name: round(value, 3) for name, value in details.items()}
+
+
+# -------------------
+# Inverted index
+# -------------------
+def _marks(values) -> str:
+    return ",".join("?" * len(values))
+
+
+def index_report(conn: sqlite3.Connection, report_id: int, report_terms: dict) -> None:
+    conn.execute("DELETE FROM lost_report_terms WHERE report_id = ?", (report_id,))
+    conn.executemany(
+        "INSERT INTO lost_report_terms (term, report_id, weight) VALUES (?, ?, ?)",
+        [(term, report_id, weight) for term, weight in report_terms.items()],
+    )
+
+
+def _idf(conn: sqlite3.Connection, words) -> dict[str, float]:
+    """Inverse document frequency over open reports: rare words count more."""
+    words = list(words)
+    if not words:
+        return {}
+    reports = conn.execute("SELECT COUNT(*) FROM lost_reports WHERE status = 'open'").fetchone()[0]
+    frequency = dict(
+        conn.execute(
+            f"SELECT term, COUNT(*) FROM lost_report_terms WHERE term IN ({_marks(words)}) GROUP BY term",
+            words,
+        ).fetchall()
+    )
+    return {word: math.log(1 + max(reports, 1) / frequency.get(word, 1)) for word in words}
+
+
+def _report_terms(conn: sqlite3.Connection, report_ids) -> dict[int, dict]:
+    found = {report_id: {} for report_id in report_ids}
+    if found:
+        for row in conn.execute(
+            f"SELECT report_id, term, weight FROM lost_report_terms WHERE report_id IN ({_marks(found)})",
+            list(found),
+        ):
+            found[row[0]][row[1]] = row[2]
+    return found
+
+
+def rebuild_index(conn: sqlite3.Connection) -> int:
+    """Re-create the index from open reports; returns the reports indexed."""
+    conn.execute("DELETE FROM lost_report_terms")
+    reports = conn.execute("SELECT id, title, description FROM lost_reports WHERE status = 'open'").fetchall()
+    for report in reports:
+        index_report(conn, report["id"], terms(report["title"], report["description"]))
+    conn.commit()
+    return len(reports)
+
+
+# -------------------
+# Matching
+# -------------------
+def _item_link(item_id: int) -> str:
+    if has_request_context():
+        return url_for("claim_item", item_id=item_id, _external=True)
+    return f"/claim/{item_id}"
+
+
+def _notify(conn: sqlite3.Connection, report, item) -> None:
+    try:
+        mailer.enqueue(
+            conn=conn,
+            subject=f"Possible match for your lost {report['title']}",
+            to_email=report["contact_email"],
+            body=f"""Hello {report['contact_name']},
+
+A found item that may be your {report['title']} was just posted:
+
+  {item['title']} ({item['category']})
+  Found at {item['location_found']} on {item['date_found']}
+
+If it's yours, send a claim request here:
+{_item_link(item['id'])}
+
+Lost and Found
+""",
+        )
+    except RuntimeError as exc:
+        # The match is still listed on the student's "My lost reports" page.
+        log.warning("Match email for lost report %s not queued: %s", report["id"], exc)
+        return
+    conn.execute(
+        "UPDATE lost_matches SET notified_at = ? WHERE report_id = ? AND item_id = ?",
+        (datetime.now().isoformat(timespec="seconds"), report["id"], item["id"]),
+    )
+
+
+def _record(conn: sqlite3.Connection, report, item, total: float, details: dict) -> bool:
+    inserted = conn.execute(
+        """
+        INSERT OR IGNORE INTO lost_matches (report_id, item_id, score, details, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (report["id"], item["id"], round(total, 3), json.dumps(details, separators=(",", ":")),
+         datetime.now().isoformat(timespec="seconds")),
+    ).rowcount
+    return bool(inserted)
+
+
+def _candidate_reports(conn: sqlite3.Connection, item, item_terms: dict) -> list:
+    """Open reports whose window fits the item and that share a word or its category."""
+    found = _day(item["date_found"])
+    if found is None:
+        return []
+    window = (found.isoformat(), (found - timedelta(days=LOST_MATCH_DATE_SLACK_DAYS)).isoformat())
+    words = list(item_terms)
+    by_id = {}
+    if words:
+        for row in conn.execute(
+            f"""
+            SELECT r.* FROM lost_report_terms t
+            JOIN lost_reports r ON r.id = t.report_id
+            WHERE t.term IN ({_marks(words)}) AND r.status = 'open' AND r.lost_from <= ? AND r.lost_to >= ?
+            GROUP BY r.id
+            ORDER BY SUM(t.weight) DESC
+            LIMIT ?
+            """,
+            (*words, *window, MATCH_CANDIDATES),
+        ):
+            by_id[row["id"]] = row
+    for row in conn.execute(
+        """
+        SELECT * FROM lost_reports
+        WHERE status = 'open' AND category = ? COLLATE NOCASE AND lost_to >= ? AND lost_from <= ?
+        ORDER BY id DESC
+        LIMIT ?
+        """,
+        (item["category"].strip(), window[1], window[0], MATCH_CANDIDATES),
+    ):
+        by_id.setdefault(row["id"], row)
+    return list(by_id.values())
+
+
+def match_item(conn: sqlite3.Connection, item) -> int:
+    """Match a newly approved item against open reports, in the caller's
+    transaction. Queues one email per new match and returns how many there
+    were; the caller commits, then calls count_matches()."""
+    item_terms = terms(item["title"], item["description"])
+    reports = _candidate_reports(conn, item, item_terms)
+    if not reports:
+        return 0
+    all_terms = _report_terms(conn, [report["id"] for report in reports])
+    idf = _idf(conn, {term for report_terms in all_terms.values() for term in report_terms})
+    matched = 0
+    for report in reports:
+        total, details = score(report, all_terms[report["id"]], item, item_terms, idf)
+        if total >= LOST_MATCH_MIN_SCORE and _record(conn, report, item, total, details):
+            _notify(conn, report, item)
+            matched += 1
+    return matched
+
+
+def count_matches(matched: int) -> None:
+    """Add committed matches to ahs_lost_matches_total."""
+    if matched:
+        metrics.LOST_MATCHES.inc(matched)
+
+
+def _candidate_items(conn: sqlite3.Connection, report, report_terms: dict) -> list:
+    """Approved items found in the report's window, by category or full-text match."""
+    end = _day(report["lost_to"]) + timedelta(days=LOST_MATCH_DATE_SLACK_DAYS)
+    window = (report["lost_from"], end.isoformat())
+    # The id range of the window's items (from the status/date index) bounds
+    # the full-text scan, which FTS5 can then walk by rowid and stop early.
+    low, high = conn.execute(
+        "SELECT MIN(id), MAX(id) FROM found_items WHERE status = 'approved' AND date_found BETWEEN ? AND ?",
+        window,
+    ).fetchone()
+    if low is None:
+        return []
+    by_id = {}
+    if report_terms and search.fts_available(conn):
+        query = " OR ".join(f'"{term}"*' for term in report_terms)
+        for row in conn.execute(
+            f"""
+            SELECT f.* FROM {search.FTS_TABLE}
+            JOIN found_items f ON f.id = {search.FTS_TABLE}.rowid
+            WHERE {search.FTS_TABLE} MATCH ? AND {search.FTS_TABLE}.rowid BETWEEN ? AND ?
+              AND f.status = 'approved' AND f.date_found BETWEEN ? AND ?
+            ORDER BY {search.FTS_TABLE}.rowid DESC
+            LIMIT ?
+            """,
+            (query, low, high, *window, MATCH_CANDIDATES),
+        ):
+            by_id[row["id"]] = row
+    for row in conn.execute(
+        """
+        SELECT * FROM found_items
+        WHERE status = 'approved' AND date_found BETWEEN ? AND ? AND category = ? COLLATE NOCASE
+        ORDER BY id DESC
+        LIMIT ?
+        """,
+        (*window, report["category"].strip(), MATCH_CANDIDATES),
+    ):
+        by_id.setdefault(row["id"], row)
+    return list(by_id.values())
+
+
+def match_report(conn: sqlite3.Connection, report) -> int:
+    """Match a new (indexed) report against items already approved. The
+    student sees these right away, so no email is queued."""
+    report_terms = _report_terms(conn, [report["id"]])[report["id"]]
+    idf = _idf(conn, report_terms)
+    matched = 0
+    for item in _candidate_items(conn, report, report_terms):
+        total, details = score(report, report_terms, item, terms(item["title"], item["description"]), idf)
+        if total >= LOST_MATCH_MIN_SCORE and _record(conn, report, item, total, details):
+            matched += 1
+    return matched
+
+
+# -------------------
+# Reports
+# -------------------
+class ReportError(ValueError):
+    pass
+
+
+def parse_window(lost_from: str, lost_to: str) -> tuple[str, str]:
+    """Validated (from, to) ISO dates; `to` defaults to `from`."""
+    start, end = _day(lost_from), _day(lost_to or lost_from)
+    if start is None or end is None:
+        raise ReportError("Please enter valid dates.")
+    if end < start:
+        raise ReportError("The end of the date range is before its start.")
+    if start > date.today():
+        raise ReportError("The date lost can't be in the future.")
+    if (end - start).days > LOST_REPORT_MAX_DAYS:
+        raise ReportError(f"Keep the date range to {LOST_REPORT_MAX_DAYS} days or fewer.")
+    return start.isoformat(), end.isoformat()
+
+
+def create_report(conn: sqlite3.Connection, student: dict, fields: dict) -> tuple[int, int]:
+    """Store, index and match a report. Returns (report id, matches found)."""
+    lost_from, lost_to = parse_window(fields["lost_from"], fields["lost_to"])
+    cursor = conn.execute(
+        """
+        INSERT INTO lost_reports (
+            student_id, contact_name, contact_email, title, category, location_id,
+            lost_from, lost_to, description, status, created_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'open', ?)
+        """,
+        (
+            student["id"], student["name"], student["email"], fields["title"], fields["category"],
+            locations.resolve(fields["location_id"]), lost_from, lost_to, fields["description"],
+            datetime.now().isoformat(timespec="seconds"),
+        ),
+    )
+    report_id = cursor.lastrowid
+    index_report(conn, report_id, terms(fields["title"], fields["description"]))
+    report = conn.execute("SELECT * FROM lost_reports WHERE id = ?", (report_id,)).fetchone()
+    return report_id, match_report(conn, report)
+
+
+def close_report(conn: sqlite3.Connection, report_id: int, student_id: int) -> bool:
+    closed = conn.execute(
+        "UPDATE lost_reports SET status = 'closed' WHERE id = ? AND student_id = ? AND status = 'open'",
+        (report_id, student_id),
+    ).rowcount
+    if closed:
+        conn.execute("DELETE FROM lost_report_terms WHERE report_id = ?", (report_id,))
+    return bool(closed)
+
+
+def student_reports(conn: sqlite3.Connection, student_id: int) -> list[dict]:
+    """The student's reports, open first, each with its matched items (best first)."""
+    reports = [
+        dict(row, matches=[])
+        for row in conn.execute(
+            "SELECT * FROM lost_reports WHERE student_id = ? ORDER BY status = 'open' DESC, id DESC",
+            (student_id,),
+        )
+    ]
+    by_id = {report["id"]: report for report in reports}
+    for row in conn.execute(
+        """
+        SELECT m.report_id, m.score, f.*
+        FROM lost_matches m
+        JOIN lost_reports r ON r.id = m.report_id
+        JOIN found_items f ON f.id = m.item_id
+        WHERE r.student_id = ? AND f.status IN ('approved', 'claimed')
+        ORDER BY m.score DESC
+        """,
+        (student_id,),
+    ):
+        by_id[row["report_id"]]["matches"].append(dict(row))
+    for report in reports:
+        report["location_name"] = (locations.get(report["location_id"]) or {}).get("name", "")
+    return reports
+
+
+def init_app(app) -> None:
+    def current_student() -> dict | None:
+        if session.get("is_student") is not True:
+            return None
+        return {"id": session["student_id"], "name": session["student_name"], "email": session["student_email"]}
+
+    @app.route("/lost/report", methods=["GET", "POST"])
+    def report_lost():
+        student = current_student()
+        if student is None:
+            flash("Log in with your student account to report a lost item.", "error")
+            return redirect(url_for("student_login"))
+
+        if request.method == "POST":
+            fields = {
+                name: request.form.get(name, "").strip()
+                for name in ("title", "category", "location_id", "lost_from", "lost_to", "description")
+            }
+            if not all(fields[name] for name in ("title", "category", "location_id", "lost_from", "description")):
+                flash("Please fill out all required fields.", "error")
+                return redirect(url_for("report_lost"))
+
+            conn = db.get_conn()
+            try:
+                _, matched = create_report(conn, student, fields)
+                conn.commit()
+                count_matches(matched)
+            except ReportError as exc:
+                conn.rollback()
+                flash(str(exc), "error")
+                return redirect(url_for("report_lost"))
+            finally:
+                conn.close()
+
+            if matched:
+                flash(f"Report saved. We already have {matched} possible match(es) below.", "success")
+            else:
+                flash("Report saved. We'll email you when a matching item is turned in.", "success")
+            return redirect(url_for("my_lost_reports"))
+
+        return render_template(
+            "lost_report.html", campus_locations=locations.LOCATIONS, max_days=LOST_REPORT_MAX_DAYS
+        )
+
+    @app.get("/lost")
+    def my_lost_reports():
+        student = current_student()
+        if student is None:
+            flash("Log in with your student account to see your lost reports.", "error")
+            return redirect(url_for("student_login"))
+        conn = db.get_conn()
+        try:
+            reports = student_reports(conn, student["id"])
+        finally:
+            conn.close()
+        return render_template("lost_reports.html", reports=reports)
+
+    @app.post("/lost/<int:report_id>/close")
+    def close_lost_report(report_id: int):
+        student = current_student()
+        if student is None:
+            return redirect(url_for("student_login"))
+        conn = db.get_conn()
+        try:
+            closed = close_report(conn, report_id, student["id"])
+            conn.commit()
+        finally:
+            conn.close()
+        flash("Report closed." if closed else "Report not found.", "success" if closed else "error")
+        return redirect(url_for("my_lost_reports"))
+
+    @app.cli.command("lost-reindex")
+    def lost_reindex_command():
+        """Rebuild the word index of open lost reports."""
+        print(f"Indexed {rebuild_index(db.get_conn())} open lost reports.")
@@ -0,0 +1,330 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+import db
+import instrumentation
+import metrics
+
+if TYPE_CHECKING:
+    from email.message import EmailMessage
+
+log = logging.getLogger(__name__)
+
+# Outgoing mail is written to the `outbox` table inside the request's
+# transaction and delivered by a background sender that keeps one
+# authenticated SMTP session open, so requests never wait on SMTP.
+OUTBOX_WORKER = os.getenv("OUTBOX_WORKER", "true").lower() == "true"
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "30"))     # seconds
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "3600"))
+OUTBOX_LEASE = 300          # a crashed sender's claimed rows become due again after this
+OUTBOX_BATCH = 20
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+
+# "smtp" delivers through SMTP_*; "console" logs messages instead (local dev).
+MAIL_BACKEND = os.getenv("MAIL_BACKEND", "smtp").lower()
+
+
+def get_email_config() -> tuple[str, int, str, str, bool, str]:
+    smtp_host = os.getenv("SMTP_HOST")
+    smtp_port = int(os.getenv("SMTP_PORT", "587"))
+    smtp_username = os.getenv("SMTP_USERNAME")
+    smtp_password = os.getenv("SMTP_PASSWORD")
+    smtp_use_tls = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+    from_email = os.getenv("MAIL_FROM", smtp_username or "no-reply@example.com")
+
+    if not smtp_host or not smtp_username or not smtp_password:
+        raise RuntimeError(
+            "Email is not configured. Set SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, and MAIL_FROM."
+        )
+
+    return smtp_host, smtp_port, smtp_username, smtp_password, smtp_use_tls, from_email
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+# -------------------
+# Enqueue (request side)
+# -------------------
+_wakeup = threading.Event()
+
+
+def enqueue(subject: str, to_email: str, body: str, conn: sqlite3.Connection | None = None) -> int:
+    """Queue an email. Raises RuntimeError if email is not configured.
+
+    Pass `conn` to make the message part of the caller's transaction (the
+    caller commits); otherwise it is committed immediately.
+    """
+    if MAIL_BACKEND == "smtp":
+        get_email_config()
+
+    own_conn = conn is None
+    if own_conn:
+        conn = db.get_conn()
+    try:
+        cursor = conn.execute(
+            """
+            INSERT INTO outbox (to_email, subject, body, status, attempts, next_attempt_at, created_at)
+            VALUES (?, ?, ?, 'pending', 0, ?, ?)
+            """,
+            (to_email, subject, body, _now(), _now()),
+        )
+        if own_conn:
+            conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+    _wakeup.set()
+    return cursor.lastrowid
+
+
+# -------------------
+# Transports
+# -------------------
+class SMTPTransport:
+    """One reusable authenticated SMTP session, reopened when it goes stale."""
+
+    def __init__(self):
+        self.server = None
+        self.last_used = 0.0
+
+    def _open(self):
+        import smtplib  # deferred: only the sending process needs it
+
+        smtp_host, smtp_port, smtp_username, smtp_password, smtp_use_tls, _ = get_email_config()
+        server = smtplib.SMTP(smtp_host, smtp_port, timeout=30)
+        if smtp_use_tls:
+            server.starttls()
+        server.login(smtp_username, smtp_password)
+        return server
+
+    def send(self, msg: "EmailMessage") -> None:
+        import smtplib
+
+        self.close_if_idle()
+        if self.server is None:
+            self.server = self._open()
+        try:
+            self.server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Session dropped between messages; retry once on a fresh one.
+            self.server = self._open()
+            self.server.send_message(msg)
+        except smtplib.SMTPException:
+            self.close()
+            raise
+        self.last_used = time.monotonic()
+
+    def close_if_idle(self) -> None:
+        if self.server is not None and time.monotonic() - self.last_used > SMTP_IDLE_TIMEOUT:
+            self.close()
+
+    def close(self) -> None:
+        import smtplib
+
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+
+
+class ConsoleTransport:
+    def send(self, msg: "EmailMessage") -> None:
+        log.info("Email to %s: %s\n%s", msg["To"], msg["Subject"], msg.get_content())
+
+    def close_if_idle(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def make_transport():
+    return ConsoleTransport() if MAIL_BACKEND == "console" else SMTPTransport()
+
+
+def build_message(row) -> "EmailMessage":
+    from email.message import EmailMessage
+
+    msg = EmailMessage()
+    msg["Subject"] = row["subject"]
+    msg["From"] = os.getenv("MAIL_FROM", os.getenv("SMTP_USERNAME") or "no-reply@example.com")
+    msg["To"] = row["to_email"]
+    msg.set_content(row["body"])
+    return msg
+
+
+# -------------------
+# Delivery (sender side)
+# -------------------
+def backoff(attempts: int) -> float:
+    return min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX)
+
+
+def _claim_due(conn: sqlite3.Connection) -> list:
+    """Lease due rows so concurrent senders in other workers skip them.
+
+    The attempt is counted here, not after sending, so a message whose send
+    crashes or hangs the sender (its lease then expires) still runs out of
+    attempts instead of being retried forever.
+    """
+    now = datetime.now()
+    lease_until = (now + timedelta(seconds=OUTBOX_LEASE)).isoformat(timespec="seconds")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            """
+            SELECT * FROM outbox
+            WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+            ORDER BY id
+            LIMIT ?
+            """,
+            (now.isoformat(timespec="seconds"), OUTBOX_BATCH),
+        ).fetchall()
+        # An expired lease whose attempts are used up is a failure, not a retry.
+        abandoned, leased = [], []
+        for row in rows:
+            used_up = row["status"] == "sending" and row["attempts"] >= OUTBOX_MAX_ATTEMPTS
+            (abandoned if used_up else leased).append(row)
+        conn.executemany(
+            "UPDATE outbox SET status='failed', last_error=? WHERE id=?",
+            [("Sender did not finish within the lease", row["id"]) for row in abandoned],
+        )
+        conn.executemany(
+            "UPDATE outbox SET status='sending', attempts=attempts + 1, next_attempt_at=? WHERE id=?",
+            [(lease_until, row["id"]) for row in leased],
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for row in abandoned:
+        metrics.MAIL_FAILED.inc()
+        log.warning("Email %s to %s abandoned after %s attempts", row["id"], row["to_email"], row["attempts"])
+    return leased
+
+
+def deliver_due(conn: sqlite3.Connection, transport) -> tuple[int, int]:
+    """Send every due message once. Returns (sent, failed)."""
+    sent = failed = 0
+    for row in _claim_due(conn):
+        attempts = row["attempts"] + 1  # as counted by _claim_due()
+        try:
+            with instrumentation.timed("mail"):
+                transport.send(build_message(row))
+        except Exception as exc:
+            failed += 1
+            metrics.MAIL_FAILED.inc()
+            give_up = attempts >= OUTBOX_MAX_ATTEMPTS
+            retry_at = datetime.now() + timedelta(seconds=backoff(attempts))
+            conn.execute(
+                """
+                UPDATE outbox SET status=?, attempts=?, last_error=?, next_attempt_at=?
+                WHERE id=?
+                """,
+                (
+                    "failed" if give_up else "pending",
+                    attempts,
+                    str(exc)[:500],
+                    retry_at.isoformat(timespec="seconds"),
+                    row["id"],
+                ),
+            )
+            log.warning("Email %s to %s failed (attempt %s): %s", row["id"], row["to_email"], attempts, exc)
+        else:
+            sent += 1
+            metrics.MAIL_SENT.inc()
+            conn.execute(
+                "UPDATE outbox SET status='sent', attempts=?, last_error=NULL, sent_at=? WHERE id=?",
+                (attempts, _now(), row["id"]),
+            )
+        conn.commit()
+    return sent, failed
+
+
+def queue_stats(conn: sqlite3.Connection) -> dict[str, int]:
+    return {row[0]: row[1] for row in conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")}
+
+
+class OutboxWorker(threading.Thread):
+    def __init__(self, poll_interval: float = OUTBOX_POLL_INTERVAL):
+        super().__init__(name="outbox-sender", daemon=True)
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+        self.transport = make_transport()
+
+    def run(self) -> None:
+        while not self.stopping.is_set():
+            conn = db.get_pool().acquire()
+            try:
+                deliver_due(conn, self.transport)
+            except Exception:
+                log.exception("Outbox delivery pass failed")
+            finally:
+                conn.close()
+            self.transport.close_if_idle()
+            _wakeup.wait(self.poll_interval)
+            _wakeup.clear()
+        self.transport.close()
+
+    def stop(self) -> None:
+        self.stopping.set()
+        _wakeup.set()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker() -> OutboxWorker:
+    """Start this process's sender thread (once per process, fork-safe)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive() or _worker.pid != os.getpid():
+            _worker = OutboxWorker()
+            _worker.pid = os.getpid()
+            _worker.start()
+        return _worker
+
+
+def stop_worker(timeout: float = 10) -> None:
+    """Stop this process's sender after its current message (graceful shutdown)."""
+    with _worker_lock:
+        worker = _worker
+    if worker is not None and worker.is_alive() and worker.pid == os.getpid():
+        worker.stop()
+        worker.join(timeout)
+
+
+def init_app(app) -> None:
+    if OUTBOX_WORKER:
+        # Started lazily so a pre-forking server doesn't start it in the master.
+        @app.before_request
+        def ensure_outbox_worker():
+            if not app.testing:
+                start_worker()
+
+    @app.cli.command("outbox-send")
+    def outbox_send_command():
+        """Deliver all due emails once and exit."""
+        transport = make_transport()
+        try:
+            sent, failed = deliver_due(db.get_conn(), transport)
+        finally:
+            transport.close()
+        print(f"Sent {sent}, failed {failed}.")
+
+    @app.cli.command("outbox-status")
+    def outbox_status_command():
+        """Show outbox counts by delivery status."""
+        print(queue_stats(db.get_conn()) or "Outbox is empty.")
@@ -0,0 +1,325 @@
+import atexit
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from flask import Response, g, request
+
+import db
+import instrumentation
+import rendercache
+import startup
+import stats
+
+# Prometheus text-format metrics at /metrics.
+#
+# Each process keeps its own counters in memory. With METRICS_DIR set, it
+# also writes them to METRICS_DIR/<pid>.json at most every
+# METRICS_FLUSH_INTERVAL seconds, and a scrape sums every process's file:
+# counters and histograms from all of them (so a recycled worker's requests
+# still count), gauges only from live processes. Empty the directory when
+# the server starts. Without METRICS_DIR, /metrics shows the answering
+# process only.
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))  # seconds
+# Item, claim and outbox counts come from stats_counters, read at most this
+# often per process however often /metrics is scraped.
+METRICS_DB_INTERVAL = float(os.getenv("METRICS_DB_INTERVAL", "30"))
+# When set, scrapes must send "Authorization: Bearer <token>".
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# -------------------
+# Registry
+# -------------------
+class Metric:
+    """Values by label tuple. `scope` is how processes combine:
+    "sum" (counters), "live" (gauges summed over running processes) or
+    "local" (the same for every process, e.g. database counts).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), scope: str = "live"):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.scope = scope
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def set(self, value: float, *labels) -> None:
+        with self.lock:
+            self.values[labels] = value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        super().__init__(name, help_text, labels, scope="sum")
+
+    def inc(self, amount: float = 1, *labels) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels, scope="sum")
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                # Per-bucket counts (not cumulative) plus +Inf, then the sum.
+                entry = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+
+REGISTRY = {}
+
+REQUESTS = Counter("ahs_http_requests_total", "HTTP requests by endpoint, method and status.",
+                   ("endpoint", "method", "status"))
+LATENCY = Histogram("ahs_http_request_duration_seconds", "Time to build the response, by endpoint.",
+                    ("endpoint",))
+UPLOADS = Counter("ahs_uploads_total", "Photo uploads by result.", ("result",))
+UPLOAD_BYTES = Counter("ahs_upload_bytes_total", "Bytes of photo uploads stored.")
+MAIL_SENT = Counter("ahs_outbox_sent_total", "Emails delivered from the outbox.")
+MAIL_FAILED = Counter("ahs_outbox_failed_total", "Outbox delivery attempts that failed.")
+LOST_MATCHES = Counter("ahs_lost_matches_total", "Found items matched to open lost reports.")
+
+POOL_CONNECTIONS = Metric("ahs_db_pool_connections", "Pooled SQLite connections by state.", ("state",))
+POOL_EVENTS = Counter("ahs_db_pool_events_total", "Connection pool events (created, reused, waits, ...).",
+                      ("event",))
+QUERIES = Counter("ahs_db_queries_total", "SQL statements executed on pooled connections.")
+QUERY_SECONDS = Counter("ahs_db_query_seconds_total", "Time spent executing and fetching SQL.")
+PHASE_SECONDS = Counter("ahs_phase_seconds_total", "Time in instrumented phases (render, upload, mail, ...).",
+                        ("phase",))
+RENDER_CACHE = Counter("ahs_render_cache_requests_total", "Fragment cache lookups by result.", ("result",))
+RENDER_CACHE_BYTES = Metric("ahs_render_cache_bytes", "Bytes held by fragment caches.")
+
+FOUND_ITEMS = Metric("ahs_found_items", "Found items by status.", ("status",), scope="local")
+CLAIMS = Metric("ahs_claims", "Claims by status.", ("status",), scope="local")
+OUTBOX = Metric("ahs_outbox_messages", "Outbox messages by delivery status.", ("status",), scope="local")
+PROCESSES = Metric("ahs_metrics_processes", "Live processes reporting metrics.", scope="local")
+STARTUP = Metric("ahs_startup_seconds", "Startup time of the answering process by phase.", ("phase",),
+                 scope="local")
+
+
+# -------------------
+# Collection
+# -------------------
+_last_flush = 0.0
+_last_db_read = 0.0
+_flush_lock = threading.Lock()
+
+
+def _collect_process() -> None:
+    """Copy this process's totals from the modules that keep them."""
+    pool = db.pool_stats()
+    for state in ("open", "idle", "in_use"):
+        POOL_CONNECTIONS.set(pool[state], state)
+    for event in ("created", "reused", "waits", "timeouts", "discarded"):
+        POOL_EVENTS.set(pool[event], event)
+
+    # Not summed from query_stats(): that table stops at QUERY_STATS_MAX queries.
+    totals = instrumentation.query_totals()
+    QUERIES.set(totals["count"])
+    QUERY_SECONDS.set(totals["ms"] / 1000)
+    for phase, entry in instrumentation.phase_stats().items():
+        PHASE_SECONDS.set(entry["ms"] / 1000, phase)
+
+    cache = rendercache.cache_stats()
+    RENDER_CACHE.set(cache["hits"], "hit")
+    RENDER_CACHE.set(cache["misses"], "miss")
+    RENDER_CACHE_BYTES.set(cache["bytes"])
+
+    for phase, ms in startup.timings().items():
+        STARTUP.set(ms / 1000, phase)
+
+
+def _collect_database(conn) -> None:
+    global _last_db_read
+    now = time.monotonic()
+    if _last_db_read and now - _last_db_read < METRICS_DB_INTERVAL:
+        return
+    _last_db_read = now
+    counters = stats.read_counters(conn)
+    for metric, prefix in ((FOUND_ITEMS, "found_items:"), (CLAIMS, "claims:"), (OUTBOX, "outbox:")):
+        with metric.lock:
+            metric.values = {
+                (name[len(prefix):],): value for name, value in counters.items() if name.startswith(prefix)
+            }
+
+
+def snapshot() -> dict:
+    metrics = {}
+    for name, metric in REGISTRY.items():
+        if metric.scope == "local":
+            continue
+        with metric.lock:
+            metrics[name] = [[list(labels), value] for labels, value in metric.values.items()]
+    return {"pid": os.getpid(), "metrics": metrics}
+
+
+def flush() -> None:
+    """Write this process's snapshot to METRICS_DIR/<pid>.json (atomically)."""
+    global _last_flush
+    if not METRICS_DIR:
+        return
+    with _flush_lock:
+        _last_flush = time.monotonic()
+        _collect_process()
+        directory = Path(METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(snapshot(), f, separators=(",", ":"))
+            os.replace(temp_name, directory / f"{os.getpid()}.json")
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+
+def maybe_flush() -> None:
+    if METRICS_DIR and time.monotonic() - _last_flush >= METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def clear_dir() -> None:
+    """Remove every process's file; call once when the server starts."""
+    if METRICS_DIR and Path(METRICS_DIR).is_dir():
+        for path in Path(METRICS_DIR).glob("*.json"):
+            path.unlink(missing_ok=True)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _snapshots() -> list[tuple[dict, bool]]:
+    if not METRICS_DIR:
+        _collect_process()
+        return [(snapshot(), True)]
+    flush()
+    found = []
+    for path in Path(METRICS_DIR).glob("*.json"):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # replaced or removed under us
+        found.append((data, _alive(data["pid"])))
+    return found
+
+
+def merged() -> dict:
+    """{metric name: {labels: value}} across every reporting process."""
+    snapshots = _snapshots()
+    PROCESSES.set(sum(1 for _, alive in snapshots if alive))
+    result = {}
+    for name, metric in REGISTRY.items():
+        if metric.scope == "local":
+            with metric.lock:
+                result[name] = dict(metric.values)
+            continue
+        values = result[name] = {}
+        for data, alive in snapshots:
+            if metric.scope == "live" and not alive:
+                continue
+            for labels, value in data["metrics"].get(name, []):
+                labels = tuple(labels)
+                if isinstance(value, list):
+                    current = values.setdefault(labels, [0] * len(value))
+                    values[labels] = [a + b for a, b in zip(current, value)]
+                else:
+                    values[labels] = values.get(labels, 0) + value
+    return result
+
+
+# -------------------
+# Exposition
+# -------------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: tuple = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_text(values: dict) -> str:
+    lines = []
+    for name, metric in REGISTRY.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels, value in sorted(values.get(name, {}).items()):
+            if metric.kind != "histogram":
+                lines.append(f"{name}{_labels(metric.labels, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + ("+Inf",), value[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(bound)
+                lines.append(f"{name}_bucket{_labels(metric.labels, labels, (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labels, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(metric.labels, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app) -> None:
+    if METRICS_DIR:
+        atexit.register(flush)
+
+    @app.before_request
+    def start_request_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            REQUESTS.inc(1, endpoint, request.method, str(response.status_code))
+            LATENCY.observe(time.perf_counter() - started, endpoint)
+            maybe_flush()
+        return response
+
+    @app.get("/metrics")
+    def metrics_endpoint():
+        if METRICS_TOKEN:
+            supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            if not hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+                return Response("Unauthorized\n", 401, {"WWW-Authenticate": "Bearer"})
+        _collect_database(db.get_conn())
+        response = Response(render_text(merged()), mimetype="text/plain")
+        response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+        response.headers["Cache-Control"] = "no-store"
+        return response
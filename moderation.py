@@ -0,0 +1,81 @@
+import sqlite3
+
+# Bulk moderation of found_items. Each action is one UPDATE/DELETE per chunk
+# of ids inside a single transaction; `allowed` restricts which current
+# statuses it applies to, so re-submitting a stale selection is harmless.
+BULK_MAX_ITEMS = 1000
+CHUNK = 500  # stays under SQLite's bound-parameter limit
+
+ACTIONS = {
+    "approve": {"status": "approved", "allowed": ("pending", "rejected")},
+    "claim": {"status": "claimed", "allowed": ("pending", "approved", "rejected")},
+    "reject": {"status": "rejected", "allowed": ("pending",)},
+    "delete": {"status": None, "allowed": None},
+}
+
+
+class BulkActionError(ValueError):
+    pass
+
+
+def parse_ids(values) -> list[int]:
+    ids = sorted({int(v) for v in values if str(v).isdigit()})
+    if not ids:
+        raise BulkActionError("Select at least one item.")
+    if len(ids) > BULK_MAX_ITEMS:
+        raise BulkActionError(f"Select at most {BULK_MAX_ITEMS} items at a time.")
+    return ids
+
+
+def _chunks(ids: list[int]):
+    for start in range(0, len(ids), CHUNK):
+        chunk = ids[start:start + CHUNK]
+        yield chunk, ",".join("?" * len(chunk))
+
+
+def apply(conn: sqlite3.Connection, action: str, ids: list[int], on_changed=None) -> dict:
+    """Run `action` on `ids` in one transaction.
+
+    on_changed(conn, rows) is called inside the transaction with the affected
+    rows (as they were before the change), e.g. to publish events.
+    Returns a summary with the affected ids and, for deletes, photo names to
+    release once the transaction has committed.
+    """
+    if action not in ACTIONS:
+        raise BulkActionError(f"Unknown action: {action}")
+    spec = ACTIONS[action]
+
+    changed, photos = [], []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for chunk, marks in _chunks(ids):
+            where = f"id IN ({marks})"
+            params = list(chunk)
+            if spec["allowed"]:
+                where += f" AND status IN ({','.join('?' * len(spec['allowed']))})"
+                params += spec["allowed"]
+
+            rows = conn.execute(f"SELECT * FROM found_items WHERE {where}", params).fetchall()
+            if not rows:
+                continue
+            if spec["status"] is None:
+                conn.execute(f"DELETE FROM found_items WHERE {where}", params)
+                photos += [row["photo_filename"] for row in rows if row["photo_filename"]]
+            else:
+                conn.execute(f"UPDATE found_items SET status = ? WHERE {where}", [spec["status"]] + params)
+            changed += [row["id"] for row in rows]
+            if on_changed:
+                on_changed(conn, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return {
+        "action": action,
+        "status": spec["status"],
+        "requested": len(ids),
+        "changed": changed,
+        "skipped": len(ids) - len(changed),
+        "photos": photos,
+    }
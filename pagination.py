@@ -0,0 +1,133 @@
+import os
+import sqlite3
+
+from flask import request, url_for
+
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE", "24"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+
+# Keyset pagination: instead of OFFSET, each page remembers the sort key of
+# its first/last row and the next query continues strictly after it. Rows
+# inserted meanwhile never shift later pages, and the cost of a page does not
+# grow with how deep into the archive it is.
+ID_DESC = (("id", True, int),)
+
+
+class Page:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def page_size(raw, default: int = DEFAULT_PAGE_SIZE) -> int:
+    try:
+        size = int(raw)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(row, keys) -> str:
+    return ":".join(repr(row[name]) for name, _, _ in keys)
+
+
+def decode_cursor(raw: str | None, keys):
+    if not raw:
+        return None
+    parts = raw.split(":")
+    if len(parts) != len(keys):
+        return None
+    try:
+        return [cast(part) for part, (_, _, cast) in zip(parts, keys)]
+    except ValueError:
+        return None
+
+
+def keyset_sql(sql: str, keys=ID_DESC, cursor=None, backwards: bool = False) -> tuple[str, list]:
+    """The page query keyset_page() runs, and its cursor params.
+
+    It binds `sql`'s own params, then the cursor params, then the LIMIT.
+    """
+    where = ""
+    cursor_params = []
+    if cursor is not None:
+        # (k1 op v1) OR (k1 = v1 AND k2 op v2) OR ...
+        clauses = []
+        for i, (name, descending, _) in enumerate(keys):
+            op = "<" if descending != backwards else ">"
+            equal = [f"{prev} = ?" for prev, _, _ in keys[:i]]
+            clauses.append("(" + " AND ".join(equal + [f"{name} {op} ?"]) + ")")
+            cursor_params.extend(cursor[:i] + [cursor[i]])
+        where = " WHERE " + " OR ".join(clauses)
+
+    order = ", ".join(
+        f"{name} {'DESC' if descending != backwards else 'ASC'}" for name, descending, _ in keys
+    )
+    return f"SELECT * FROM ({sql}) AS page{where} ORDER BY {order} LIMIT ?", cursor_params
+
+
+def keyset_page(
+    conn: sqlite3.Connection,
+    sql: str,
+    params=(),
+    *,
+    after: str | None = None,
+    before: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    keys=ID_DESC,
+) -> Page:
+    """Fetch one page of `sql` ordered by `keys`.
+
+    `keys` is a sequence of (column, descending, type) and must end in a unique
+    column. `after`/`before` are cursors from a previous Page; `before` walks
+    backwards. `sql` is wrapped as a subquery, which SQLite flattens, so the
+    keyset predicate still reaches the underlying indexes.
+    """
+    backwards = before is not None and after is None
+    cursor = decode_cursor(before if backwards else after, keys)
+    if cursor is None:
+        backwards = False
+
+    page_sql, cursor_params = keyset_sql(sql, keys, cursor, backwards)
+    rows = conn.execute(page_sql, (*params, *cursor_params, limit + 1)).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return Page(rows)
+
+    if backwards:
+        next_cursor = encode_cursor(rows[-1], keys)
+        prev_cursor = encode_cursor(rows[0], keys) if has_more else None
+    else:
+        next_cursor = encode_cursor(rows[-1], keys) if has_more else None
+        prev_cursor = encode_cursor(rows[0], keys) if cursor is not None else None
+    return Page(rows, next_cursor, prev_cursor)
+
+
+def page_args(args) -> dict:
+    """Read after/before/limit from request.args for keyset_page()."""
+    return {
+        "after": args.get("after") or None,
+        "before": args.get("before") or None,
+        "limit": page_size(args.get("limit")),
+    }
+
+
+def page_url(after: str | None = None, before: str | None = None) -> str:
+    """URL for the current view with the same filters and a new cursor."""
+    args = {k: v for k, v in request.args.items() if k not in ("after", "before")}
+    if after:
+        args["after"] = after
+    if before:
+        args["before"] = before
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
@@ -0,0 +1,46 @@
+import os
+import threading
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Hashing policy. Any werkzeug method string works, e.g. "scrypt:32768:8:1"
+# or "pbkdf2:sha256:600000". Stored hashes made with other parameters are
+# upgraded the next time their owner logs in.
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+
+# Hashes computed at once per process. Each one is tens of milliseconds of
+# CPU (and scrypt's memory); beyond this, requests wait instead of piling on.
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", "2"))
+
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_CONCURRENCY)
+_method_prefix = None
+
+
+def _current_prefix() -> str:
+    # Werkzeug expands bare names ("scrypt") to full parameters; compare against that.
+    global _method_prefix
+    if _method_prefix is None:
+        _method_prefix = hash_password("").split("$", 1)[0]
+    return _method_prefix
+
+
+def hash_password(password: str) -> str:
+    with _slots:
+        return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+
+def needs_rehash(stored_hash: str) -> bool:
+    return stored_hash.split("$", 1)[0] != _current_prefix()
+
+
+def verify_password(stored_hash: str, password: str) -> tuple[bool, str | None]:
+    """Check a password. Returns (ok, replacement_hash).
+
+    replacement_hash is set when the password matched but was stored with
+    outdated parameters; the caller should persist it.
+    """
+    with _slots:
+        ok = check_password_hash(stored_hash, password)
+    if ok and needs_rehash(stored_hash):
+        return True, hash_password(password)
+    return ok, None
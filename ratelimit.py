@@ -0,0 +1,142 @@
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from flask import request
+
+import db
+
+# Sliding-window limits on failed logins, as "attempts/seconds". Once a key is
+# over its limit, further attempts are refused before any password is hashed.
+# The per-IP limit keys on request.remote_addr; behind a reverse proxy, set
+# TRUSTED_PROXIES (app.py) so that is the client rather than the proxy.
+LOGIN_LIMIT_PER_IP = os.getenv("LOGIN_LIMIT_PER_IP", "20/300")
+LOGIN_LIMIT_PER_ACCOUNT = os.getenv("LOGIN_LIMIT_PER_ACCOUNT", "5/300")
+
+# "sqlite" shares counts between worker processes; "memory" is per process.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite").lower()
+
+
+def parse_limit(spec: str) -> tuple[int, float]:
+    attempts, seconds = spec.split("/", 1)
+    return int(attempts), float(seconds)
+
+
+class MemoryBackend:
+    def __init__(self):
+        self.hits = defaultdict(deque)
+        self.lock = threading.Lock()
+
+    def recent(self, key: str, since: float) -> list[float]:
+        with self.lock:
+            hits = self.hits.get(key)
+            if not hits:
+                return []
+            while hits and hits[0] <= since:
+                hits.popleft()
+            if not hits:
+                del self.hits[key]
+            return list(hits)
+
+    def record(self, key: str, now: float) -> None:
+        with self.lock:
+            self.hits[key].append(now)
+
+    def reset(self, key: str) -> None:
+        with self.lock:
+            self.hits.pop(key, None)
+
+
+class SQLiteBackend:
+    """Failures in the login_failures table (migration 14)."""
+
+    PRUNE_EVERY = 600  # seconds
+
+    def __init__(self, max_window: float):
+        self.max_window = max_window
+        self.last_prune = 0.0
+
+    def recent(self, key: str, since: float) -> list[float]:
+        conn = db.get_conn()
+        try:
+            rows = conn.execute(
+                "SELECT at FROM login_failures WHERE key = ? AND at > ? ORDER BY at",
+                (key, since),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [row[0] for row in rows]
+
+    def record(self, key: str, now: float) -> None:
+        conn = db.get_conn()
+        try:
+            conn.execute("INSERT INTO login_failures (key, at) VALUES (?, ?)", (key, now))
+            if now - self.last_prune > self.PRUNE_EVERY:
+                self.last_prune = now
+                conn.execute("DELETE FROM login_failures WHERE at <= ?", (now - self.max_window,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def reset(self, key: str) -> None:
+        conn = db.get_conn()
+        try:
+            conn.execute("DELETE FROM login_failures WHERE key = ?", (key,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class LoginLimiter:
+    def __init__(self, backend, per_ip: tuple[int, float], per_account: tuple[int, float]):
+        self.backend = backend
+        self.per_ip = per_ip
+        self.per_account = per_account
+
+    def _keys(self, scope: str, account: str) -> list[tuple[str, tuple[int, float]]]:
+        return [
+            (f"ip:{request.remote_addr}", self.per_ip),
+            (f"{scope}:{account.lower()}", self.per_account),
+        ]
+
+    def retry_after(self, scope: str, account: str) -> int:
+        """Seconds until another attempt is allowed (0 if allowed now)."""
+        now = time.time()
+        wait = 0.0
+        for key, (attempts, window) in self._keys(scope, account):
+            hits = self.backend.recent(key, now - window)
+            if len(hits) >= attempts:
+                # The window slides: the oldest counted failure has to age out.
+                wait = max(wait, hits[-attempts] + window - now)
+        return math.ceil(wait)
+
+    def failed(self, scope: str, account: str) -> None:
+        now = time.time()
+        for key, _ in self._keys(scope, account):
+            self.backend.record(key, now)
+
+    def succeeded(self, scope: str, account: str) -> None:
+        # The account's slate is wiped; the IP's is not, so one good login
+        # can't launder a spray across many accounts.
+        self.backend.reset(f"{scope}:{account.lower()}")
+
+
+def make_limiter() -> LoginLimiter:
+    per_ip = parse_limit(LOGIN_LIMIT_PER_IP)
+    per_account = parse_limit(LOGIN_LIMIT_PER_ACCOUNT)
+    if RATE_LIMIT_BACKEND == "memory":
+        backend = MemoryBackend()
+    else:
+        backend = SQLiteBackend(max(per_ip[1], per_account[1]))
+    return LoginLimiter(backend, per_ip, per_account)
+
+
+login_limiter = make_limiter()
+
+
+def wait_message(seconds: int) -> str:
+    minutes = math.ceil(seconds / 60)
+    unit = "minute" if minutes == 1 else "minutes"
+    return f"Too many failed attempts. Try again in {minutes} {unit}."
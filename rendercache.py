@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request
+from markupsafe import Markup
+
+import instrumentation
+import stats
+
+# Rendered HTML fragments for the public pages (browse results, category
+# filter, today's finds, map pins, review list), keyed on the inputs that
+# shape them plus the data version of the tables they read. The version
+# counters are bumped by triggers in every writing transaction, so a write
+# in any process makes the old entries unreachable; they age out of the LRU.
+RENDER_CACHE = os.getenv("RENDER_CACHE", "true").lower() == "true"
+RENDER_CACHE_MAX_BYTES = int(float(os.getenv("RENDER_CACHE_MB", "16")) * 1024 * 1024)
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered strings, bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: str) -> None:
+        cost = sys.getsizeof(value)
+        if cost > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= sys.getsizeof(old)
+            self.entries[key] = value
+            self.size += cost
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= sys.getsizeof(evicted)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_cache = FragmentCache(RENDER_CACHE_MAX_BYTES)
+
+
+def request_key() -> tuple:
+    """All query arguments, for fragments whose links echo the current URL."""
+    return tuple(sorted(request.args.items(multi=True)))
+
+
+def render(template_name: str, **context) -> str:
+    """Render a partial without context processors, so no per-user state leaks in."""
+    with instrumentation.timed("render"):
+        return current_app.jinja_env.get_template(template_name).render(context)
+
+
+def fragment(conn, name: str, tables: tuple[str, ...], key: tuple, build) -> Markup:
+    """Cached build() output for `name`/`key` at the current version of `tables`.
+
+    `build` does the querying and rendering and only runs on a miss.
+    """
+    if not RENDER_CACHE:
+        return Markup(build())
+    versions = tuple(stats.data_version(conn, table) for table in tables)
+    full_key = (name, versions, key)
+    html = _cache.get(full_key)
+    if html is None:
+        html = build()
+        _cache.put(full_key, html)
+    return Markup(html)
+
+
+def clear() -> None:
+    _cache.clear()
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
+
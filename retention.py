@@ -0,0 +1,275 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import click
+
+import blobstore
+import db
+
+log = logging.getLogger(__name__)
+
+# Retention policies. Matching items (and their claims) are copied into
+# archived_found_items / archived_claims, then removed from the hot tables;
+# photos nothing else references move to RETENTION_COLD_DIR. A policy set to
+# 0 is off.
+RETENTION_CLAIMED_DAYS = int(os.getenv("RETENTION_CLAIMED_DAYS", "30"))
+RETENTION_UNCLAIMED_DAYS = int(os.getenv("RETENTION_UNCLAIMED_DAYS", "180"))
+RETENTION_REJECTED_DAYS = int(os.getenv("RETENTION_REJECTED_DAYS", "14"))
+# Comma-separated YYYY-MM-DD dates. Once one has passed, approved items found
+# before it are archived.
+RETENTION_SEMESTER_ENDS = [
+    d.strip() for d in os.getenv("RETENTION_SEMESTER_ENDS", "").split(",") if d.strip()
+]
+
+# Empty: archive tables live in the main database. Otherwise a separate
+# SQLite file, attached while the job runs.
+ARCHIVE_DB = os.getenv("ARCHIVE_DB", "")
+RETENTION_COLD_DIR = Path(os.getenv("RETENTION_COLD_DIR", "uploads_cold"))
+
+# Background run every N hours; one worker process wins each run. Off (0)
+# unless an operator turns it on: check `flask retention-run --dry-run` first.
+RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", "0"))
+RETENTION_BATCH = 500
+
+UPLOAD_FOLDER = Path("uploads")  # same as app.UPLOAD_FOLDER
+
+def policies(today: date | None = None) -> list[tuple[str, str, list]]:
+    """(name, WHERE clause on found_items, params) for every enabled policy."""
+    today = today or date.today()
+    rules = []
+    if RETENTION_CLAIMED_DAYS:
+        cutoff = (today - timedelta(days=RETENTION_CLAIMED_DAYS)).isoformat()
+        rules.append((f"claimed > {RETENTION_CLAIMED_DAYS}d", "status = 'claimed' AND claimed_at < ?", [cutoff]))
+    if RETENTION_REJECTED_DAYS:
+        cutoff = (today - timedelta(days=RETENTION_REJECTED_DAYS)).isoformat()
+        rules.append((f"rejected > {RETENTION_REJECTED_DAYS}d", "status = 'rejected' AND created_at < ?", [cutoff]))
+    if RETENTION_UNCLAIMED_DAYS:
+        cutoff = (today - timedelta(days=RETENTION_UNCLAIMED_DAYS)).isoformat()
+        rules.append((f"unclaimed > {RETENTION_UNCLAIMED_DAYS}d", "status = 'approved' AND date_found < ?", [cutoff]))
+    past_ends = [d for d in RETENTION_SEMESTER_ENDS if d <= today.isoformat()]
+    if past_ends:
+        semester_end = max(past_ends)
+        rules.append((f"unclaimed before {semester_end}", "status = 'approved' AND date_found < ?", [semester_end]))
+    return rules
+
+
+# -------------------
+# Archive tables
+# -------------------
+ARCHIVE_TABLES = {"found_items": "archived_found_items", "claims": "archived_claims"}
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _ensure_archive_table(conn: sqlite3.Connection, schema: str, source: str) -> list[str]:
+    """Create or widen the archive copy of `source`; returns the shared columns."""
+    target = ARCHIVE_TABLES[source]
+    source_columns = _columns(conn, "main", source)
+    existing = _columns(conn, schema, target)
+    if not existing:
+        conn.execute(
+            f"CREATE TABLE {schema}.{target} AS SELECT *, '' AS archived_at, '' AS archive_reason "
+            f"FROM main.{source} WHERE 0"
+        )
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {schema}.{target}_id ON {target}(id)")
+    else:
+        # found_items gained columns after the archive was created.
+        for column in source_columns:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {schema}.{target} ADD COLUMN {column}")
+    return source_columns
+
+
+def _attach(conn: sqlite3.Connection) -> str:
+    if not ARCHIVE_DB:
+        return "main"
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if "archive" not in attached:
+        conn.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DB,))
+    return "archive"
+
+
+def _detach(conn: sqlite3.Connection, schema: str) -> None:
+    if schema != "main":
+        conn.execute("DETACH DATABASE archive")
+
+
+# -------------------
+# Run
+# -------------------
+def candidates(conn: sqlite3.Connection, today: date | None = None) -> dict[str, list]:
+    """Rows each policy would archive (an item matched by several counts once)."""
+    seen, found = set(), {}
+    for name, where, params in policies(today):
+        rows = conn.execute(
+            f"SELECT id, photo_filename FROM found_items WHERE {where} ORDER BY id", params
+        ).fetchall()
+        found[name] = [row for row in rows if row["id"] not in seen]
+        seen.update(row["id"] for row in rows)
+    return found
+
+
+def _archive_batch(conn, schema, item_columns, claim_columns, ids, reason, now) -> list[str]:
+    marks = ",".join("?" * len(ids))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Claims first, while their items still exist.
+        conn.execute(
+            f"INSERT OR REPLACE INTO {schema}.archived_claims ({', '.join(claim_columns)}, archived_at, archive_reason) "
+            f"SELECT {', '.join(claim_columns)}, ?, ? FROM main.claims WHERE item_id IN ({marks})",
+            [now, reason, *ids],
+        )
+        conn.execute(
+            f"INSERT OR REPLACE INTO {schema}.archived_found_items ({', '.join(item_columns)}, archived_at, archive_reason) "
+            f"SELECT {', '.join(item_columns)}, ?, ? FROM main.found_items WHERE id IN ({marks})",
+            [now, reason, *ids],
+        )
+        photos = [
+            row[0]
+            for row in conn.execute(
+                f"SELECT photo_filename FROM main.found_items WHERE id IN ({marks}) AND photo_filename IS NOT NULL",
+                ids,
+            )
+        ]
+        # Explicit rather than relying on ON DELETE CASCADE (foreign_keys may be off).
+        conn.execute(f"DELETE FROM main.claims WHERE item_id IN ({marks})", ids)
+        conn.execute(f"DELETE FROM main.lost_matches WHERE item_id IN ({marks})", ids)
+        conn.execute(f"DELETE FROM main.found_items WHERE id IN ({marks})", ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return photos
+
+
+def _cold_store(conn: sqlite3.Connection, names: set[str]) -> tuple[int, int]:
+    """Move photos no hot item still references. Returns (files, bytes)."""
+    moved = moved_bytes = 0
+    for name in sorted(names):
+        if blobstore.refcount(conn, name) > 0:
+            continue
+        moved_bytes += blobstore.move_to_cold(UPLOAD_FOLDER, RETENTION_COLD_DIR, name)
+        conn.execute("DELETE FROM blobs WHERE name = ? AND refcount <= 0", (name,))
+        moved += 1
+    conn.commit()
+    return moved, moved_bytes
+
+
+def run(conn: sqlite3.Connection, dry_run: bool = False, today: date | None = None) -> dict:
+    """Apply every policy. Returns a report; with dry_run nothing is changed."""
+    found = candidates(conn, today)
+    report = {
+        "dry_run": dry_run,
+        "policies": {name: len(rows) for name, rows in found.items()},
+        "items": sum(len(rows) for rows in found.values()),
+        "photos": len({row["photo_filename"] for rows in found.values() for row in rows if row["photo_filename"]}),
+        "photos_moved": 0,
+        "bytes_moved": 0,
+    }
+    if dry_run or not report["items"]:
+        return report
+
+    schema = _attach(conn)
+    try:
+        item_columns = _ensure_archive_table(conn, schema, "found_items")
+        claim_columns = _ensure_archive_table(conn, schema, "claims")
+        conn.commit()
+
+        now = datetime.now().isoformat(timespec="seconds")
+        photos = set()
+        for name, rows in found.items():
+            ids = [row["id"] for row in rows]
+            for start in range(0, len(ids), RETENTION_BATCH):
+                photos.update(
+                    _archive_batch(conn, schema, item_columns, claim_columns, ids[start:start + RETENTION_BATCH], name, now)
+                )
+    finally:
+        _detach(conn, schema)
+
+    report["photos_moved"], report["bytes_moved"] = _cold_store(conn, photos)
+    return report
+
+
+def format_report(report: dict) -> str:
+    lines = [f"{'Would archive' if report['dry_run'] else 'Archived'} {report['items']} item(s):"]
+    lines += [f"  {name}: {count}" for name, count in report["policies"].items()]
+    if report["dry_run"]:
+        lines.append(f"  photos referenced: {report['photos']}")
+    else:
+        lines.append(f"  photos moved to {RETENTION_COLD_DIR}: {report['photos_moved']} ({report['bytes_moved']} bytes)")
+    return "\n".join(lines)
+
+
+# -------------------
+# Background job
+# -------------------
+def claim_run(conn: sqlite3.Connection, interval: float) -> bool:
+    """Compare-and-set on the last-run time, so one process per interval wins."""
+    now = int(time.time())
+    conn.execute(
+        "INSERT OR IGNORE INTO stats_counters (name, value) VALUES ('retention:last_run', 0)"
+    )
+    won = conn.execute(
+        "UPDATE stats_counters SET value = ? WHERE name = 'retention:last_run' AND value <= ?",
+        (now, now - interval),
+    ).rowcount
+    conn.commit()
+    return bool(won)
+
+
+class RetentionWorker(threading.Thread):
+    def __init__(self, interval_hours: float = RETENTION_INTERVAL_HOURS):
+        super().__init__(name="retention", daemon=True)
+        self.interval = interval_hours * 3600
+        self.stopping = threading.Event()
+
+    def run(self) -> None:
+        # Check often, run rarely: the shared last-run time decides.
+        while not self.stopping.wait(min(self.interval, 3600) / 4):
+            conn = db.get_pool().acquire()
+            try:
+                if claim_run(conn, self.interval):
+                    log.info(format_report(run(conn)))
+            except Exception:
+                log.exception("Retention run failed")
+            finally:
+                conn.close()
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker() -> RetentionWorker:
+    """Start this process's retention thread (once per process, fork-safe)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive() or _worker.pid != os.getpid():
+            _worker = RetentionWorker()
+            _worker.pid = os.getpid()
+            _worker.start()
+        return _worker
+
+
+def init_app(app) -> None:
+    if RETENTION_INTERVAL_HOURS > 0:
+        @app.before_request
+        def ensure_retention_worker():
+            if not app.testing:
+                start_worker()
+
+    @app.cli.command("retention-run")
+    @click.option("--dry-run", is_flag=True, help="Report what would be archived without changing anything.")
+    def retention_run_command(dry_run):
+        """Archive items past their retention policy and move their photos to cold storage."""
+        print(format_report(run(db.get_conn(), dry_run=dry_run)))
@@ -0,0 +1,100 @@
+import re
+import sqlite3
+
+from markupsafe import Markup, escape
+
+import db
+from pagination import keyset_page
+
+FTS_TABLE = "found_items_fts"
+
+# bm25() column weights: title, description, location_found
+BM25_WEIGHTS = (10.0, 1.0, 4.0)
+
+# Private-use sentinels so highlight()/snippet() output can be HTML-escaped
+# before the <mark> tags are put back in.
+_HL_OPEN = "\ue000"
+_HL_CLOSE = "\ue001"
+
+# Relevance order, newest first among ties. bm25() scores are negative and
+# smaller is better.
+RANKED_KEYS = (("score", False, float), ("id", True, int))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_fts_ready: dict[str, bool] = {}
+
+
+def fts_available(conn: sqlite3.Connection) -> bool:
+    """True when the FTS index exists (the SQLite build has FTS5 and it was migrated)."""
+    key = str(db.DB_PATH)
+    if key not in _fts_ready:
+        _fts_ready[key] = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (FTS_TABLE,)
+        ).fetchone() is not None
+    return _fts_ready[key]
+
+
+def build_match_query(q: str) -> str | None:
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    tokens = _TOKEN_RE.findall(q.lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _marked(value: str | None) -> Markup:
+    text = str(escape(value or ""))
+    return Markup(text.replace(_HL_OPEN, "<mark>").replace(_HL_CLOSE, "</mark>"))
+
+
+def search_approved_items(conn: sqlite3.Connection, q: str, filters: str = "", params=(), **page):
+    """Full-text search over approved items, best matches first.
+
+    `filters` is extra SQL (starting with " AND ...") applied to found_items `f`;
+    `page` is passed through to pagination.keyset_page(). Returns None when
+    full-text search can't be used, so callers can fall back to LIKE matching.
+    """
+    match = build_match_query(q)
+    if match is None or not fts_available(conn):
+        return None
+
+    result = keyset_page(
+        conn,
+        f"""
+        SELECT f.*,
+               bm25({FTS_TABLE}, ?, ?, ?) AS score,
+               highlight({FTS_TABLE}, 0, ?, ?) AS title_hl,
+               snippet({FTS_TABLE}, 1, ?, ?, '…', 16) AS description_snippet
+        FROM {FTS_TABLE}
+        JOIN found_items f ON f.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH ? AND f.status='approved'{filters}
+        """,
+        (*BM25_WEIGHTS, _HL_OPEN, _HL_CLOSE, _HL_OPEN, _HL_CLOSE, match, *params),
+        keys=RANKED_KEYS,
+        **page,
+    )
+
+    items = []
+    for row in result.items:
+        item = dict(row)
+        item["title_html"] = _marked(item.pop("title_hl"))
+        item["snippet_html"] = _marked(item.pop("description_snippet"))
+        items.append(item)
+    result.items = items
+    return result
+
+
+def rebuild_index(conn: sqlite3.Connection) -> None:
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+    conn.commit()
+
+
+def init_app(app) -> None:
+    @app.cli.command("search-reindex")
+    def search_reindex_command():
+        """Rebuild the full-text index from found_items."""
+        conn = db.get_conn()
+        if not fts_available(conn):
+            raise SystemExit("FTS5 index not available in this SQLite build.")
+        rebuild_index(conn)
+        print("Search index rebuilt.")
@@ -0,0 +1,99 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import click
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+log = logging.getLogger(__name__)
+
+# Jinja compiles every template to Python the first time it is rendered. With
+# TEMPLATE_CACHE_DIR set, the compiled code is kept on disk (keyed by the
+# template source, so edits are picked up) and a fresh process loads it
+# instead of compiling. `flask templates-compile` fills the cache at build
+# time; otherwise the first boot does, when TEMPLATE_PRECOMPILE is on.
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", ".template_cache")
+# Load every template in create_app() rather than on its first request.
+TEMPLATE_PRECOMPILE = os.getenv("TEMPLATE_PRECOMPILE", "true").lower() == "true"
+
+_phases = {}  # startup phase -> ms, for this process
+
+
+# -------------------
+# Phase timings
+# -------------------
+def record(name: str, ms: float) -> None:
+    _phases[name] = ms
+
+
+@contextmanager
+def phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - started) * 1000)
+
+
+def timings() -> dict:
+    """{phase: ms} of the last create_app() in this process, plus "total"."""
+    result = {name: round(ms, 2) for name, ms in _phases.items()}
+    if result:
+        result["total"] = round(sum(_phases.values()), 2)
+    return result
+
+
+def report() -> None:
+    """Log this process's startup time, one line at INFO."""
+    result = timings()
+    parts = ", ".join(f"{name} {ms:.0f}" for name, ms in result.items() if name != "total")
+    log.info("Started pid %d in %.0f ms (%s)", os.getpid(), result.get("total", 0), parts)
+
+
+# -------------------
+# Templates
+# -------------------
+class TemplateCache(FileSystemBytecodeCache):
+    """Bytecode cache that never fails a render (e.g. on a read-only disk)."""
+
+    def dump_bytecode(self, bucket) -> None:
+        try:
+            super().dump_bytecode(bucket)
+        except OSError as exc:
+            log.debug("Template cache not written: %s", exc)
+
+
+def precompile(app) -> tuple[int, list[str]]:
+    """Load every template into the Jinja cache. Returns (loaded, failed names)."""
+    loaded, failed = 0, []
+    for name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateError as exc:
+            log.warning("Template %s does not compile: %s", name, exc)
+            failed.append(name)
+        else:
+            loaded += 1
+    return loaded, failed
+
+
+def init_app(app) -> None:
+    if TEMPLATE_CACHE_DIR:
+        try:
+            Path(TEMPLATE_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+        except OSError as exc:
+            log.warning("No template cache: %s", exc)
+        else:
+            app.jinja_env.bytecode_cache = TemplateCache(TEMPLATE_CACHE_DIR)
+
+    @app.cli.command("templates-compile")
+    def templates_compile_command():
+        """Compile every template into TEMPLATE_CACHE_DIR (run at build time)."""
+        if not TEMPLATE_CACHE_DIR:
+            raise click.ClickException("TEMPLATE_CACHE_DIR is empty; there is nowhere to write.")
+        loaded, failed = precompile(app)
+        print(f"Compiled {loaded} templates into {TEMPLATE_CACHE_DIR}.")
+        if failed:
+            raise click.ClickException(f"Failed: {', '.join(failed)}")
@@ -172,12 +172,15 @@ datasets: [{
   }
 
   function render(locId, locName, pinEl) {
+    const items = data[locId] || [];
+    const total = Number((window.__MAP_COUNTS__ || {})[locId] ?? items.length);
+
     title.textContent = locName;
-    sub.textContent = "Items reported in this location:";
+    sub.textContent = total > items.length
+      ? `Latest ${items.length} of ${total} items reported here:`
+      : "Items reported in this location:";
     list.innerHTML = "";
 
-    const items = data[locId] || [];
-
     if (items.length === 0) {
       empty.textContent = "No items reported here yet.";
       empty.style.display = "block";
@@ -216,6 +219,313 @@ datasets: [{
   }
 })();
 
+// Live updates over /events (admin tables only; streams are admin-only and capped)
+(function () {
+  const adminItems = document.getElementById("adminItems");
+  const adminClaims = document.getElementById("adminClaims");
+  if (!(adminItems || adminClaims) || !window.EventSource) return;
+
+  function el(tag, className, text) {
+    const node = document.createElement(tag);
+    if (className) node.className = className;
+    if (text !== undefined) node.textContent = text;
+    return node;
+  }
+
+  function cell(text) {
+    return el("td", "", text ?? "—");
+  }
+
+  function badge(status) {
+    const td = el("td");
+    td.appendChild(el("span", `badge badge-${status}`, status));
+    return td;
+  }
+
+  function actionForm(url, label, className) {
+    const form = el("form");
+    form.method = "POST";
+    form.action = url;
+    form.appendChild(el("button", `btn btn-small ${className || ""}`.trim(), label));
+    return form;
+  }
+
+  function urlFor(template, id) {
+    return template.replace("/0/", `/${id}/`);
+  }
+
+  function itemSubmitted(item) {
+    if (!adminItems || adminItems.dataset.live !== "on") return;
+    if (adminItems.querySelector(`[data-item-id="${item.id}"]`)) return;
+
+    const tr = el("tr");
+    tr.dataset.itemId = item.id;
+    const pick = el("td");
+    const box = el("input");
+    box.type = "checkbox";
+    box.name = "ids";
+    box.value = item.id;
+    box.setAttribute("form", "bulkForm");
+    box.setAttribute("aria-label", `Select item ${item.id}`);
+    pick.appendChild(box);
+    tr.append(pick, cell(item.id), cell(item.title), badge(item.status), cell(item.location_found), cell(item.date_found));
+
+    const photo = el("td");
+    if (item.photo_url) {
+      const link = el("a", "link", "View");
+      link.href = item.photo_url;
+      link.target = "_blank";
+      link.rel = "noreferrer";
+      photo.appendChild(link);
+    } else {
+      photo.textContent = "—";
+    }
+    tr.appendChild(photo);
+
+    const actions = el("td", "actions-col");
+    actions.appendChild(actionForm(urlFor(adminItems.dataset.approveUrl, item.id), "Approve"));
+    actions.appendChild(actionForm(urlFor(adminItems.dataset.claimedUrl, item.id), "Mark Claimed", "btn-light"));
+    const del = actionForm(urlFor(adminItems.dataset.deleteUrl, item.id), "Delete", "btn-outline");
+    del.addEventListener("submit", (e) => {
+      if (!confirm("Delete this item?")) e.preventDefault();
+    });
+    actions.appendChild(del);
+    tr.appendChild(actions);
+
+    tr.classList.add("live-new");
+    adminItems.prepend(tr);
+  }
+
+  function setItemStatus(itemId, status) {
+    const row = adminItems?.querySelector(`[data-item-id="${itemId}"]`);
+    if (!row) return;
+    const badgeEl = row.querySelector(".badge");
+    badgeEl.className = `badge badge-${status}`;
+    badgeEl.textContent = status;
+    row.querySelectorAll("form").forEach((form) => {
+      const isApprove = form.action.endsWith("/approve");
+      const isClaimed = form.action.endsWith("/mark-claimed");
+      if ((isApprove && status !== "pending") || (isClaimed && status === "claimed")) form.remove();
+    });
+  }
+
+  function itemApproved(item) {
+    setItemStatus(item.id, "approved");
+  }
+
+  function claimCreated(claim) {
+    if (!adminClaims || adminClaims.querySelector(`[data-claim-id="${claim.id}"]`)) return;
+    const tr = el("tr", "live-new");
+    tr.dataset.claimId = claim.id;
+    tr.append(
+      cell(claim.display_created_at), cell(claim.item_title), cell(claim.student_name),
+      cell(claim.email), cell(claim.message), badge(claim.status), cell(null)
+    );
+
+    const actions = el("td", "actions-col");
+    const form = actionForm(urlFor(adminClaims.dataset.approveUrl, claim.id), "Approve + Email");
+    const input = el("input");
+    input.type = "text";
+    input.name = "pickup_location";
+    input.placeholder = "Front office";
+    input.required = true;
+    input.setAttribute("aria-label", `Pickup location for ${claim.student_name}`);
+    form.prepend(input);
+    actions.appendChild(form);
+    tr.appendChild(actions);
+    adminClaims.prepend(tr);
+  }
+
+  function claimApproved(claim) {
+    setItemStatus(claim.item_id, "claimed");
+
+    const row = adminClaims?.querySelector(`[data-claim-id="${claim.id}"]`);
+    if (!row) return;
+    const cells = row.children;
+    cells[5].replaceChildren(el("span", "badge badge-approved", "approved"));
+    cells[6].textContent = claim.pickup_location || "—";
+    cells[7].replaceChildren(el("span", "muted", `Approved ${claim.display_approved_at}`));
+  }
+
+  const handlers = {
+    "item-submitted": itemSubmitted,
+    "item-approved": itemApproved,
+    "claim-created": claimCreated,
+    "claim-approved": claimApproved,
+  };
+
+  const source = new EventSource("/events");
+  Object.entries(handlers).forEach(([kind, handle]) => {
+    source.addEventListener(kind, (e) => handle(JSON.parse(e.data)));
+  });
+})();
+
+// Home "Today's Finds": poll the API, revalidating with If-None-Match so an
+// unchanged list costs a 304 (no held connection per visitor)
+(function () {
+  const todayList = document.querySelector(".todays-finds-list[data-live-date]");
+  if (!todayList || !window.fetch) return;
+
+  const POLL_MS = 30000;
+  const date = todayList.dataset.liveDate;
+  const url = `/api/v1/items?date=${encodeURIComponent(date)}&limit=20` +
+    "&fields=id,title,category,location_found,time_found,thumb_url";
+  let etag = null;
+
+  function clockTime(value) {
+    if (!value) return "Time not provided";
+    const [h, m] = value.split(":").map(Number);
+    if (Number.isNaN(h) || Number.isNaN(m)) return value;
+    return `${h % 12 || 12}:${String(m).padStart(2, "0")} ${h < 12 ? "AM" : "PM"}`;
+  }
+
+  function card(item) {
+    const article = document.createElement("article");
+    article.className = "today-item";
+    article.dataset.itemId = item.id;
+    const thumb = document.createElement("div");
+    thumb.className = "today-item-thumb";
+    thumb.setAttribute("aria-hidden", "true");
+    if (item.thumb_url) {
+      const img = document.createElement("img");
+      img.src = item.thumb_url;
+      img.alt = "";
+      img.loading = "lazy";
+      thumb.appendChild(img);
+    } else {
+      const letter = document.createElement("span");
+      letter.textContent = (item.category || "").slice(0, 1);
+      thumb.appendChild(letter);
+    }
+    const copy = document.createElement("div");
+    copy.className = "today-item-copy";
+    [["h3", item.title, ""], ["p", item.location_found, ""], ["p", clockTime(item.time_found), "today-item-time"]]
+      .forEach(([tag, text, className]) => {
+        const node = document.createElement(tag);
+        node.textContent = text;
+        if (className) node.className = className;
+        copy.appendChild(node);
+      });
+    article.append(thumb, copy);
+    return article;
+  }
+
+  function render(items) {
+    if (!items.length) {
+      if (!todayList.querySelector(".today-empty")) {
+        const empty = document.createElement("div");
+        empty.className = "today-empty";
+        empty.innerHTML = "<h3>No approved finds yet today</h3>";
+        todayList.replaceChildren(empty);
+      }
+      return;
+    }
+    // Same order as the server: latest time found first, untimed last among equals.
+    items.sort((a, b) => (b.time_found || "23:59").localeCompare(a.time_found || "23:59") || b.id - a.id);
+    const known = new Set(Array.from(todayList.querySelectorAll("[data-item-id]"), (n) => n.dataset.itemId));
+    todayList.replaceChildren(...items.slice(0, 5).map((item) => {
+      const node = card(item);
+      if (!known.has(String(item.id))) node.classList.add("live-new");
+      return node;
+    }));
+  }
+
+  async function poll() {
+    if (document.hidden) return;
+    try {
+      const res = await fetch(url, {
+        headers: etag ? { "If-None-Match": etag } : {},
+        cache: "no-store", // we revalidate ourselves
+      });
+      if (res.status === 304 || !res.ok) return;
+      etag = res.headers.get("ETag");
+      render((await res.json()).items);
+    } catch (err) {
+      // Offline or server restarting; try again next tick.
+    }
+  }
+
+  setInterval(poll, POLL_MS); // the page itself was current when served
+})();
+
+// Admin bulk moderation: multi-select + one request per batch
+(function () {
+  const form = document.getElementById("bulkForm");
+  const table = document.getElementById("adminItems");
+  if (!form || !table) return;
+
+  const all = document.getElementById("bulkAll");
+  const count = document.getElementById("bulkCount");
+  const summary = document.getElementById("bulkSummary");
+  const boxes = () => table.querySelectorAll('input[name="ids"]');
+  const checked = () => table.querySelectorAll('input[name="ids"]:checked');
+
+  function updateCount() {
+    count.textContent = `${checked().length} selected`;
+    if (all) all.checked = checked().length > 0 && checked().length === boxes().length;
+  }
+
+  all?.addEventListener("change", () => {
+    boxes().forEach((box) => { box.checked = all.checked; });
+    updateCount();
+  });
+  table.addEventListener("change", (e) => {
+    if (e.target.name === "ids") updateCount();
+  });
+
+  function applyStatus(row, status) {
+    const badgeEl = row.querySelector(".badge");
+    badgeEl.className = `badge badge-${status}`;
+    badgeEl.textContent = status;
+    row.querySelectorAll("td.actions-col form").forEach((f) => {
+      const isApprove = f.action.endsWith("/approve");
+      const isClaimed = f.action.endsWith("/mark-claimed");
+      if ((isApprove && status === "approved") || (isClaimed && status === "claimed")) f.remove();
+    });
+  }
+
+  form.addEventListener("submit", async (e) => {
+    e.preventDefault();
+    const ids = Array.from(checked(), (box) => box.value);
+    if (!ids.length) {
+      summary.textContent = "Select at least one item.";
+      return;
+    }
+    const action = form.elements.action.value;
+    if (action === "delete" && !confirm(`Delete ${ids.length} item(s)?`)) return;
+
+    const body = new FormData();
+    body.append("action", action);
+    ids.forEach((id) => body.append("ids", id));
+
+    summary.textContent = "Working…";
+    try {
+      const res = await fetch(form.action, {
+        method: "POST",
+        body,
+        headers: { Accept: "application/json" },
+        credentials: "same-origin",
+      });
+      const data = await res.json();
+      if (!res.ok) {
+        summary.textContent = data.error || "Bulk action failed.";
+        return;
+      }
+      data.changed.forEach((id) => {
+        const row = table.querySelector(`[data-item-id="${id}"]`);
+        if (!row) return;
+        if (data.action === "delete") row.remove();
+        else applyStatus(row, data.status);
+      });
+      boxes().forEach((box) => { box.checked = false; });
+      updateCount();
+      summary.textContent = data.message;
+    } catch (err) {
+      summary.textContent = "Bulk action failed. Please try again.";
+    }
+  });
+})();
+
 // (home how-to slider removed in favor of static cards)
 
 // Browse item details modal
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import threading
+import time
+
+import db
+
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "10"))  # seconds
+
+# Counters live in the stats_counters table and are maintained by triggers
+# (migration 6), so they change in the same transaction as the rows they count.
+FOUND_STATUSES = ("pending", "approved", "claimed", "rejected")
+# Rows rebuild() recounts; data_version/version:* must never move backwards.
+COUNT_NAMES = ("found_items", "claims")
+COUNT_PREFIXES = ("found_items:", "claims:", "outbox:")
+
+_cache = {"value": None, "expires": 0.0}
+_cache_lock = threading.Lock()
+
+
+def read_counters(conn: sqlite3.Connection) -> dict[str, int]:
+    return {row[0]: row[1] for row in conn.execute("SELECT name, value FROM stats_counters")}
+
+
+def dashboard_stats(conn: sqlite3.Connection) -> dict[str, int]:
+    counters = read_counters(conn)
+    return {
+        "total_found": counters.get("found_items", 0),
+        "approved_found": counters.get("found_items:approved", 0),
+        "claimed": counters.get("found_items:claimed", 0),
+        "pending": counters.get("found_items:pending", 0),
+        "total_claims": counters.get("claims", 0),
+    }
+
+
+def get_dashboard_stats(conn: sqlite3.Connection) -> dict[str, int]:
+    """Dashboard counters, cached in-process for STATS_CACHE_TTL seconds."""
+    now = time.monotonic()
+    with _cache_lock:
+        if _cache["value"] is not None and now < _cache["expires"]:
+            return _cache["value"]
+    value = dashboard_stats(conn)
+    with _cache_lock:
+        _cache["value"] = value
+        _cache["expires"] = now + STATS_CACHE_TTL
+    return value
+
+
+def data_version(conn: sqlite3.Connection, table: str | None = None) -> int:
+    """Counter that increases on every write (to `table`, or to any table)."""
+    name = f"version:{table}" if table else "data_version"
+    row = conn.execute("SELECT value FROM stats_counters WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def invalidate() -> None:
+    """Drop this process's cached copy; other workers catch up within the TTL."""
+    with _cache_lock:
+        _cache["value"] = None
+
+
+def count_from_tables(conn: sqlite3.Connection) -> dict[str, int]:
+    counts = {"found_items": 0, "claims": 0}
+    counts.update({f"found_items:{status}": 0 for status in FOUND_STATUSES})
+    for row in conn.execute("SELECT status, COUNT(*) FROM found_items GROUP BY status"):
+        counts[f"found_items:{row[0]}"] = row[1]
+        counts["found_items"] += row[1]
+    counts["claims"] = conn.execute("SELECT COUNT(*) FROM claims").fetchone()[0]
+    for table in ("claims", "outbox"):
+        for row in conn.execute(f"SELECT status, COUNT(*) FROM {table} GROUP BY status"):
+            counts[f"{table}:{row[0]}"] = row[1]
+    return counts
+
+
+def rebuild(conn: sqlite3.Connection) -> dict[str, tuple[int, int]]:
+    """Recount from the base tables. Returns {name: (stored, actual)} for drifted counters."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        stored = read_counters(conn)
+        actual = count_from_tables(conn)
+        counted = [name for name in stored if name in COUNT_NAMES or name.startswith(COUNT_PREFIXES)]
+        drift = {
+            name: (stored.get(name, 0), actual.get(name, 0))
+            for name in set(actual) | set(counted)
+            if stored.get(name, 0) != actual.get(name, 0)
+        }
+        conn.execute(
+            "DELETE FROM stats_counters WHERE name IN ('found_items', 'claims') "
+            "OR name LIKE 'found_items:%' OR name LIKE 'claims:%' OR name LIKE 'outbox:%'"
+        )
+        conn.executemany(
+            "INSERT INTO stats_counters (name, value) VALUES (?, ?)", actual.items()
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    invalidate()
+    return drift
+
+
+def init_app(app) -> None:
+    @app.cli.command("stats-rebuild")
+    def stats_rebuild_command():
+        """Recount dashboard counters and repair any drift."""
+        drift = rebuild(db.get_conn())
+        for name, (stored, actual) in drift.items():
+            print(f"{name}: {stored} -> {actual}")
+        print("Counters rebuilt." if drift else "Counters were already accurate.")
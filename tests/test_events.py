@@ -0,0 +1,20 @@
+import time
+
+import events
+
+
+def test_resume_before_pruned_buffer_waits_instead_of_spinning(conn):
+    hub = events.EventHub()  # not started: no polling thread
+    hub.floor = hub.last_id = 10  # ids 1-10 are gone from the table and the buffer
+    started = time.monotonic()
+    assert hub.wait_for(3, timeout=0.2) == []
+    assert time.monotonic() - started >= 0.2
+
+
+def test_resume_before_buffer_reads_the_table(conn):
+    events.publish(conn, events.ITEM_APPROVED, {"id": 1, "title": "Jacket"})
+    conn.commit()
+    hub = events.EventHub()
+    hub.floor = hub.last_id
+    rows = hub.wait_for(0, timeout=0.2)
+    assert [row["kind"] for row in rows] == [events.ITEM_APPROVED]
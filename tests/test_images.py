@@ -0,0 +1,53 @@
+import pytest
+
+import images
+
+Image = pytest.importorskip("PIL.Image")
+
+GPS_IFD = 0x8825
+ORIENTATION = 0x0112
+
+
+def _jpeg_with_exif(path, orientation=1):
+    exif = Image.Exif()
+    exif[ORIENTATION] = orientation
+    exif[0x010F] = "PhoneMaker"
+    exif.get_ifd(GPS_IFD)[2] = (47.0, 36.0, 0.0)  # GPSLatitude
+    Image.new("RGB", (40, 20), "red").save(path, "JPEG", exif=exif.tobytes())
+
+
+def test_strip_metadata_removes_exif(tmp_path):
+    path = tmp_path / "photo.jpg"
+    _jpeg_with_exif(path)
+    assert images.strip_metadata(path) is True
+    with Image.open(path) as stripped:
+        assert not stripped.getexif()
+        assert stripped.size == (40, 20)
+    assert images.strip_metadata(path) is False  # nothing left to strip
+
+
+def test_strip_metadata_applies_orientation(tmp_path):
+    path = tmp_path / "photo.jpg"
+    _jpeg_with_exif(path, orientation=6)  # rotated 90 degrees
+    images.strip_metadata(path)
+    with Image.open(path) as stripped:
+        assert stripped.size == (20, 40)
+
+
+@pytest.mark.filterwarnings("ignore::PIL.Image.DecompressionBombWarning")
+def test_too_many_pixels_is_rejected(tmp_path, monkeypatch):
+    # Between the limit and twice it, where Pillow only warns.
+    monkeypatch.setattr(images, "MAX_IMAGE_PIXELS", 100)
+    Image.new("RGB", (12, 12)).save(tmp_path / "big.png")
+    with pytest.raises(images.ImageProcessingError, match="12x12; the limit is 100 pixels"):
+        images.make_renditions(tmp_path, "big.png")
+    with pytest.raises(images.ImageProcessingError, match="12x12"):
+        images.strip_metadata(tmp_path / "big.png")
+
+
+def test_not_an_image(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"not an image")
+    with pytest.raises(images.ImageProcessingError):
+        images.strip_metadata(path)
+    assert [p.name for p in tmp_path.iterdir()] == ["photo.jpg"]
@@ -0,0 +1,63 @@
+from datetime import date
+
+import moderation
+import retention
+
+
+def _item_with_match(conn, status="approved") -> int:
+    conn.execute(
+        "INSERT INTO students (full_name, email, password_hash, created_at) "
+        "VALUES ('Sam', 'sam@example.com', 'x', '2024-01-01T00:00:00')"
+    )
+    report_id = conn.execute(
+        """
+        INSERT INTO lost_reports (student_id, contact_name, contact_email, title, category,
+                                  location_id, lost_from, lost_to, description, created_at)
+        VALUES (1, 'Sam', 'sam@example.com', 'Blue jacket', 'Clothing', 'gym',
+                '2024-01-01', '2024-01-02', 'Blue jacket', '2024-01-02T00:00:00')
+        """
+    ).lastrowid
+    item_id = conn.execute(
+        """
+        INSERT INTO found_items (title, category, location_found, location_id, date_found,
+                                 description, status, created_at)
+        VALUES ('Blue jacket', 'Clothing', 'Gym', 'gym', '2024-01-02', 'Blue', ?, '2024-01-02T00:00:00')
+        """,
+        (status,),
+    ).lastrowid
+    conn.execute(
+        "INSERT INTO lost_matches (report_id, item_id, score, details, created_at) "
+        "VALUES (?, ?, 0.9, '{}', '2024-01-02T00:00:00')",
+        (report_id, item_id),
+    )
+    conn.commit()
+    return item_id
+
+
+def _matches(conn, item_id: int) -> int:
+    return conn.execute("SELECT COUNT(*) FROM lost_matches WHERE item_id = ?", (item_id,)).fetchone()[0]
+
+
+def test_deleting_an_item_deletes_its_matches(conn):
+    item_id = _item_with_match(conn)
+    conn.execute("DELETE FROM found_items WHERE id = ?", (item_id,))
+    conn.commit()
+    assert _matches(conn, item_id) == 0
+
+
+def test_bulk_delete_deletes_matches(conn):
+    item_id = _item_with_match(conn)
+    moderation.apply(conn, "delete", [item_id])
+    assert _matches(conn, item_id) == 0
+
+
+def test_archiving_deletes_matches(conn, monkeypatch):
+    monkeypatch.setattr(retention, "RETENTION_REJECTED_DAYS", 14)
+    item_id = _item_with_match(conn, status="rejected")
+    report = retention.run(conn, today=date(2025, 1, 1))
+    assert report["items"] == 1
+    assert _matches(conn, item_id) == 0
+
+
+def test_connections_enforce_foreign_keys(conn):
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
@@ -0,0 +1,35 @@
+import mailer
+
+
+class FailingTransport:
+    def send(self, message):
+        raise OSError("SMTP server unavailable")
+
+
+def _expire_leases(conn):
+    conn.execute("UPDATE outbox SET next_attempt_at = '2000-01-01T00:00:00' WHERE status = 'sending'")
+    conn.commit()
+
+
+def test_expired_leases_use_up_attempts(conn, monkeypatch):
+    monkeypatch.setattr(mailer, "MAIL_BACKEND", "console")
+    message_id = mailer.enqueue("Hello", "sam@example.com", "Body", conn=conn)
+    conn.commit()
+    # The sender leases the message, then dies before recording an outcome.
+    for attempt in range(1, mailer.OUTBOX_MAX_ATTEMPTS + 1):
+        assert [row["id"] for row in mailer._claim_due(conn)] == [message_id]
+        assert conn.execute("SELECT attempts FROM outbox").fetchone()[0] == attempt
+        _expire_leases(conn)
+
+    assert mailer._claim_due(conn) == []
+    status, attempts = conn.execute("SELECT status, attempts FROM outbox").fetchone()
+    assert (status, attempts) == ("failed", mailer.OUTBOX_MAX_ATTEMPTS)
+
+
+def test_failed_send_counts_one_attempt(conn, monkeypatch):
+    monkeypatch.setattr(mailer, "MAIL_BACKEND", "console")
+    mailer.enqueue("Hello", "sam@example.com", "Body", conn=conn)
+    conn.commit()
+    assert mailer.deliver_due(conn, FailingTransport()) == (0, 1)
+    status, attempts = conn.execute("SELECT status, attempts FROM outbox").fetchone()
+    assert (status, attempts) == ("pending", 1)
@@ -0,0 +1,29 @@
+import sqlite3
+
+import db
+
+
+def test_hot_queries_use_their_indexes():
+    failures = db.check_query_plans()
+    assert not failures, "\n".join(f"{name}: {' | '.join(plan)}" for name, plan in failures.items())
+
+
+def test_check_runs_against_a_migrated_file_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "plans.db")
+    db.init_db()
+    conn = sqlite3.connect(db.DB_PATH)
+    try:
+        assert db.check_query_plans(conn) == {}
+    finally:
+        conn.close()
+
+
+def test_check_reports_a_missing_index():
+    conn = sqlite3.connect(":memory:")
+    try:
+        db.migrate(conn)
+        conn.execute("DROP INDEX idx_found_items_status_day")
+        failures = db.check_query_plans(conn)
+    finally:
+        conn.close()
+    assert {"home.today_finds", "browse.date", "browse.date_next"} <= set(failures)
@@ -0,0 +1,13 @@
+from datetime import date
+
+import retention
+from test_lost_reports import _item_with_match, _matches
+
+
+def test_archiving_deletes_matches_without_foreign_keys(conn, monkeypatch):
+    monkeypatch.setattr(retention, "RETENTION_REJECTED_DAYS", 14)
+    conn.execute("PRAGMA foreign_keys = OFF")
+    item_id = _item_with_match(conn, status="rejected")
+    report = retention.run(conn, today=date(2025, 1, 1))
+    assert report["items"] == 1
+    assert _matches(conn, item_id) == 0
@@ -0,0 +1,25 @@
+import io
+
+import pytest
+
+import transfer
+
+ITEM = (
+    '{"title": "Jacket", "category": "Clothing", "location_found": "Gym", '
+    '"date_found": "2024-01-02", "description": "Blue", "created_at": "2024-01-02T00:00:00"}'
+)
+
+
+@pytest.mark.parametrize("line", ["[1, 2]", '"x"', "3", "null"])
+def test_jsonl_line_must_be_an_object(conn, line):
+    stream = io.StringIO(ITEM + "\n" + line + "\n")
+    with pytest.raises(transfer.TransferError, match="Line 2: expected a JSON object"):
+        transfer.import_records(conn, "items", transfer.read_records(stream, "jsonl"))
+    assert conn.execute("SELECT COUNT(*) FROM found_items").fetchone()[0] == 0
+
+
+def test_non_utf8_upload_is_a_transfer_error(conn):
+    binary = io.BytesIO("title\nCaf\xe9\n".encode("latin-1"))
+    records = transfer.read_records(transfer._text_stream(binary, gzipped=False), "csv")
+    with pytest.raises(transfer.TransferError, match="not UTF-8"):
+        transfer.import_records(conn, "items", records)
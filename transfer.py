@@ -0,0 +1,282 @@
+import csv
+import gzip
+import io
+import json
+import sqlite3
+import sys
+import zlib
+
+import click
+from flask import Response, request, session
+
+import db
+import locations
+import stats
+
+# Streaming export (CSV or JSONL, optionally gzipped) and batched bulk import
+# for found_items and claims. Exports walk a cursor with fetchmany(), so
+# memory use doesn't grow with the table.
+TABLES = {"items": "found_items", "claims": "claims"}
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+FETCH_SIZE = 500
+IMPORT_BATCH = 1000
+
+
+class TransferError(ValueError):
+    pass
+
+
+def _table(name: str) -> str:
+    if name not in TABLES:
+        raise TransferError(f"Unknown table {name!r}; choose from {', '.join(TABLES)}.")
+    return TABLES[name]
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> list:
+    return conn.execute(f"PRAGMA table_info({table})").fetchall()
+
+
+# -------------------
+# Export
+# -------------------
+def iter_rows(conn: sqlite3.Connection, name: str, status: str | None = None):
+    """(column names, row iterator) for a table, optionally one status only."""
+    sql = f"SELECT * FROM {_table(name)}"
+    params = []
+    if status:
+        sql += " WHERE status = ?"
+        params.append(status)
+    cursor = conn.execute(sql + " ORDER BY id", params)
+    columns = [col[0] for col in cursor.description]
+
+    def rows():
+        while batch := cursor.fetchmany(FETCH_SIZE):
+            yield from batch
+
+    return columns, rows()
+
+
+def encode_csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % FETCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def encode_jsonl(columns, rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(columns, row)), ensure_ascii=False, separators=(",", ":")))
+        if len(lines) == FETCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(conn: sqlite3.Connection, name: str, fmt: str, status: str | None = None, compress: bool = False):
+    """Yield the export as str chunks, or bytes when compressed."""
+    if fmt not in FORMATS:
+        raise TransferError(f"Unknown format {fmt!r}; choose from {', '.join(FORMATS)}.")
+    columns, rows = iter_rows(conn, name, status)
+    chunks = encode_csv(columns, rows) if fmt == "csv" else encode_jsonl(columns, rows)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+# -------------------
+# Import
+# -------------------
+def read_records(stream, fmt: str):
+    """Dicts from a text stream of CSV or JSONL."""
+    if fmt == "csv":
+        # Empty CSV cells mean NULL, as they were exported.
+        reader = csv.DictReader(stream)
+        try:
+            for record in reader:
+                yield {key: (value if value != "" else None) for key, value in record.items()}
+        except csv.Error as exc:
+            raise TransferError(f"Line {reader.line_num}: {exc}") from None
+    elif fmt == "jsonl":
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    raise TransferError(f"Line {number}: {exc}") from None
+                if not isinstance(record, dict):
+                    raise TransferError(f"Line {number}: expected a JSON object")
+                yield record
+    else:
+        raise TransferError(f"Unknown format {fmt!r}; choose from {', '.join(FORMATS)}.")
+
+
+def import_records(conn: sqlite3.Connection, name: str, records, keep_ids: bool = False,
+                   batch_size: int = IMPORT_BATCH) -> int:
+    """Insert records with executemany in batches, all in one transaction.
+
+    Unknown fields are ignored. Ids are dropped unless keep_ids (needed when
+    importing claims that refer to imported items). Returns rows inserted.
+    """
+    table = _table(name)
+    info = _columns(conn, table)
+    known = [col[1] for col in info if keep_ids or col[1] != "id"]
+    required = {col[1] for col in info if col[3] and col[4] is None and not col[5]}
+
+    inserted = 0
+    columns = None
+    sql = None
+    batch = []
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for record in records:
+            if columns is None:
+                # The first record fixes the column set for the whole file.
+                columns = [col for col in known if col in record]
+                missing = required - set(columns)
+                if missing:
+                    raise TransferError(f"Missing required columns: {', '.join(sorted(missing))}")
+                sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            if table == "found_items" and "location_id" in known and not record.get("location_id"):
+                record["location_id"] = locations.resolve(None, record.get("location_found"))
+            batch.append([record.get(col) for col in columns])
+            if len(batch) >= batch_size:
+                conn.executemany(sql, batch)
+                inserted += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(sql, batch)
+            inserted += len(batch)
+        conn.commit()
+    except sqlite3.Error as exc:
+        conn.rollback()
+        raise TransferError(f"Import failed near record {inserted + len(batch)}: {exc}") from None
+    except Exception:
+        conn.rollback()
+        raise
+    stats.invalidate()
+    return inserted
+
+
+def _text_stream(binary, gzipped: bool):
+    """Lines of an uploaded file; a corrupt .gz or non-UTF-8 text is a TransferError."""
+    if gzipped:
+        binary = gzip.GzipFile(fileobj=binary)
+    try:
+        yield from io.TextIOWrapper(binary, encoding="utf-8", newline="")
+    except UnicodeDecodeError as exc:
+        raise TransferError(f"File is not UTF-8 text: {exc}") from None
+    except (OSError, EOFError, zlib.error) as exc:
+        # gzip.BadGzipFile is an OSError; a truncated file is an EOFError.
+        raise TransferError(f"Cannot read {'gzip ' if gzipped else ''}file: {exc}") from None
+
+
+def _detect(filename: str) -> tuple[str, bool]:
+    """(format, gzipped) from a name such as items.jsonl.gz."""
+    gzipped = filename.endswith(".gz")
+    base = filename[:-3] if gzipped else filename
+    return base.rsplit(".", 1)[-1].lower(), gzipped
+
+
+# -------------------
+# CLI + admin endpoints
+# -------------------
+def _is_admin() -> bool:
+    return session.get("is_admin") is True
+
+
+def init_app(app) -> None:
+    @app.get("/admin/export/<name>.<fmt>")
+    def admin_export(name: str, fmt: str):
+        if not _is_admin():
+            return {"error": "Admin access required."}, 403
+        compress = request.args.get("gzip") in ("1", "true")
+        status = request.args.get("status") or None
+        if name not in TABLES or fmt not in FORMATS:
+            return {"error": "Unknown export."}, 404
+
+        def generate():
+            # Streams outlive the request, so the connection is the stream's own.
+            conn = db.get_pool().acquire()
+            try:
+                yield from export(conn, name, fmt, status, compress)
+            finally:
+                conn.close()
+
+        label = "".join(ch for ch in status if ch.isalnum()) if status else ""
+        filename = f"{name}{'-' + label if label else ''}.{fmt}{'.gz' if compress else ''}"
+        response = Response(
+            generate(), mimetype="application/gzip" if compress else FORMATS[fmt]
+        )
+        response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    @app.post("/admin/import/<name>")
+    def admin_import(name: str):
+        if not _is_admin():
+            return {"error": "Admin access required."}, 403
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            return {"error": "Attach a .csv or .jsonl file (optionally .gz)."}, 400
+        fmt, gzipped = _detect(upload.filename)
+        try:
+            records = read_records(_text_stream(upload.stream, gzipped), fmt)
+            inserted = import_records(
+                db.get_conn(), name, records, keep_ids=request.form.get("keep_ids") in ("1", "true", "on")
+            )
+        except TransferError as exc:
+            return {"error": str(exc)}, 400
+        return {"table": name, "inserted": inserted}
+
+    @app.cli.command("export")
+    @click.argument("name", type=click.Choice(list(TABLES)))
+    @click.option("--format", "fmt", type=click.Choice(list(FORMATS)), default="csv")
+    @click.option("--status", default=None, help="Only rows with this status, e.g. approved.")
+    @click.option("--gzip", "compress", is_flag=True, help="Gzip the output.")
+    @click.option("--output", "-o", type=click.Path(dir_okay=False), default=None,
+                  help="Write to a file instead of stdout.")
+    def export_command(name, fmt, status, compress, output):
+        """Stream found items or claims as CSV or JSONL."""
+        conn = db.get_conn()
+        chunks = export(conn, name, fmt, status, compress)
+        if output:
+            with (open(output, "wb") if compress else open(output, "w", newline="")) as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            out = sys.stdout.buffer if compress else sys.stdout
+            for chunk in chunks:
+                out.write(chunk)
+
+    @app.cli.command("import")
+    @click.argument("name", type=click.Choice(list(TABLES)))
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--keep-ids", is_flag=True, help="Keep the id column (e.g. items then their claims).")
+    @click.option("--batch-size", default=IMPORT_BATCH, show_default=True)
+    def import_command(name, path, keep_ids, batch_size):
+        """Bulk-insert a CSV or JSONL export (optionally .gz) in one transaction."""
+        fmt, gzipped = _detect(path)
+        with open(path, "rb") as f:
+            try:
+                inserted = import_records(
+                    db.get_conn(), name, read_records(_text_stream(f, gzipped), fmt), keep_ids, batch_size
+                )
+            except TransferError as exc:
+                raise click.ClickException(str(exc))
+        print(f"Imported {inserted} {name}.")